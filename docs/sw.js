@@ -0,0 +1,207 @@
+// ==================== 离线包 Service Worker ====================
+// 从合并后的瓦片包中返回瓦片，减少首次打开时的请求数
+// 瓦片包和清单由 python -m tile_engine bundle 生成（precache.json + bundles/*.bin），
+// 版本号写在同时生成的 sw-version.js 中；浏览器检查更新时会比较引入的脚本，版本变了就安装新版本
+
+try {
+    importScripts('sw-version.js');
+} catch (error) {
+    // 还没有打包
+}
+const PRECACHE_VERSION = self.PRECACHE_VERSION || 'dev';
+const CACHE_PREFIX = 'vn-tour-';
+const CACHE_NAME = CACHE_PREFIX + PRECACHE_VERSION;
+const MANIFEST_URL = 'precache.json';
+const BUNDLE_MAGIC = 'VTB1';
+// 内存中保留的已解析瓦片包数量
+const MAX_OPEN_BUNDLES = 8;
+
+let manifestPromise = null;
+const openBundles = new Map();
+
+// ==================== 安装与清理 ====================
+
+self.addEventListener('install', event => {
+    event.waitUntil(precache().then(() => self.skipWaiting()));
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil((async () => {
+        // 删除旧版本的缓存
+        const names = await caches.keys();
+        await Promise.all(names
+            .filter(name => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME)
+            .map(name => caches.delete(name)));
+        await self.clients.claim();
+    })());
+});
+
+async function precache() {
+    const response = await fetch(`${MANIFEST_URL}?v=${PRECACHE_VERSION}`, { cache: 'no-cache' }).catch(() => null);
+    if (!response || !response.ok) {
+        // 还没有打包：不拦截任何请求
+        return;
+    }
+    const manifest = await response.json();
+    const cache = await caches.open(CACHE_NAME);
+    const previous = await previousManifest();
+
+    const jobs = [];
+    for (const file of manifest.static) {
+        // 哈希没变的静态文件从旧缓存复制
+        const old = previous && previous.static.find(item => item.url === file.url);
+        jobs.push(copyOrFetch(cache, file.url, Boolean(old && old.sha256 === file.sha256)));
+    }
+    for (const bundle of Object.values(manifest.bundles)) {
+        // 瓦片包地址带内容哈希，任何缓存里有同一地址就是同样的内容
+        if (bundle.precache) {
+            jobs.push(copyOrFetch(cache, bundle.url, true));
+        }
+    }
+    await Promise.all(jobs);
+    await cache.put(MANIFEST_URL, new Response(JSON.stringify(manifest), {
+        headers: { 'Content-Type': 'application/json' }
+    }));
+}
+
+async function previousManifest() {
+    const names = (await caches.keys()).filter(name => name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME);
+    for (const name of names) {
+        const response = await (await caches.open(name)).match(MANIFEST_URL);
+        if (response) {
+            return response.json();
+        }
+    }
+    return null;
+}
+
+async function copyOrFetch(cache, url, reuse) {
+    if (reuse) {
+        const cached = await caches.match(url);
+        if (cached) {
+            return cache.put(url, cached);
+        }
+    }
+    const response = await fetch(url, { cache: 'reload' });
+    if (response.ok) {
+        await cache.put(url, response);
+    }
+}
+
+// ==================== 请求拦截 ====================
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (request.method !== 'GET' || url.origin !== self.location.origin) {
+        return;
+    }
+
+    const tile = url.pathname.match(/\/tiles\/(\d+)\/(\d+)\/(\d+)\.png$/);
+    if (tile) {
+        event.respondWith(tileResponse(request, Number(tile[1]), Number(tile[2]), Number(tile[3])));
+    } else {
+        // 页面和脚本：网络优先（数据更新能立刻看到），离线时用缓存
+        event.respondWith(fetch(request).catch(async () => {
+            const cached = await caches.match(request, { ignoreSearch: true });
+            return cached || Response.error();
+        }));
+    }
+});
+
+function loadManifest() {
+    if (!manifestPromise) {
+        manifestPromise = caches.open(CACHE_NAME)
+            .then(cache => cache.match(MANIFEST_URL))
+            .then(response => (response ? response.json() : null))
+            .then(manifest => {
+                // 还没有清单时不缓存结果，下次请求重新读取
+                if (!manifest) {
+                    manifestPromise = null;
+                }
+                return manifest;
+            }, error => {
+                manifestPromise = null;
+                throw error;
+            });
+    }
+    return manifestPromise;
+}
+
+function bundleKey(manifest, z, x, y) {
+    const span = manifest.span_bits;
+    return span === null ? String(z) : `${z}-${x >> span}-${y >> span}`;
+}
+
+async function tileResponse(request, z, x, y) {
+    const manifest = await loadManifest().catch(() => null);
+    const entry = manifest && manifest.bundles[bundleKey(manifest, z, x, y)];
+    if (entry) {
+        try {
+            const bundle = await openBundle(entry);
+            const bytes = bundle.z === z ? bundle.tile(x, y) : null;
+            if (bytes) {
+                return new Response(bytes, {
+                    headers: { 'Content-Type': 'image/png', 'Cache-Control': 'public, max-age=86400' }
+                });
+            }
+        } catch (error) {
+            console.log(`瓦片包 ${entry.url} 不可用，改为单独请求:`, error);
+        }
+    }
+    return fetch(request);
+}
+
+function openBundle(entry) {
+    let promise = openBundles.get(entry.url);
+    if (promise) {
+        // 最近使用的放到最后
+        openBundles.delete(entry.url);
+    } else {
+        promise = loadBundle(entry.url);
+        promise.catch(() => openBundles.delete(entry.url));
+    }
+    openBundles.set(entry.url, promise);
+    while (openBundles.size > MAX_OPEN_BUNDLES) {
+        openBundles.delete(openBundles.keys().next().value);
+    }
+    return promise;
+}
+
+async function loadBundle(url) {
+    const cache = await caches.open(CACHE_NAME);
+    let response = await cache.match(url);
+    if (!response) {
+        // 高层级的瓦片包在第一次用到时下载
+        response = await fetch(url);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        await cache.put(url, response.clone());
+    }
+    return parseBundle(await response.arrayBuffer());
+}
+
+function parseBundle(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+    if (magic !== BUNDLE_MAGIC) {
+        throw new Error('不是瓦片包');
+    }
+    const z = view.getUint32(4, true);
+    const count = view.getUint32(8, true);
+    const dataStart = 12 + count * 16;
+    const index = new Map();
+    for (let i = 0; i < count; i++) {
+        const base = 12 + i * 16;
+        index.set(`${view.getUint32(base, true)}/${view.getUint32(base + 4, true)}`,
+                  [view.getUint32(base + 8, true), view.getUint32(base + 12, true)]);
+    }
+    return {
+        z,
+        tile(x, y) {
+            const item = index.get(`${x}/${y}`);
+            return item ? new Uint8Array(buffer, dataStart + item[0], item[1]) : null;
+        }
+    };
+}
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地瓦片服务器 - 在浏览器中打开离线地图
+
+提供 docs/ 下的网页和 tiles/ 瓦片，本地没有的瓦片向 OpenStreetMap
+下载一次并保存，之后都从本地返回。
+
+等价于: python -m tile_engine serve [参数]
+"""
+
+import sys
+
+from tile_engine.cli import main
+
+if __name__ == "__main__":
+    main(['serve'] + sys.argv[1:])
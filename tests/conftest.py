@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+测试公用的夹具
+
+测试只使用本地桩服务器（tile_engine.stub_server）和临时目录，不联网，也不写仓库目录。
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tile_engine.stub_server import StubTileServer, make_png  # noqa: E402
+from tile_engine.store import TileStore  # noqa: E402
+from tile_engine.manifest import Manifest  # noqa: E402
+from tile_engine.retry import RetryPolicy, RetryQueue  # noqa: E402
+
+
+@pytest.fixture
+def stub_server():
+    """后台运行的桩服务器，所有瓦片返回同一张 PNG"""
+    with StubTileServer() as server:
+        yield server
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    """
+    创建带清单的目录存储，测试结束时关闭
+
+    用法:
+        store = make_store('tiles')
+    """
+    stores = []
+
+    def make(name='tiles', manifest=True, dedup=False):
+        root = str(tmp_path / name)
+        store = TileStore(root, Manifest(root + '.manifest.sqlite', root=root) if manifest else None, dedup=dedup)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def tile_png(color):
+    """小尺寸纯色 PNG，不同颜色内容不同"""
+    return make_png(size=8, color=color)
+
+
+def fast_retry(max_attempts):
+    """退避时间很短的重试队列"""
+    return RetryQueue(RetryPolicy(max_attempts=max_attempts, base_delay=0.01, max_delay=0.02))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""异步引擎：并发下载、429 重试和在途数量上限（响应体检查见 test_fetcher.py）"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('httpx')
+
+from tile_engine.async_engine import AsyncFetcher, download_all_async, download_async  # noqa: E402
+from tile_engine.stub_server import StubTileServer  # noqa: E402
+
+from conftest import fast_retry  # noqa: E402
+
+TILES = [(12, x, y) for x in range(3200, 3206) for y in range(1900, 1905)]
+
+
+def test_downloads_every_tile(stub_server, make_store):
+    store = make_store()
+    results = []
+
+    stats = download_async(TILES, store, concurrency=8, url_template=stub_server.url_template,
+                           on_result=lambda done, total, tile, result: results.append((done, tile, result)))
+    store.flush()
+
+    assert stats['success'] == len(TILES) and stats['failed'] == 0
+    assert set(store.iter_tiles()) == set(TILES)
+    assert [done for done, _, _ in results] == list(range(1, len(TILES) + 1))
+    assert all(store.read(*tile) == stub_server.body for tile in TILES)
+
+    # 已有的瓦片不再请求
+    requests = stub_server.request_count
+    again = download_async(TILES, store, url_template=stub_server.url_template)
+    assert again['exists'] == len(TILES) and stub_server.request_count == requests
+
+
+def test_retries_throttled_tiles(make_store):
+    store = make_store()
+    retry = fast_retry(20)
+    with StubTileServer(throttle_rate=0.4, seed=3) as server:
+        stats = download_async(TILES, store, concurrency=8, retry=retry, url_template=server.url_template)
+        throttled = server.statuses.get(429, 0)
+
+    assert throttled > 0
+    assert stats['success'] == len(TILES) and stats['failed'] == 0
+    assert stats['retried'] == throttled
+    assert not retry.failures
+
+
+def test_gives_up_after_max_attempts(make_store):
+    store = make_store()
+    retry = fast_retry(3)
+    with StubTileServer(error_rate=1.0) as server:
+        stats = download_async(TILES[:4], store, retry=retry, url_template=server.url_template)
+        assert server.request_count == 4 * 3
+
+    assert stats['failed'] == 4
+    assert [f['attempts'] for f in retry.failures] == [3] * 4
+    assert all(f['result'] == 'failed_500' for f in retry.failures)
+    assert not list(store.iter_tiles())
+
+
+def test_bounded_window(stub_server, make_store):
+    """同时存在的协程不超过 window，任务按需从迭代器中取出"""
+    store = make_store()
+    pulled = []
+
+    def tasks():
+        for tile in TILES:
+            pulled.append(tile)
+            yield tile
+
+    seen = []
+
+    async def run():
+        async with AsyncFetcher(stub_server.url_template) as fetcher:
+            def on_result(done, total, tile, result):
+                seen.append(len(pulled) - done)
+            return await download_all_async(tasks(), fetcher, store, concurrency=2, on_result=on_result,
+                                            total=len(TILES), window=3)
+
+    stats = asyncio.run(run())
+    assert stats['success'] == len(TILES)
+    assert max(seen) <= 3
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""离线包：瓦片包格式往返、增量重写和 sw-version.js 的版本"""
+
+import os
+import json
+
+import pytest
+
+from tile_engine.bundle import (BUNDLE_DIR, MANIFEST_NAME, VERSION_SCRIPT, build_bundles, pack_bundle,
+                                read_bundle)
+
+from conftest import tile_png
+
+
+def test_pack_round_trip_shares_identical_tiles():
+    sea, land = tile_png((0, 0, 255)), tile_png((0, 255, 0))
+    tiles = [(0, 0, sea), (0, 1, land), (1, 0, sea), (1, 1, sea)]
+    data = pack_bundle(12, tiles)
+    z, unpacked = read_bundle(data)
+    assert z == 12
+    assert unpacked == {(x, y): tile for x, y, tile in tiles}
+    # 相同内容只存一份
+    assert data.count(sea) == 1
+    assert len(data) < sum(len(tile) for _, _, tile in tiles) + 100
+
+    with pytest.raises(ValueError):
+        read_bundle(b'XXXX' + data[4:])
+
+
+def test_build_rewrites_version_only_on_change(make_store, tmp_path):
+    store = make_store()
+    for x in range(10):
+        store.write(12, x, 0, tile_png((x, 0, 0)))
+    store.flush()
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    (docs / 'index.html').write_text('<html></html>')
+
+    first = build_bundles(store, str(docs), span_bits=3)
+    version_path = docs / VERSION_SCRIPT
+    assert first['version'] in version_path.read_text()
+    # x 0-7 与 8-9 分在两个瓦片包
+    assert first['stats'][12] == {'bundles': 2, 'tiles': 10, 'bytes': first['stats'][12]['bytes'], 'written': 2}
+    assert [entry['url'] for entry in first['static']] == ['index.html']
+    with open(docs / MANIFEST_NAME) as f:
+        assert json.load(f)['version'] == first['version']
+
+    for entry in first['bundles'].values():
+        with open(docs / entry['url'], 'rb') as f:
+            _, tiles = read_bundle(f.read())
+        assert all(data == store.read(12, x, y) for (x, y), data in tiles.items())
+
+    # 内容不变：版本相同，sw-version.js 和瓦片包都不重写
+    mtime = os.stat(version_path).st_mtime_ns
+    os.utime(version_path, ns=(mtime - 10 ** 9, mtime - 10 ** 9))
+    same = build_bundles(store, str(docs), span_bits=3)
+    assert same['version'] == first['version']
+    assert same['stats'][12]['written'] == 0
+    assert os.stat(version_path).st_mtime_ns == mtime - 10 ** 9
+
+    # 一个瓦片变了：只重写它所在的瓦片包，旧包被删除，版本改变
+    store.write(12, 9, 0, tile_png((200, 0, 0)))
+    store.flush()
+    changed = build_bundles(store, str(docs), span_bits=3)
+    assert changed['version'] != first['version']
+    assert changed['stats'][12]['written'] == 1
+    assert changed['version'] in version_path.read_text()
+    assert len(os.listdir(docs / BUNDLE_DIR)) == 2
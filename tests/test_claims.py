@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""分片租约：申领、推迟、接手过期租约和释放时机"""
+
+import os
+import time
+import multiprocessing
+
+import pytest
+
+from tile_engine import claims as claims_module
+from tile_engine.claims import ShardClaims, default_claims
+
+# 分片边长 16：(10, 0..15, 0..15) 在同一个分片
+SHARD_A = [(10, x, y) for x in range(4) for y in range(4)]
+SHARD_B = [(10, 16 + x, y) for x in range(4) for y in range(4)]
+
+
+@pytest.fixture
+def lease_dir(tmp_path):
+    return str(tmp_path / 'claims')
+
+
+@pytest.fixture
+def quick(monkeypatch):
+    """缩短释放前的空闲时间，测试不必等 1 秒"""
+    monkeypatch.setattr(claims_module, 'RELEASE_LINGER', 0.1)
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_default_claims_follow_store():
+    assert default_claims('docs/tiles') == 'tiles_claims'
+    assert default_claims('/data/vn.mbtiles') == '/data/vn.mbtiles.claims'
+
+
+def test_second_claimant_is_deferred(lease_dir, make_store):
+    store = make_store()
+    first = ShardClaims(lease_dir).start()
+    second = ShardClaims(lease_dir).start()
+    try:
+        assert list(first.claim(SHARD_A, store)) == SHARD_A
+        # 同一分片被占用：全部推迟；另一个分片正常申领
+        assert list(second.claim(SHARD_A + SHARD_B, store)) == SHARD_B
+        assert second.pending() == 1 and second.pending_tiles() == len(SHARD_A)
+        assert second.take(store) == []
+
+        # 第一个进程下载完一部分并释放，第二个进程只接手仍缺失的瓦片
+        for tile in SHARD_A[:10]:
+            store.write(*tile, b'png')
+            first.finish(tile)
+        store.flush()
+        first.release_all()
+        assert sorted(second.take(store)) == sorted(SHARD_A[10:])
+        assert second.pending() == 0
+    finally:
+        first.close()
+        second.close()
+    assert os.listdir(lease_dir) == []
+
+
+def test_stale_lease_is_taken_over(lease_dir, make_store):
+    store = make_store()
+    crashed = ShardClaims(lease_dir, ttl=1).start()
+    assert list(crashed.claim(SHARD_A[:1], store)) == SHARD_A[:1]
+    # 模拟进程崩溃：停止续约但不释放
+    crashed._stop.set()
+    crashed._thread.join()
+    lease = os.path.join(lease_dir, '10_0_0.lease')
+    past = time.time() - 5
+    os.utime(lease, (past, past))
+
+    other = ShardClaims(lease_dir, ttl=1).start()
+    try:
+        assert list(other.claim(SHARD_A, store)) == SHARD_A
+        assert other.taken_over == 1
+        with open(lease) as f:
+            assert f.read() == other.owner
+        # 崩溃的进程不会误删已被接手的租约
+        crashed.release_all()
+        assert os.path.exists(lease)
+    finally:
+        other.close()
+
+
+def test_held_shard_is_renewed_and_not_released_while_streaming(lease_dir, make_store, quick):
+    store = make_store()
+    owner = ShardClaims(lease_dir, ttl=0.6).start()
+    other = ShardClaims(lease_dir, ttl=0.6).start()
+    lease = os.path.join(lease_dir, '10_0_0.lease')
+    try:
+        # 生成器只取出第一个瓦片：分片中还有瓦片在途
+        stream = owner.claim(iter(SHARD_A), store)
+        first = next(stream)
+        time.sleep(1.5)
+        # 期间续约，不会被当作过期；在途瓦片没有结果前也不会释放
+        assert os.path.exists(lease)
+        assert list(other.claim(SHARD_A[:1], store)) == []
+
+        second = next(stream)
+        owner.finish(first)
+        time.sleep(0.4)
+        assert os.path.exists(lease)
+
+        # 全部有结果并空闲片刻后释放
+        owner.finish(second)
+        assert wait_until(lambda: not os.path.exists(lease))
+        assert other.take(store) == SHARD_A[:1]
+    finally:
+        owner.close()
+        other.close()
+
+
+def _claim_worker(lease_dir, store_root, manifest_path, tiles, queue):
+    from tile_engine.manifest import Manifest
+    from tile_engine.store import TileStore
+    store = TileStore(store_root, Manifest(manifest_path, root=store_root))
+    claims = ShardClaims(lease_dir).start()
+    got = list(claims.claim(tiles, store))
+    # 持有到父进程确认两个进程都申领过
+    queue.put(got)
+    time.sleep(0.5)
+    claims.close()
+    store.close()
+
+
+def test_processes_split_shards(lease_dir, tmp_path):
+    root = str(tmp_path / 'tiles')
+    manifest = root + '.manifest.sqlite'
+    tiles = [(12, x, y) for x in range(64) for y in range(64)]
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    workers = [ctx.Process(target=_claim_worker, args=(lease_dir, root, manifest, tiles, queue))
+               for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    results = [queue.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(timeout=30)
+
+    # 每个分片只归一个进程
+    a, b = (set(r) for r in results)
+    assert not a & b
+    assert a | b <= set(tiles)
+    assert len(a | b) > 0
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""命令行：补漏模式与分片租约配合时的结果统计"""
+
+import threading
+
+from tile_engine.claims import ShardClaims
+from tile_engine.cli import main
+from tile_engine.plan import TilePlan
+
+SAIGON = (10.7, 106.6, 10.9, 106.8)
+ZOOM = 14
+
+
+def test_missing_counts_taken_over_tiles(stub_server, make_store, tmp_path, capsys):
+    store = make_store()
+    tiles = list(TilePlan(*SAIGON, min_zoom=ZOOM, max_zoom=ZOOM))
+    for tile in tiles[:5]:
+        store.write(*tile, b'old')
+    store.flush()
+
+    # 另一个"进程"持有第一个分片，补下其中一部分后释放
+    claims_dir = str(tmp_path / 'claims')
+    other = ShardClaims(claims_dir).start()
+    first = tiles[5]
+    shard = [tile for tile in tiles[5:] if (tile[1] >> 4, tile[2] >> 4) == (first[1] >> 4, first[2] >> 4)]
+    assert list(other.claim(shard, store)) == shard and len(shard) < len(tiles) - 5
+
+    def other_process():
+        for tile in shard[:3]:
+            store.write(*tile, b'other')
+        store.flush()
+        other.close()
+
+    timer = threading.Timer(1.0, other_process)
+    timer.start()
+    try:
+        main(['--tiles-dir', store.root, '--manifest', store.manifest.path, '--no-progress-log',
+              '--claims-dir', claims_dir, '--bbox', ','.join(map(str, SAIGON)),
+              'missing', '--zoom', str(ZOOM), '--url', stub_server.url_template,
+              '--report', str(tmp_path / 'failed.json')])
+    finally:
+        timer.join()
+
+    out = capsys.readouterr().out
+    downloaded = len(tiles) - 5 - 3
+    assert stub_server.request_count == downloaded
+    assert f"新下载: {downloaded} 个瓦片" in out
+    assert "下载失败: 0 个瓦片" in out
+    assert f"最终状态: {len(tiles)}/{len(tiles)} (100%)" in out
+    assert store.count(TilePlan(*SAIGON, min_zoom=ZOOM, max_zoom=ZOOM)) == len(tiles)
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""增量包：生成、应用、重复应用和冲突"""
+
+import shutil
+import sqlite3
+import zipfile
+
+import pytest
+
+from tile_engine.delta import build_delta, apply_delta, snapshot, is_manifest, DELTA_INDEX
+from tile_engine.mbtiles import MBTilesStore
+
+from conftest import tile_png
+
+RED, GREEN, BLUE, GREY = (200, 0, 0), (0, 200, 0), (0, 0, 200), (90, 90, 90)
+
+
+@pytest.fixture
+def snapshots(make_store, tmp_path):
+    """
+    旧快照: 10/1/1 红、10/1/2 绿、10/1/3 蓝、12/8/8 灰
+    新快照: 10/1/1 红（不变）、10/1/2 蓝（变化）、10/1/3 删除、12/8/8 灰（不变）、
+            11/2/2 与 11/2/3 绿（新增，内容相同）
+    """
+    old = make_store('old')
+    for tile, color in {(10, 1, 1): RED, (10, 1, 2): GREEN, (10, 1, 3): BLUE, (12, 8, 8): GREY}.items():
+        old.write(*tile, tile_png(color))
+    old.flush()
+
+    new = make_store('new')
+    for tile, color in {(10, 1, 1): RED, (10, 1, 2): BLUE, (12, 8, 8): GREY,
+                        (11, 2, 2): GREEN, (11, 2, 3): GREEN}.items():
+        new.write(*tile, tile_png(color))
+    new.flush()
+    return old, new
+
+
+def test_round_trip(snapshots, make_store, tmp_path):
+    old, new = snapshots
+    package = str(tmp_path / 'delta.zip')
+    index = build_delta(old.root, new.root, package)
+
+    assert [e[:3] for e in index['added']] == [[11, 2, 2], [11, 2, 3]]
+    assert [e[:3] for e in index['changed']] == [[10, 1, 2]]
+    assert [e[:3] for e in index['deleted']] == [[10, 1, 3]]
+    # 内容相同的新增瓦片只存一份，已变化的瓦片另存一份
+    assert index['blobs'] == 2
+    with zipfile.ZipFile(package) as z:
+        assert z.namelist()[-1] == DELTA_INDEX
+
+    target_root = str(tmp_path / 'target')
+    shutil.copytree(old.root, target_root)
+    target = make_store('target')
+    result = apply_delta(package, target)
+    assert result['applied'] and not result['conflicts']
+    assert (result['written'], result['removed'], result['skipped']) == (3, 1, 0)
+    assert snapshot(target.root) == snapshot(new.root)
+    # 删除最后一个瓦片后空目录也一并删除
+    assert not (tmp_path / 'target' / '10' / '1' / '3.png').exists()
+    assert target.manifest.hashes() == snapshot(new.root)
+
+    # 重复应用不做任何修改
+    again = apply_delta(package, target)
+    assert again['applied'] and (again['written'], again['removed'], again['skipped']) == (0, 0, 4)
+
+
+def test_manifest_as_old_snapshot(snapshots, tmp_path):
+    old, new = snapshots
+    assert is_manifest(old.manifest.path)
+    from_dir = build_delta(old.root, new.root, str(tmp_path / 'a.zip'))
+    from_manifest = build_delta(old.manifest.path, new.root, str(tmp_path / 'b.zip'))
+    for kind in ('added', 'changed', 'deleted'):
+        assert from_manifest[kind] == from_dir[kind]
+
+
+def test_no_changes_writes_nothing(snapshots, tmp_path):
+    old, _ = snapshots
+    package = tmp_path / 'none.zip'
+    index = build_delta(old.root, old.root, str(package))
+    assert not (index['added'] or index['changed'] or index['deleted'])
+    assert not package.exists()
+
+
+def test_conflicts_block_apply(snapshots, make_store, tmp_path):
+    old, new = snapshots
+    package = str(tmp_path / 'delta.zip')
+    build_delta(old.root, new.root, package)
+
+    shutil.copytree(old.root, str(tmp_path / 'target'))
+    target = make_store('target')
+    # 部署端的 10/1/2 已被改成其他内容
+    target.write(10, 1, 2, tile_png(GREY))
+
+    result = apply_delta(package, target)
+    assert not result['applied']
+    assert result['conflicts'] == [(10, 1, 2, 'modified')]
+    assert target.read(10, 1, 3) is not None and target.read(11, 2, 2) is None
+
+    assert apply_delta(package, target, dry_run=True)['written'] == 0
+    forced = apply_delta(package, target, force=True)
+    assert forced['applied']
+    assert snapshot(target.root) == snapshot(new.root)
+
+
+def test_apply_to_mbtiles(snapshots, tmp_path):
+    old, new = snapshots
+    package = str(tmp_path / 'delta.zip')
+    build_delta(old.root, new.root, package)
+
+    archive = MBTilesStore(str(tmp_path / 'old.mbtiles'))
+    try:
+        for z, x, y in old.iter_tiles():
+            archive.write(z, x, y, old.read(z, x, y))
+        archive.flush()
+        assert apply_delta(package, archive)['applied']
+        archive.flush()
+        assert snapshot(archive.path) == snapshot(new.root)
+    finally:
+        archive.close()
+
+
+def test_rejects_non_manifest_files(snapshots, tmp_path):
+    old, new = snapshots
+    other = tmp_path / 'notes.sqlite'
+    conn = sqlite3.connect(str(other))
+    conn.execute("CREATE TABLE tiles (zoom_level, tile_column, tile_row, tile_data)")
+    conn.close()
+    text = tmp_path / 'notes.txt'
+    text.write_text('hello')
+
+    assert not is_manifest(str(other)) and not is_manifest(str(text))
+    with pytest.raises(ValueError):
+        build_delta(str(text), new.root, str(tmp_path / 'x.zip'))
+
+
+@pytest.mark.parametrize('name', ['typo.mbtiles', 'typo_dir'])
+def test_missing_new_snapshot(snapshots, tmp_path, name):
+    old, _ = snapshots
+    package = tmp_path / 'out.zip'
+    with pytest.raises(FileNotFoundError):
+        build_delta(old.root, str(tmp_path / name), str(package))
+    # 不生成增量包，也不留下新建的空归档
+    assert not package.exists()
+    assert not (tmp_path / name).exists()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""响应体检查：截断、过大、不是 PNG 的瓦片在两种引擎下都不会写入存储"""
+
+import pytest
+
+from tile_engine.downloader import download_threaded
+from tile_engine.fetcher import Fetcher, IncompleteTile, check_tile, MAX_TILE_SIZE
+from tile_engine.stub_server import StubTileServer, make_png
+
+from conftest import fast_retry
+
+TILES = [(12, 3200 + i, 1900) for i in range(3)]
+PNG = make_png(size=8)
+
+
+def run_threads(server, store, retry):
+    fetcher = Fetcher(server.url_template, pool_size=2)
+    try:
+        return download_threaded(TILES, fetcher, store, 2, retry=retry)
+    finally:
+        fetcher.close()
+
+
+def run_async(server, store, retry):
+    pytest.importorskip('httpx')
+    from tile_engine.async_engine import download_async
+    return download_async(TILES, store, concurrency=2, retry=retry, url_template=server.url_template)
+
+
+@pytest.mark.parametrize('engine', [run_threads, run_async], ids=['threads', 'async'])
+@pytest.mark.parametrize('options', [
+    {'truncate': 100},
+    {'body_size': MAX_TILE_SIZE + 1024},
+    {'body': b'<html><body>502 Bad Gateway</body></html>'},
+    {'body': PNG[:-12]},
+], ids=['truncated', 'oversized', 'html', 'no_iend'])
+def test_bad_body_is_retried_and_not_saved(engine, options, make_store):
+    store = make_store()
+    retry = fast_retry(2)
+    with StubTileServer(**options) as server:
+        stats = engine(server, store, retry)
+        requests = server.request_count
+
+    assert stats['success'] == 0 and stats['failed'] == len(TILES)
+    # 按网络异常处理：每个瓦片都重试到用完次数
+    assert requests == 2 * len(TILES)
+    assert all(f['result'].startswith('error_') for f in retry.failures)
+    assert not list(store.iter_tiles())
+
+
+@pytest.mark.parametrize('engine', [run_threads, run_async], ids=['threads', 'async'])
+def test_good_body_is_saved(engine, make_store):
+    store = make_store()
+    with StubTileServer(body=PNG) as server:
+        stats = engine(server, store, fast_retry(2))
+    store.flush()
+    assert stats['success'] == len(TILES)
+    assert all(store.read(*tile) == PNG for tile in TILES)
+
+
+def test_check_tile():
+    headers = {'Content-Type': 'image/png', 'Content-Length': str(len(PNG))}
+    check_tile(PNG, headers)
+
+    with pytest.raises(IncompleteTile, match='长度不符'):
+        check_tile(PNG[:-5], headers)
+    with pytest.raises(IncompleteTile, match='不是 PNG'):
+        check_tile(b'<html></html>', {'Content-Type': 'image/png'})
+    with pytest.raises(IncompleteTile, match='PNG 不完整'):
+        check_tile(PNG[:-12], {'Content-Type': 'image/png'})
+    # 压缩传输时不比较长度；其他类型不检查 PNG 签名
+    check_tile(PNG, {'Content-Type': 'image/png', 'Content-Length': '10', 'Content-Encoding': 'gzip'})
+    check_tile(b'GIF89a', {'Content-Type': 'image/gif'})
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""清单与存储保持一致：下载、计数、重建索引、只读刷新和失败记录"""
+
+import hashlib
+
+import pytest
+
+from tile_engine import manifest as manifest_module
+from tile_engine.downloader import download_threaded
+from tile_engine.fetcher import Fetcher
+from tile_engine.manifest import Manifest
+from tile_engine.plan import TilePlan
+from tile_engine.regions import PolygonRegion
+from tile_engine.store import TileStore
+
+from conftest import tile_png
+
+SAIGON = (10.7, 106.6, 10.9, 106.8)
+TRIANGLE = [(10.7, 106.6), (10.9, 106.65), (10.75, 106.8)]
+
+
+def download(server, store, tiles, threads=4):
+    fetcher = Fetcher(server.url_template, pool_size=threads)
+    try:
+        return download_threaded(list(tiles), fetcher, store, threads)
+    finally:
+        fetcher.close()
+
+
+def assert_agrees(store):
+    """清单中的已完成瓦片与磁盘上的文件一一对应，SHA-1 一致"""
+    on_disk = set(store.iter_tiles())
+    assert set(store.manifest.hashes()) == on_disk
+    for (z, x, y), sha1 in store.manifest.hashes().items():
+        assert hashlib.sha1(store.read(z, x, y)).hexdigest() == sha1
+    return on_disk
+
+
+def test_download_records_every_tile(stub_server, make_store):
+    store = make_store()
+    plan = TilePlan(*SAIGON, min_zoom=10, max_zoom=13)
+    stats = download(stub_server, store, plan)
+    assert stats['success'] == plan.count() and stats['failed'] == 0
+    store.flush()
+
+    assert assert_agrees(store) == set(plan)
+    assert store.count(plan) == plan.count()
+    assert store.manifest.progress() == {z: plan.count(z) for z in plan.zooms()}
+
+    # 再次下载全部跳过
+    again = download(stub_server, store, plan)
+    assert again['exists'] == plan.count() and again['success'] == 0
+
+
+def test_region_plan_count(stub_server, make_store):
+    store = make_store()
+    plan = TilePlan.from_regions([PolygonRegion([TRIANGLE])], 10, 14)
+    half = [tile for i, tile in enumerate(plan) if i % 2 == 0]
+    # 计划外的瓦片不计入
+    outside = [(14, 0, 0), (12, 1, 1)]
+    download(stub_server, store, half + outside)
+    store.flush()
+
+    assert store.count(plan) == len(half)
+    for z in plan.zooms():
+        assert store.count(plan, z) == sum(1 for tile in half if tile[0] == z)
+        assert store.count(plan, z) == sum(1 for tile in plan.tiles(z) if store.exists(*tile))
+    assert set(store.missing(plan)) == set(plan) - set(half)
+
+
+def test_reindex_matches_downloaded_manifest(stub_server, make_store, tmp_path):
+    store = make_store()
+    plan = TilePlan(*SAIGON, min_zoom=10, max_zoom=12)
+    download(stub_server, store, plan)
+    store.flush()
+
+    # 同一目录换一个新清单，首次打开时从磁盘重建
+    root = store.root
+    rebuilt = TileStore(root, Manifest(str(tmp_path / 'rebuilt.sqlite'), root=root))
+    try:
+        assert rebuilt.manifest.hashes() == store.manifest.hashes()
+        assert rebuilt.count(plan) == plan.count()
+    finally:
+        rebuilt.close()
+
+
+def test_readonly_manifest_sees_new_rows(make_store, monkeypatch):
+    store = make_store()
+    store.write(10, 1, 1, tile_png((1, 2, 3)))
+    store.flush()
+
+    reader = Manifest(store.manifest.path, readonly=True)
+    try:
+        assert reader.is_done(10, 1, 1) and not reader.is_done(10, 1, 2)
+        store.write(10, 1, 2, tile_png((4, 5, 6)))
+        store.flush()
+        monkeypatch.setattr(manifest_module, 'REFRESH_INTERVAL', 0)
+        assert reader.is_done(10, 1, 2)
+    finally:
+        reader.close()
+
+
+def test_failed_and_deleted_tiles(make_store):
+    store = make_store()
+    for y in range(3):
+        store.write(11, 5, y, tile_png((y, y, y)))
+
+    store.discard(11, 5, 0, 'corrupt_crc')
+    store.delete(11, 5, 1)
+    store.mark_failed(11, 5, 9, 'failed_404')
+    store.flush()
+
+    assert not store.exists(11, 5, 0) and not store.exists(11, 5, 1) and store.exists(11, 5, 2)
+    assert assert_agrees(store) == {(11, 5, 2)}
+    assert store.manifest.get(11, 5, 0)['result'] == 'corrupt_crc'
+    assert store.manifest.get(11, 5, 1) is None
+    assert store.manifest.progress() == {11: 1}
+
+
+def test_manifest_refuses_other_store(tmp_path):
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+    path = str(tmp_path / 'shared.sqlite')
+    Manifest(path, root=str(tmp_path / 'a')).close()
+    with pytest.raises(ValueError):
+        Manifest(path, root=str(tmp_path / 'b'))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""MBTiles 归档：TMS 行号翻转、单表归档转去重布局、与目录互相导出"""
+
+import sqlite3
+
+from tile_engine.mbtiles import SCHEMA, MBTilesStore, export_tiles, xyz_to_tms
+from tile_engine.plan import TilePlan
+
+from conftest import tile_png
+
+PLAN = TilePlan(10.76, 106.68, 10.80, 106.72, min_zoom=13, max_zoom=14)
+
+
+def rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def test_tms_row_flip(tmp_path):
+    path = str(tmp_path / 'tiles.mbtiles')
+    store = MBTilesStore(path)
+    assert xyz_to_tms(3, 2) == 5 and xyz_to_tms(3, 5) == 2
+    store.write(3, 1, 2, tile_png((1, 1, 1)))
+    tiles = list(PLAN.tiles())
+    for i, tile in enumerate(tiles):
+        store.write(*tile, tile_png((i % 7, 0, 0)))
+    store.flush()
+
+    assert store.read(3, 1, 2) == tile_png((1, 1, 1))
+    assert store.read(3, 1, 5) is None
+    assert set(store.iter_tiles()) == set(tiles) | {(3, 1, 2)}
+    # y 翻转后的范围计数
+    assert store.count(PLAN) == len(tiles)
+    store.close()
+
+    # 归档里按 TMS 行号保存，其他 MBTiles 工具读到的位置正确
+    assert rows(path, "SELECT tile_row FROM tiles WHERE zoom_level = 3") == [(5,)]
+    metadata = dict(rows(path, "SELECT name, value FROM metadata"))
+    assert metadata['format'] == 'png'
+    assert (metadata['minzoom'], metadata['maxzoom']) == ('3', '14')
+
+
+def test_deduplicate_keeps_content(tmp_path):
+    path = str(tmp_path / 'legacy.mbtiles')
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    sea, land = tile_png((0, 0, 255)), tile_png((0, 255, 0))
+    expected = {}
+    for x in range(8):
+        data = sea if x % 4 else land
+        expected[(10, x, 3)] = data
+        conn.execute("INSERT INTO tiles VALUES (?, ?, ?, ?)", (10, x, xyz_to_tms(10, 3), data))
+    conn.commit()
+    conn.close()
+
+    store = MBTilesStore(path)
+    assert not store.deduplicated
+    assert store.deduplicate()
+    assert not store.deduplicate()
+    assert {tile: store.read(*tile) for tile in store.iter_tiles()} == expected
+    # 新写入的瓦片也按内容去重
+    store.write(10, 9, 3, sea)
+    store.close()
+    assert rows(path, "SELECT COUNT(*) FROM images") == [(2,)]
+    assert rows(path, "SELECT COUNT(*) FROM map") == [(9,)]
+
+    reopened = MBTilesStore(path)
+    assert reopened.deduplicated and reopened.read(10, 9, 3) == sea
+    reopened.close()
+
+
+def test_export_round_trip(make_store, tmp_path):
+    source = make_store('source', manifest=False)
+    for i, tile in enumerate(PLAN.tiles()):
+        source.write(*tile, tile_png((i % 5, i % 3, 0)))
+    archive = MBTilesStore(str(tmp_path / 'export.mbtiles'))
+    count, size = export_tiles(source, archive)
+    assert count == PLAN.count() and size > 0
+    archive.flush()
+
+    back = make_store('back', manifest=False)
+    assert export_tiles(archive, back) == (count, size)
+    archive.close()
+    assert {tile: back.read(*tile) for tile in back.iter_tiles()} == \
+        {tile: source.read(*tile) for tile in source.iter_tiles()}
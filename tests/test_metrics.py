@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""下载指标：直方图分位数和 /metrics 的 Prometheus 文本格式"""
+
+import re
+import json
+
+import requests
+
+from tile_engine.downloader import download_threaded
+from tile_engine.fetcher import Fetcher
+from tile_engine.metrics import Histogram, Metrics, MetricsServer
+from tile_engine.retry import RetryQueue
+
+TILES = [(12, x, 7) for x in range(20)]
+SAMPLE_RE = re.compile(r'^([a-z_]+)(\{[a-z]+="[^"]*"(,[a-z]+="[^"]*")*\})? (-?[0-9.]+)$')
+
+
+def parse(text):
+    """解析 Prometheus 文本格式，返回 {(指标名, 标签串): 值}，格式不对直接失败"""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            assert re.match(r'^# (HELP|TYPE) [a-z_]+ ', line), line
+            continue
+        match = SAMPLE_RE.match(line)
+        assert match, line
+        samples[(match.group(1), match.group(2) or '')] = float(match.group(4))
+    return samples
+
+
+def test_histogram_quantiles():
+    hist = Histogram(buckets=(0.1, 0.2, 0.5))
+    assert hist.quantile(0.5) is None
+    for value in [0.05] * 50 + [0.15] * 40 + [0.4] * 9 + [3.0]:
+        hist.observe(value)
+    assert hist.count == 100
+    assert hist.cumulative() == [(0.1, 50), (0.2, 90), (0.5, 99), ('+Inf', 100)]
+    assert hist.quantile(0.5) == 0.1
+    assert 0.1 < hist.quantile(0.9) <= 0.2
+    assert hist.quantile(0.99) <= 0.5
+
+
+def test_metrics_endpoint(stub_server, make_store):
+    retry = RetryQueue()
+    metrics = Metrics(retry)
+    metrics.add_planned(len(TILES))
+    fetcher = Fetcher(stub_server.url_template, metrics=metrics, pool_size=4)
+    try:
+        download_threaded(TILES, fetcher, make_store(), 4, retry=retry,
+                          on_result=lambda done, total, tile, result: metrics.observe_result(result))
+    finally:
+        fetcher.close()
+
+    with MetricsServer(metrics) as server:
+        response = requests.get(server.url, timeout=5)
+        summary = requests.get(server.url + '.json', timeout=5).json()
+        assert requests.get(server.url + '/other', timeout=5).status_code == 404
+
+    assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    samples = parse(response.text)
+    n = len(TILES)
+    assert samples[('tile_responses_total', '{status="200"}')] == n
+    assert samples[('tile_results_total', '{result="success"}')] == n
+    assert samples[('tile_bytes_total', '')] == n * len(stub_server.body)
+    assert samples[('tile_queue_depth', '')] == 0
+    assert samples[('tile_requests_in_flight', '')] == 0
+
+    # 桶累积计数单调不减，+Inf 桶等于总数
+    buckets = [value for (name, labels), value in samples.items()
+               if name == 'tile_request_seconds_bucket' and 'phase="total"' in labels]
+    assert buckets == sorted(buckets)
+    assert samples[('tile_request_seconds_bucket', '{phase="total",le="+Inf"}')] == n
+    assert samples[('tile_request_seconds_count', '{phase="total"}')] == n
+
+    assert summary['requests'] == n and summary['results'] == {'success': n}
+    assert summary['latency']['total']['count'] == n
+    assert json.dumps(summary)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""多镜像地址池：展开子域名、出错时故障转移、冷却后恢复使用"""
+
+import time
+
+import pytest
+
+from tile_engine import mirrors
+from tile_engine.fetcher import Fetcher
+from tile_engine.mirrors import EndpointPool, expand_urls
+from tile_engine.stub_server import StubTileServer
+
+
+@pytest.fixture
+def short_cooldown(monkeypatch):
+    monkeypatch.setattr(mirrors, 'COOLDOWN_BASE', 0.2)
+
+
+def test_expand_urls():
+    urls = expand_urls(['https://{s}.tile.example/{z}/{x}/{y}.png', 'https://b.tile.example/{z}/{x}/{y}.png',
+                        'http://mirror/{z}/{x}/{y}.png'], 'abc')
+    assert urls == ['https://a.tile.example/{z}/{x}/{y}.png', 'https://b.tile.example/{z}/{x}/{y}.png',
+                    'https://c.tile.example/{z}/{x}/{y}.png', 'http://mirror/{z}/{x}/{y}.png']
+    with pytest.raises(ValueError):
+        EndpointPool([])
+
+
+def test_fails_over_and_returns_after_cooldown(short_cooldown):
+    with StubTileServer(error_rate=1.0) as broken, StubTileServer() as healthy:
+        pool = EndpointPool([broken.url_template, healthy.url_template], max_concurrency=2)
+        fetcher = Fetcher(pool=pool, pool_size=2)
+        try:
+            # 第一个地址出错：同一个瓦片立即转到第二个地址
+            assert fetcher.fetch(12, 1, 1).status == 200
+            assert pool.failovers == 1
+            assert [e['state'] for e in pool.summary()] == ['cooling', 'ok']
+
+            # 冷却期间只用健康的地址
+            for x in range(5):
+                assert fetcher.fetch(12, x, 2).status == 200
+            assert broken.request_count == 1
+
+            # 冷却结束后出过错的地址重新参与分配
+            time.sleep(0.25)
+            bad = pool.endpoints[0]
+            assert [e['state'] for e in pool.summary()] == ['ok', 'ok']
+            endpoint, wait = pool.try_acquire(exclude=pool.endpoints[1:])
+            assert endpoint is bad and wait == 0
+            pool.release(bad, 0.01, 500)
+            # 连续出错，冷却时间加倍
+            assert bad.failures == 2
+            assert bad.cooldown_until - time.monotonic() > 0.3
+        finally:
+            fetcher.close()
+
+
+def test_retry_after_pauses_endpoint():
+    pool = EndpointPool(['http://a/{z}/{x}/{y}.png', 'http://b/{z}/{x}/{y}.png'])
+    first, wait = pool.try_acquire()
+    assert wait == 0
+    pool.release(first, 0.05, 429, {'Retry-After': '30'})
+    assert first.throttled == 1
+
+    second, _ = pool.try_acquire()
+    assert second is not first
+    # 转移时其余地址都不可用：放弃转移
+    assert pool.try_acquire(exclude=[second]) == (None, -1)
+    pool.release(second, 0.05, 503, {'Retry-After': '10'})
+    # 全部在冷却：建议等待最早恢复的那个
+    endpoint, wait = pool.try_acquire()
+    assert endpoint is None and 9 < wait <= 10
+
+
+def test_acquire_waits_for_cooldown(short_cooldown):
+    pool = EndpointPool(['http://a/{z}/{x}/{y}.png'])
+    endpoint = pool.acquire()
+    pool.release(endpoint, 0.01, error=ConnectionError('reset'))
+    start = time.monotonic()
+    assert pool.acquire() is endpoint
+    assert time.monotonic() - start >= 0.15
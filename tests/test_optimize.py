@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""瓦片压缩：无损重新压缩、调色板量化、WebP、增量跳过，去重的硬链接在压缩后仍然共享"""
+
+import io
+import os
+import zlib
+import random
+import struct
+
+import pytest
+
+from tile_engine.optimize import optimize_store, deflate_png, make_chunk
+from tile_engine.store import TileStore
+from tile_engine.verify import check_png
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def loose_png(color, size=16):
+    """不压缩像素、带文本块的 PNG，deflate 一定能变小"""
+    raw = (b'\x00' + bytes(color) * size) * size
+    return (SIGNATURE + make_chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + make_chunk(b'tEXt', b'Comment\x00rendered by test') + make_chunk(b'IDAT', zlib.compress(raw, 0))
+            + make_chunk(b'IEND', b''))
+
+
+def pixels(data):
+    return zlib.decompress(b''.join(body for kind, body in chunks(data) if kind == b'IDAT'))
+
+
+def chunks(data):
+    pos = len(SIGNATURE)
+    while pos < len(data):
+        length, kind = struct.unpack_from('>I4s', data, pos)
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def test_deflate_is_lossless():
+    data = loose_png((10, 20, 30))
+    smaller = deflate_png(data)
+    assert len(smaller) < len(data)
+    assert check_png(smaller) is None
+    assert pixels(smaller) == pixels(data)
+    assert b'tEXt' not in smaller
+    # 已经无法变小时返回 None
+    assert deflate_png(smaller) is None
+    assert deflate_png(b'<html></html>') is None
+
+
+def test_hard_links_survive_optimize(make_store):
+    sea = loose_png((170, 211, 223))
+    land = loose_png((240, 238, 230))
+    store = make_store(dedup=True)
+    shared = [(12, x, 5) for x in range(4)]
+    for tile in shared:
+        store.write(*tile, sea)
+    store.write(12, 9, 9, land)
+    store.flush()
+    assert len({os.stat(store.path(*tile)).st_ino for tile in shared}) == 1
+
+    # 压缩时不开启 dedup，同内容的瓦片仍然链接到同一个文件
+    optimizer = TileStore(store.root, store.manifest)
+    stats = optimize_store(optimizer, workers=2)
+    assert stats[12]['tiles'] == 5 and stats[12]['errors'] == 0
+    assert stats[12]['after'] < stats[12]['before']
+
+    inodes = {os.stat(store.path(*tile)).st_ino for tile in shared}
+    assert len(inodes) == 1
+    assert os.stat(store.path(*shared[0])).st_nlink == len(shared)
+    assert os.stat(store.path(12, 9, 9)).st_ino not in inodes
+    assert pixels(store.read(*shared[0])) == pixels(sea)
+    assert store.unchanged(*shared[0], store.read(*shared[0]))
+
+    # 再次运行全部跳过
+    again = optimize_store(optimizer, workers=2)
+    assert again[12]['skipped'] == 5 and again[12].get('tiles', 0) == 0
+
+
+def test_quantize_and_webp(make_store, tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    store = make_store()
+    # 随机噪声：颜色多、难压缩，量化后明显变小
+    pixels = random.Random(1).randbytes(64 * 64 * 3)
+    buf = io.BytesIO()
+    Image.frombytes('RGB', (64, 64), pixels).save(buf, 'PNG')
+    store.write(12, 1, 1, buf.getvalue())
+    store.flush()
+
+    stats = optimize_store(store, method='quantize', workers=1, colors=16)
+    assert stats[12]['errors'] == 0 and stats[12]['after'] < stats[12]['before']
+    image = Image.open(io.BytesIO(store.read(12, 1, 1)))
+    assert image.mode == 'P' and image.size == (64, 64)
+    assert len(image.getcolors()) <= 16
+
+    output = str(tmp_path / 'webp')
+    optimize_store(store, method='webp', workers=1, output=output)
+    with open(os.path.join(output, '12', '1', '1.webp'), 'rb') as f:
+        assert f.read(12)[8:] == b'WEBP'
+    # WebP 另存，不改动原瓦片
+    assert Image.open(io.BytesIO(store.read(12, 1, 1))).format == 'PNG'
+
+
+def test_check_method():
+    with pytest.raises(ValueError):
+        optimize_store(None, method='gif')
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""瓦片计划：矩形计划、多边形覆盖和区域合并"""
+
+import pytest
+
+from tile_engine.plan import TilePlan, bbox_tile_range
+from tile_engine.regions import BBoxRegion, PolygonRegion, lonlat_to_tile_xy
+from tile_engine.tilekeys import decode
+
+# 胡志明市附近的小范围，z10-z13 共几十个瓦片
+SAIGON = (10.7, 106.6, 10.9, 106.8)
+TRIANGLE = [(10.5, 106.4), (11.2, 106.6), (10.6, 107.2)]
+
+
+def test_rectangular_plan():
+    plan = TilePlan(*SAIGON, min_zoom=10, max_zoom=13)
+    assert plan.is_rectangular
+    tiles = list(plan)
+    assert len(tiles) == plan.count() == len(set(tiles))
+    assert tiles == sorted(tiles)
+    for z in plan.zooms():
+        x_min, x_max, y_min, y_max = bbox_tile_range(*SAIGON, z)
+        assert plan.count(z) == (x_max - x_min + 1) * (y_max - y_min + 1)
+        assert [decode(k) for k in plan.keys(z).tolist()] == list(plan.tiles(z))
+    assert tiles[0] in plan and (13, 0, 0) not in plan and (9, 0, 0) not in plan
+
+
+def test_square_polygon_matches_bbox():
+    min_lat, min_lon, max_lat, max_lon = SAIGON
+    square = PolygonRegion([[(min_lat, min_lon), (max_lat, min_lon), (max_lat, max_lon), (min_lat, max_lon)]])
+    for zoom in range(8, 15):
+        assert square.cover(zoom) == BBoxRegion(*SAIGON).cover(zoom)
+
+
+def _inside(point, ring):
+    """奇偶规则判断点是否在多边形内（ring 为瓦片坐标）"""
+    px, py = point
+    inside = False
+    for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+        if (y0 > py) != (y1 > py) and px < x0 + (py - y0) * (x1 - x0) / (y1 - y0):
+            inside = not inside
+    return inside
+
+
+@pytest.mark.parametrize('zoom', [9, 11, 13])
+def test_polygon_cover(zoom):
+    region = PolygonRegion([TRIANGLE])
+    cover = region.cover(zoom)
+    envelope = BBoxRegion(*region.bounds()).cover(zoom)
+    ring = [lonlat_to_tile_xy(lon, lat, zoom) for lat, lon in TRIANGLE]
+
+    # 中心落在三角形内的瓦片都被覆盖，覆盖范围不超出外包矩形，且明显小于外包矩形
+    centers = {(x, y) for x, y in envelope if _inside((x + 0.5, y + 0.5), ring)}
+    assert centers <= cover <= envelope
+    if zoom >= 11:
+        assert len(cover) < 0.75 * len(envelope)
+
+
+def test_region_plan_union():
+    plan = TilePlan.from_regions([PolygonRegion([TRIANGLE]), BBoxRegion(*SAIGON)], 10, 12)
+    assert not plan.is_rectangular
+    for z in plan.zooms():
+        expected = PolygonRegion([TRIANGLE]).cover(z) | BBoxRegion(*SAIGON).cover(z)
+        assert {(x, y) for _, x, y in plan.tiles(z)} == expected
+        assert plan.count(z) == len(expected)
+        assert plan.envelope_count(z) >= plan.count(z)
+
+
+def test_merge_plans():
+    a = TilePlan(*SAIGON, min_zoom=10, max_zoom=11)
+    b = TilePlan.from_regions([PolygonRegion([TRIANGLE])], 11, 12)
+    merged = a.merge(b)
+    assert merged.zooms() == [10, 11, 12]
+    assert set(merged) == set(a) | set(b)
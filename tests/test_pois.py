@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""行程数据中的景点：解析 data.js、排除远点、按景点规划瓦片"""
+
+import os
+
+import pytest
+
+from tile_engine.plan import TilePlan, latlon_to_tile
+from tile_engine.pois import distance_km, load_pois, nearby, poi_regions
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA_JS = """
+const tourData = {
+    hotels: [
+        {
+            id: 'hotel-1',
+            name: "西贡酒店",
+            lat: 10.7769,
+            lng: 106.7009,
+            rooms: [
+                {
+                    id: 'r1',
+                    name: 'double',
+                }
+            ],
+        }
+    ],
+    attractions: [
+        {
+            id: 'a1',
+            name: '统一宫',
+            lat: 10.7770,
+            lng: 106.6953,
+            day: 2,
+        },
+        {
+            id: 'a2',
+            lat: 10.7798,
+            lng: 106.6990,
+            day: '3',
+        },
+        {
+            id: 'pudong',
+            name: '浦东机场',
+            lat: 31.1443,
+            lng: 121.8083,
+        }
+    ]
+};
+"""
+
+
+@pytest.fixture
+def data_js(tmp_path):
+    path = tmp_path / 'data.js'
+    path.write_text(DATA_JS, encoding='utf-8')
+    return str(path)
+
+
+def test_load_pois(data_js):
+    pois = load_pois(data_js)
+    # 没有坐标的对象（房型）不算景点
+    assert [p['id'] for p in pois] == ['hotel-1', 'a1', 'a2', 'pudong']
+    assert [p['section'] for p in pois] == ['hotels', 'attractions', 'attractions', 'attractions']
+    hotel, palace, church, _ = pois
+    assert hotel == {'id': 'hotel-1', 'name': '西贡酒店', 'section': 'hotels',
+                     'lat': 10.7769, 'lng': 106.7009, 'day': None}
+    assert palace['section'] == 'attractions' and palace['day'] == 2
+    # 没有名字时用 id；字符串形式的天数转为整数
+    assert church['name'] == 'a2' and church['day'] == 3
+
+
+def test_far_points_are_dropped(data_js):
+    kept, dropped = nearby(load_pois(data_js), max_km=100)
+    assert [p['id'] for p in dropped] == ['pudong']
+    assert len(kept) == 3
+
+
+def test_regions_cover_points(data_js):
+    kept, _ = nearby(load_pois(data_js))
+    regions = poi_regions(kept + kept[:1], radius_km=0.5)
+    # 坐标相同的点只取一次
+    assert len(regions) == 3
+    plan = TilePlan.from_regions(regions, 14, 16)
+    for poi in kept:
+        for zoom in (14, 16):
+            assert (zoom, *latlon_to_tile(poi['lat'], poi['lng'], zoom)) in plan
+    far = (16, *latlon_to_tile(10.80, 106.75, 16))
+    assert far not in plan
+
+
+def test_distance_km():
+    assert distance_km(10.0, 106.0, 10.0, 106.0) == 0
+    assert distance_km(10.0, 106.0, 11.0, 106.0) == pytest.approx(111.2, abs=0.5)
+
+
+def test_repo_data():
+    path = os.path.join(REPO, 'data', 'data.js')
+    if not os.path.exists(path):
+        pytest.skip('没有 data/data.js')
+    kept, _ = nearby(load_pois(path))
+    assert kept
+    # 行程在胡志明市附近
+    assert all(8 < p['lat'] < 13 and 104 < p['lng'] < 109 for p in kept)
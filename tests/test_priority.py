@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""优先级调度：按景点距离和层级排序，NumPy 与纯 Python 结果一致；预算用尽后停止"""
+
+import pytest
+
+from tile_engine import priority
+from tile_engine.plan import TilePlan, latlon_to_tile
+from tile_engine.priority import Budget, PriorityOrder
+
+HOTEL = (10.776, 106.700)
+AIRPORT = (10.818, 106.659)
+PLAN = TilePlan(10.70, 106.60, 10.90, 106.80, min_zoom=10, max_zoom=14)
+
+
+def test_tiles_covering_points_come_first():
+    order = PriorityOrder([HOTEL, AIRPORT], base_zoom=10)
+    tiles = list(order.plan_tiles(PLAN))
+    assert sorted(tiles) == sorted(PLAN.tiles())
+    costs = [order.cost(*tile) for tile in tiles]
+    assert costs == pytest.approx(sorted(costs), abs=1e-6)
+
+    # 覆盖景点的低层级瓦片排在最前面
+    assert tiles[0] == (10, *latlon_to_tile(*HOTEL, 10))
+    hotel_tile = (14, *latlon_to_tile(*HOTEL, 14))
+    corner = (14, *latlon_to_tile(10.70, 106.60, 14))
+    assert tiles.index(hotel_tile) < tiles.index(corner)
+    assert order.cost(*hotel_tile) == pytest.approx(4.0)
+
+
+def test_numpy_and_python_orders_agree(monkeypatch):
+    pytest.importorskip('numpy')
+    order = PriorityOrder([HOTEL], base_zoom=10, zoom_weight=0.5)
+    vectorized = list(order.plan_tiles(PLAN))
+    monkeypatch.setattr(priority, 'np', None)
+    fallback = list(order.plan_tiles(PLAN))
+    costs = [order.cost(*tile) for tile in vectorized]
+    assert costs == pytest.approx([order.cost(*tile) for tile in fallback], abs=1e-6)
+    assert set(vectorized) == set(fallback)
+
+
+def test_requires_points():
+    with pytest.raises(ValueError):
+        PriorityOrder([])
+
+
+def test_byte_budget_stops_taking_tiles():
+    class Store:
+        bytes_written = 0
+
+    store = Store()
+    budget = Budget(max_bytes=250, store=store)
+    taken = []
+    for tile in budget.limit(range(10)):
+        taken.append(tile)
+        store.bytes_written += 100
+    assert taken == [0, 1, 2] and budget.stopped == 'bytes'
+
+    unlimited = Budget()
+    assert list(unlimited.limit(range(5))) == list(range(5)) and unlimited.stopped is None
+
+
+def test_time_budget(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(priority.time, 'monotonic', lambda: now[0])
+    budget = Budget(seconds=60)
+    taken = []
+    for tile in budget.limit(range(10)):
+        taken.append(tile)
+        now[0] += 25
+    assert taken == [0, 1, 2] and budget.stopped == 'time'
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""进度事件：多进程合并、定时写出，以及被强制结束的轮次过期"""
+
+import json
+import time
+
+import pytest
+
+from tile_engine import progress
+from tile_engine.progress import ProgressLog, ProgressTail, STALE_AFTER
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / 'progress.jsonl')
+
+
+def write_events(path, *events):
+    with open(path, 'a') as f:
+        for event in events:
+            f.write(json.dumps(event) + '\n')
+
+
+def start(run, t, total=10, done=0):
+    return {'e': 'start', 't': t, 'run': run, 'mode': 'fast', 'total': {'12': total}, 'done': {'12': done}}
+
+
+def tile(run, t, x=0):
+    return {'e': 'tile', 't': t, 'run': run, 'z': 12, 'x': x, 'y': 0, 'b': 100, 'r': 'success'}
+
+
+def test_runs_merge_and_end(log_path):
+    now = time.time()
+    write_events(log_path, start('a', now), tile('a', now), start('b', now, done=1), tile('b', now, 1))
+    tail = ProgressTail(log_path)
+    assert tail.poll(now) == 4
+    assert tail.running and tail.done == {12: 2} and tail.total == {12: 10}
+
+    write_events(log_path, {'e': 'end', 't': now, 'run': 'a'})
+    tail.poll(now)
+    assert tail.running
+    write_events(log_path, {'e': 'end', 't': now, 'run': 'b'})
+    tail.poll(now)
+    assert not tail.running and tail.expired == 0
+
+
+def test_killed_run_expires(log_path):
+    now = time.time()
+    write_events(log_path, start('killed', now - 100), tile('killed', now - 99))
+    tail = ProgressTail(log_path)
+    tail.poll(now)
+    # 没有结束事件，但早已静默
+    assert not tail.running and tail.expired == 1
+    # 之后开始的新一轮不与中断的轮次合并
+    write_events(log_path, start('next', now, total=5, done=3))
+    tail.poll(now)
+    assert tail.running and tail.total == {12: 5} and tail.done == {12: 3}
+
+
+def test_killed_run_is_dropped_when_replaying(log_path):
+    """回放历史日志：中断的轮次不会挡住后面新一轮的重置"""
+    now = time.time()
+    write_events(log_path, start('killed', now - 1000, total=50), tile('killed', now - 999),
+                 start('next', now, total=5, done=3))
+    tail = ProgressTail(log_path)
+    tail.poll(now)
+    assert tail.running and tail.expired == 1
+    assert tail.total == {12: 5} and tail.done == {12: 3}
+
+
+def test_quiet_run_stays_alive_with_heartbeats(log_path):
+    now = time.time()
+    write_events(log_path, start('slow', now))
+    tail = ProgressTail(log_path)
+    tail.poll(now)
+    write_events(log_path, {'e': 'alive', 't': now + STALE_AFTER, 'run': 'slow'})
+    tail.poll(now + STALE_AFTER + 1)
+    assert tail.running and tail.expired == 0
+    tail.poll(now + 2 * STALE_AFTER + 1)
+    assert not tail.running and tail.expired == 1
+
+
+def test_timer_flushes_and_heartbeats(log_path, monkeypatch):
+    monkeypatch.setattr(progress, 'FLUSH_INTERVAL', 0.05)
+    monkeypatch.setattr(progress, 'HEARTBEAT_INTERVAL', 0.2)
+    log = ProgressLog(log_path)
+    log.start('fast', {12: 10}, {12: 0})
+    tail = ProgressTail(log_path)
+    try:
+        tail.poll()
+        assert tail.running and tail.done == {12: 0}
+
+        # 攒批中的事件不等下一个瓦片，由后台线程按时写出
+        log.tile(12, 1, 1, 100)
+        time.sleep(0.15)
+        tail.poll()
+        assert tail.done == {12: 1} and tail.bytes == 100
+
+        # 静默期间写出 alive
+        time.sleep(0.5)
+        with open(log_path) as f:
+            kinds = [json.loads(line)['e'] for line in f]
+        assert 'alive' in kinds
+    finally:
+        log.end()
+    tail.poll()
+    assert not tail.running
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""自适应令牌桶：不限流起步、第一次 429 降速、Retry-After 暂停和回升"""
+
+import argparse
+from email.utils import formatdate
+
+import pytest
+
+from tile_engine import ratelimit
+from tile_engine.commands.common import make_limiter
+from tile_engine.fetcher import FetchResult
+from tile_engine.ratelimit import TokenBucket, RECOVERY_STEP, parse_retry_after
+
+
+class Clock:
+    """可手动推进的 time.monotonic"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    return clock
+
+
+def throttled(retry_after='1'):
+    return FetchResult(429, headers={'Retry-After': retry_after})
+
+
+def send(bucket, clock, count, seconds):
+    """在 seconds 秒内均匀发出 count 个请求，返回各次需要等待的时间"""
+    waits = []
+    for _ in range(count):
+        waits.append(bucket.reserve())
+        clock.now += seconds / count
+    return waits
+
+
+def test_unthrottled_until_first_429(clock):
+    bucket = TokenBucket()
+    # 不限流阶段不等待，只统计实际速率（每秒 40 个）
+    assert send(bucket, clock, 120, 3.0) == [0.0] * 120
+    assert bucket.rate is None
+
+    bucket.observe(throttled('0'))
+    assert bucket.throttled_count == 1
+    assert bucket.rate == pytest.approx(20.0, rel=0.1)
+    # 之后按新速率排队（降速时清空了桶中的令牌）
+    waits = send(bucket, clock, 60, 0.0)
+    assert waits[-1] == pytest.approx(60 / bucket.rate, rel=0.1)
+
+
+def test_retry_after_pauses_sending(clock):
+    bucket = TokenBucket(rate=100)
+    bucket.observe(throttled('7'))
+    assert bucket.reserve() >= 7.0
+    clock.now += 7.5
+    assert bucket.reserve() < 0.1
+
+    # HTTP 日期格式
+    assert parse_retry_after(formatdate(ratelimit.time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after('soon') is None
+
+
+def test_burst_of_429_halves_once(clock):
+    bucket = TokenBucket(rate=40)
+    for _ in range(10):
+        bucket.observe(throttled('2'))
+    assert bucket.rate == 20 and bucket.throttled_count == 10
+    # 暂停结束后再次被限流才继续降速
+    clock.now += 2.5
+    bucket.observe(throttled('2'))
+    assert bucket.rate == 10
+
+
+def test_recovers_to_previous_rate_quickly(clock):
+    bucket = TokenBucket(rate=20)
+    bucket.observe(throttled('0'))
+    assert bucket.rate == 10
+
+    successes = 0
+    while bucket.rate < 20:
+        bucket.observe(FetchResult(200))
+        successes += 1
+    # 回到降速前的速率所需的成功次数与速率无关（约 ln2 / RECOVERY_STEP）
+    assert successes <= 40
+    # 超过降速前的速率后只小幅试探
+    before = bucket.rate
+    for _ in range(20):
+        bucket.reward()
+    assert bucket.rate == pytest.approx(before + 20 * bucket.increase)
+
+
+def test_max_rate_caps_recovery(clock):
+    bucket = TokenBucket(rate=10, max_rate=12)
+    for _ in range(1000):
+        bucket.reward()
+    assert bucket.rate == 12
+    assert RECOVERY_STEP > 0
+
+
+def test_rate_zero_disables_limiter():
+    def args(rate, max_rate=None):
+        return argparse.Namespace(rate=rate, max_rate=max_rate)
+
+    assert make_limiter(args(0)) is None
+    assert make_limiter(args(None)).rate is None
+    limiter = make_limiter(args(5, 8))
+    assert (limiter.rate, limiter.max_rate) == (5, 8)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""增量刷新：按年龄挑出到期瓦片，304 和内容未变时不重写文件"""
+
+import os
+import time
+
+import pytest
+
+from tile_engine.downloader import download_threaded, save_result
+from tile_engine.fetcher import Fetcher, FetchResult
+from tile_engine.plan import TilePlan
+from tile_engine.refresh import DAY, RefreshPolicy, parse_zoom_ages
+from tile_engine.stub_server import StubTileServer, make_png
+
+PLAN = TilePlan(10.76, 106.68, 10.80, 106.72, min_zoom=13, max_zoom=14)
+
+
+def download(server, store, tiles, refresh=False):
+    fetcher = Fetcher(server.url_template, pool_size=4)
+    try:
+        stats = download_threaded(list(tiles), fetcher, store, 4, refresh=refresh)
+    finally:
+        fetcher.close()
+    store.flush()
+    return stats
+
+
+def mtimes(store, tiles):
+    return {tile: os.stat(store.path(*tile)).st_mtime_ns for tile in tiles}
+
+
+def test_parse_zoom_ages():
+    assert parse_zoom_ages(['15=7', '14=0.5']) == {15: 7.0, 14: 0.5}
+    assert parse_zoom_ages(None) == {}
+    policy = RefreshPolicy({15: 7}, default_age=30)
+    assert policy.age_days(15) == 7 and policy.age_days(12) == 30
+
+
+def test_due_tiles_by_age(stub_server, make_store):
+    store = make_store()
+    download(stub_server, store, PLAN)
+    policy = RefreshPolicy({14: 7}, default_age=30)
+    now = time.time()
+
+    assert policy.due_tiles(store, PLAN, 14, now) == []
+    assert sorted(policy.due_tiles(store, PLAN, 14, now + 8 * DAY)) == sorted(PLAN.tiles(14))
+    # z13 按默认的 30 天
+    assert policy.due_tiles(store, PLAN, 13, now + 8 * DAY) == []
+    assert len(policy.due_tiles(store, PLAN, 13, now + 31 * DAY)) == PLAN.count(13)
+
+    with pytest.raises(ValueError):
+        policy.due_tiles(make_store('plain', manifest=False), PLAN, 14)
+
+
+def test_conditional_refresh(make_store):
+    store = make_store()
+    tiles = list(PLAN.tiles(14))
+    with StubTileServer() as server:
+        download(server, store, tiles)
+        before = mtimes(store, tiles)
+        checked = {tile: store.manifest.get(*tile)['updated'] for tile in tiles}
+        time.sleep(0.01)
+
+        # 内容没变：服务器返回 304，只更新确认时间
+        stats = download(server, store, tiles, refresh=True)
+        assert stats['not_modified'] == len(tiles) and stats['success'] == 0
+        assert server.statuses[304] == len(tiles)
+    assert mtimes(store, tiles) == before
+    assert all(store.manifest.get(*tile)['updated'] > checked[tile] for tile in tiles)
+
+    # 服务器上的瓦片更新了：重新下载并改写
+    new_body = make_png(color=(1, 2, 3))
+    with StubTileServer(body=new_body) as server:
+        stats = download(server, store, tiles, refresh=True)
+        assert stats['success'] == len(tiles)
+    assert all(store.read(*tile) == new_body for tile in tiles)
+    assert store.validators(*tiles[0])['If-None-Match'] == server.etag
+
+
+def test_same_content_without_304_is_not_rewritten(make_store):
+    store = make_store()
+    body = make_png(size=8)
+    store.write(14, 1, 1, body, {'ETag': '"old"'})
+    store.flush()
+    before = os.stat(store.path(14, 1, 1)).st_mtime_ns
+
+    result = FetchResult(200, body, {'ETag': '"new"'})
+    assert save_result(store, 14, 1, 1, result, refresh=True) == 'not_modified'
+    assert os.stat(store.path(14, 1, 1)).st_mtime_ns == before
+    assert store.validators(14, 1, 1)['If-None-Match'] == '"new"'
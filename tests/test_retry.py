@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""重试策略、重试队列和失败报告"""
+
+import json
+
+import pytest
+
+from tile_engine import retry as retry_module
+from tile_engine.retry import (RetryPolicy, RetryQueue, is_retriable, write_failure_report,
+                               load_failure_report)
+
+
+def test_retriable_results():
+    assert is_retriable('error_timed out')
+    assert is_retriable('failed_429') and is_retriable('failed_503')
+    assert not is_retriable('failed_404') and not is_retriable('failed_xyz')
+    assert not is_retriable('success') and not is_retriable('exists')
+
+
+@pytest.mark.parametrize('attempt', [1, 2, 3, 5, 10])
+def test_backoff_bounds(attempt):
+    policy = RetryPolicy(base_delay=0.5, max_delay=4.0)
+    bound = min(4.0, 0.5 * 2 ** (attempt - 1))
+    delays = [policy.delay(attempt) for _ in range(200)]
+    assert all(0 <= d <= bound for d in delays)
+    # 全抖动：不是固定值
+    assert len(set(delays)) > 1
+
+
+def test_attempts_exhausted():
+    queue = RetryQueue(RetryPolicy(max_attempts=3, base_delay=0, max_delay=0))
+    tile = (14, 1, 2)
+    assert queue.offer(tile, 1, 'failed_503')
+    assert queue.offer(tile, 2, 'failed_503')
+    assert not queue.offer(tile, 3, 'failed_503')
+    # 不可重试的结果直接放弃
+    assert not queue.offer((14, 1, 3), 1, 'failed_404')
+
+    assert queue.retried == 2 and len(queue) == 2
+    assert queue.failures == [
+        {'z': 14, 'x': 1, 'y': 2, 'attempts': 3, 'result': 'failed_503'},
+        {'z': 14, 'x': 1, 'y': 3, 'attempts': 1, 'result': 'failed_404'},
+    ]
+    # 出队时带上下一次的尝试序号
+    assert queue.pop_ready() == [(tile, 2), (tile, 3)]
+
+
+def test_heap_orders_by_due_time(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(retry_module.time, 'monotonic', lambda: now[0])
+    queue = RetryQueue(RetryPolicy(max_attempts=5))
+    delays = {(1, 0, 0): 3.0, (1, 0, 1): 1.0, (1, 1, 0): 2.0, (1, 1, 1): 1.0}
+    for tile, delay in delays.items():
+        monkeypatch.setattr(queue.policy, 'delay', lambda attempt, delay=delay: delay)
+        queue.offer(tile, 1, 'error_reset')
+
+    assert queue.pop_ready() == []
+    assert queue.next_wait() == 1.0
+    now[0] = 101.0
+    # 就绪时间相同时按提交顺序
+    assert queue.pop_ready() == [((1, 0, 1), 2), ((1, 1, 1), 2)]
+    assert queue.next_wait() == 1.0
+    now[0] = 110.0
+    assert queue.pop_ready() == [((1, 1, 0), 2), ((1, 0, 0), 2)]
+    assert queue.next_wait() is None and len(queue) == 0
+
+
+def test_failure_report_round_trip(tmp_path):
+    path = str(tmp_path / 'failed.json')
+    failures = [
+        {'z': 15, 'x': 9, 'y': 1, 'attempts': 4, 'result': 'failed_503'},
+        {'z': 14, 'x': 2, 'y': 7, 'attempts': 1, 'result': 'failed_404'},
+        {'z': 15, 'x': 3, 'y': 8, 'attempts': 4, 'result': 'error_超时'},
+    ]
+    write_failure_report(path, failures, total=100)
+
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    assert report['total'] == 100 and report['failed'] == 3
+    assert report['failures'][1]['result'] == 'error_超时'
+    assert load_failure_report(path) == [(14, 2, 7), (15, 3, 8), (15, 9, 1)]
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""本地瓦片服务器：合并并发补齐、重新下载被删除的瓦片、HEAD 请求"""
+
+import os
+import threading
+
+import pytest
+import requests
+
+from tile_engine.fetcher import Fetcher
+from tile_engine.server import TileCache, TileServer
+from tile_engine.stub_server import StubTileServer
+
+TILE = (12, 3215, 1920)
+
+
+@pytest.fixture
+def slow_server():
+    """每个请求延迟 0.3 秒，足够让并发请求在同一次下载上重叠"""
+    with StubTileServer(latency=0.3) as server:
+        yield server
+
+
+@pytest.fixture
+def fetcher(slow_server):
+    fetcher = Fetcher(slow_server.url_template, pool_size=8)
+    yield fetcher
+    fetcher.close()
+
+
+@pytest.fixture
+def tile_server(tmp_path, make_store, fetcher):
+    docs = tmp_path / 'docs'
+    docs.mkdir()
+    (docs / 'index.html').write_text('<html></html>')
+    server = TileServer(TileCache(make_store(), fetcher), root=str(docs), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_concurrent_gets_fetch_upstream_once(slow_server, fetcher, make_store):
+    store = make_store()
+    cache = TileCache(store, fetcher)
+    results = []
+    barrier = threading.Barrier(8)
+
+    def get():
+        barrier.wait()
+        results.append(cache.get(*TILE))
+
+    threads = [threading.Thread(target=get) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert slow_server.request_count == 1
+    assert len({data for data, _ in results}) == 1 and results[0][0] is not None
+    assert cache.stats['upstream'] == 1 and cache.stats['coalesced'] == 7
+    assert store.exists(*TILE)
+
+    # 之后从内存返回，不再请求上游
+    assert cache.get(*TILE)[1] == 'memory'
+    assert slow_server.request_count == 1
+
+
+def test_deleted_file_is_fetched_again(slow_server, fetcher, make_store):
+    store = make_store()
+    assert TileCache(store, fetcher).get(*TILE)[1] == 'upstream'
+    store.flush()
+    os.remove(store.path(*TILE))
+    # 清单仍记为已下载，文件却不在
+    assert store.exists(*TILE)
+
+    cache = TileCache(store, fetcher)
+    data, source = cache.get(*TILE)
+    assert source == 'upstream' and data is not None
+    assert slow_server.request_count == 2
+    assert os.path.exists(store.path(*TILE))
+
+
+def test_readonly_cache_reports_missing(make_store):
+    cache = TileCache(make_store())
+    assert cache.get(*TILE) == (None, 'missing')
+    assert cache.stats['missing'] == 1
+
+
+def test_head_goes_through_tile_cache(tile_server, slow_server):
+    url = tile_server.url + 'tiles/{}/{}/{}.png'.format(*TILE)
+    head = requests.head(url, timeout=10)
+    assert head.status_code == 200
+    assert head.headers['Content-Type'] == 'image/png'
+    assert head.headers['X-Tile-Source'] == 'upstream'
+    assert head.content == b''
+
+    get = requests.get(url, timeout=10)
+    assert get.headers['X-Tile-Source'] == 'memory'
+    assert int(head.headers['Content-Length']) == len(get.content)
+    assert slow_server.request_count == 1
+
+    # 超出范围的坐标不补齐；静态文件照常返回
+    assert requests.head(tile_server.url + 'tiles/1/5/5.png', timeout=10).status_code == 404
+    assert requests.head(tile_server.url + 'index.html', timeout=10).status_code == 200
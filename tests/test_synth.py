@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""瓦片合成：子瓦片缩小成父瓦片、祖先瓦片放大，结果标记为合成"""
+
+import io
+import math
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from tile_engine.plan import TilePlan, latlon_to_tile  # noqa: E402
+from tile_engine.stub_server import make_png  # noqa: E402
+from tile_engine.synth import SYNTH_DOWN, SYNTH_UP, child_tiles, downsample, synthesize  # noqa: E402
+
+COLORS = [(255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0)]
+
+
+def tile_bbox(z, x, y, inset=0.01):
+    """瓦片内部稍微缩进的经纬度范围，下一级正好覆盖它的 4 个子瓦片"""
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / 2 ** z))))
+    west, east = x / 2 ** z * 360 - 180, (x + 1) / 2 ** z * 360 - 180
+    north, south = lat(y), lat(y + 1)
+    dx, dy = (east - west) * inset, (north - south) * inset
+    return south + dy, west + dx, north - dy, east - dx
+
+
+def near(pixel, color, tolerance=4):
+    """量化到调色板后颜色会有细微偏差"""
+    return all(abs(a - b) <= tolerance for a, b in zip(pixel, color))
+
+
+def decode(data):
+    return Image.open(io.BytesIO(data)).convert('RGB')
+
+
+def test_downsample_keeps_quadrants():
+    parent = decode(downsample([make_png(256, color) for color in COLORS]))
+    assert parent.size == (256, 256)
+    for (cx, cy), color in zip([(64, 64), (192, 64), (64, 192), (192, 192)], COLORS):
+        assert near(parent.getpixel((cx, cy)), color)
+
+
+def test_downsample_leaves_missing_children_transparent():
+    image = Image.open(io.BytesIO(downsample([make_png(256, COLORS[0]), None, None, None]))).convert('RGBA')
+    assert image.getpixel((64, 64))[3] > 250
+    assert image.getpixel((192, 192))[3] == 0
+
+
+def test_synthesize_fills_both_directions(make_store):
+    parent = (10, *latlon_to_tile(10.8, 106.7, 10))
+    plan = TilePlan(*tile_bbox(*parent), min_zoom=10, max_zoom=12)
+    children = child_tiles(*parent)
+    assert set(plan.tiles(11)) == set(children)
+
+    store = make_store()
+    for child, color in zip(children, COLORS):
+        store.write(*child, make_png(256, color))
+    store.flush()
+
+    stats = synthesize(store, plan, workers=2)
+    assert stats[10] == {'down': 1, 'up': 0, 'errors': 0}
+    assert stats[12]['up'] == plan.count(12) and stats[12]['errors'] == 0
+
+    image = decode(store.read(*parent))
+    assert image.size == (256, 256)
+    assert near(image.getpixel((64, 64)), COLORS[0])
+    assert store.manifest.synthetic(SYNTH_DOWN) == {parent}
+    assert store.manifest.synthetic(SYNTH_UP) == set(plan.tiles(12))
+    # 放大的瓦片取自对应子瓦片的颜色
+    z, x, y = next(iter(plan.tiles(12)))
+    source = children.index((11, x >> 1, y >> 1))
+    assert near(decode(store.read(z, x, y)).getpixel((128, 128)), COLORS[source])
+
+    # 再次运行没有可合成的瓦片
+    again = synthesize(store, plan, workers=2)
+    assert all(s == {'down': 0, 'up': 0, 'errors': 0} for s in again.values())
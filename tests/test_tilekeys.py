@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""瓦片编码与 TileKeys 集合（有无 NumPy 结果相同）"""
+
+from tile_engine import tilekeys
+from tile_engine.tilekeys import TileKeys, encode, decode, cell_keys, rect_keys, span_keys
+
+
+def test_key_roundtrip_and_order():
+    tiles = [(0, 0, 0), (10, 812, 483), (18, 207000, 123456), (29, (1 << 29) - 1, (1 << 29) - 1)]
+    assert [decode(encode(*tile)) for tile in tiles] == tiles
+    # 编码大小顺序与 z、x、y 顺序一致
+    shuffled = [(10, 5, 1), (9, 7, 7), (10, 4, 9), (10, 5, 0)]
+    assert sorted(shuffled) == [decode(k) for k in sorted(encode(*t) for t in shuffled)]
+
+
+def test_tile_keys_membership_and_dedup():
+    keys = TileKeys.from_cells(12, [(3, 4), (1, 2), (3, 4), (2, 9)])
+    assert len(keys) == 3
+    assert list(keys) == [(1, 2), (2, 9), (3, 4)]
+    assert (2, 9) in keys and (9, 2) not in keys and (-1, 0) not in keys
+    assert keys.bounds() == (1, 3, 2, 9)
+    assert keys.count_in(cell_keys(12, [(1, 2), (3, 4), (5, 5)])) == 2
+
+
+def test_tile_keys_without_numpy(monkeypatch):
+    monkeypatch.setattr(tilekeys, 'np', None)
+    keys = TileKeys.from_cells(12, [(3, 4), (1, 2), (3, 4)])
+    assert list(keys) == [(1, 2), (3, 4)]
+    assert (3, 4) in keys
+    assert keys.count_in(cell_keys(12, [(3, 4), (7, 7)])) == 1
+
+
+def test_rect_and_span_keys_agree():
+    # 矩形按行展开的区间与 rect_keys 相同
+    rect = rect_keys(11, 3, 5, 7, 9)
+    spans = span_keys(11, [7, 8, 9], [3, 3, 3], [5, 5, 5])
+    assert sorted(rect.tolist()) == sorted(spans.tolist())
+    assert [decode(k) for k in rect.tolist()] == [(11, x, y) for x in range(3, 6) for y in range(7, 10)]
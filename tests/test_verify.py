@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""瓦片校验：各类损坏的识别、增量跳过和坏瓦片处理"""
+
+import os
+import zlib
+import struct
+
+import pytest
+
+from tile_engine.verify import check_png, verify_store, discard_bad
+
+from conftest import tile_png
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def chunk(kind, body, crc=None):
+    if crc is None:
+        crc = zlib.crc32(kind + body)
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', crc)
+
+
+def build_png(width=4, height=4, bit_depth=8, color_type=2, idat=None, ihdr_length=13):
+    """按块拼出 PNG，可以单独写坏某一部分"""
+    header = struct.pack('>IIBBBBB', width, height, bit_depth, color_type, 0, 0, 0)[:ihdr_length]
+    if idat is None:
+        idat = zlib.compress((b'\x00' + b'\x10\x20\x30' * width) * height)
+    return SIGNATURE + chunk(b'IHDR', header) + chunk(b'IDAT', idat) + chunk(b'IEND', b'')
+
+
+def test_good_png():
+    assert check_png(build_png()) is None
+    assert check_png(tile_png((1, 2, 3))) is None
+
+
+@pytest.mark.parametrize('data, reason', [
+    (b'', 'empty'),
+    (b'<html>502 Bad Gateway</html>', 'html'),
+    (b'GIF89a....', 'not_png'),
+    # 文件在 IDAT 中间被截断
+    (build_png()[:40], 'truncated'),
+    # IDAT 完整但少了 IEND
+    (build_png()[:-12], 'truncated'),
+    # IDAT 压缩流被截断，块本身的 CRC 仍然正确
+    (build_png(idat=zlib.compress(b'\x00' + b'\x10\x20\x30' * 4)[:-6]), 'zlib'),
+    # 压缩流完好，像素数据少了一行
+    (build_png(idat=zlib.compress((b'\x00' + b'\x10\x20\x30' * 4) * 3)), 'pixels'),
+    # 行过滤类型非法
+    (build_png(idat=zlib.compress((b'\x07' + b'\x10\x20\x30' * 4) * 4)), 'pixels'),
+    # 错误的 IHDR：长度、位深、宽度为 0、调色板图缺少 PLTE
+    (build_png(ihdr_length=12), 'header'),
+    (build_png(bit_depth=3), 'header'),
+    (build_png(width=0), 'header'),
+    (build_png(color_type=3), 'header'),
+])
+def test_corruption_reasons(data, reason):
+    assert check_png(data) == reason
+
+
+def test_bad_crc():
+    data = bytearray(build_png())
+    # 改动 IDAT 中的一个字节，CRC 不再匹配
+    data[len(SIGNATURE) + 25 + 10] ^= 0xff
+    assert check_png(bytes(data)) == 'crc'
+
+    bad_crc = SIGNATURE + chunk(b'IHDR', struct.pack('>IIBBBBB', 4, 4, 8, 2, 0, 0, 0), crc=0)
+    assert check_png(bad_crc) == 'crc'
+
+
+def test_incremental_skip_and_discard(make_store):
+    store = make_store()
+    tiles = [(12, x, 7) for x in range(6)]
+    for i, tile in enumerate(tiles):
+        store.write(*tile, tile_png((i, 0, 0)))
+    store.flush()
+
+    stats, bad = verify_store(store, workers=2)
+    assert stats[12]['checked'] == 6 and bad == []
+
+    # 没有变化：全部跳过
+    stats, bad = verify_store(store, workers=2)
+    assert stats[12] == {'checked': 0, 'skipped': 6, 'bad': 0, 'bytes': 0}
+
+    # 被改写的文件（大小或修改时间变了）重新检查
+    with open(store.path(*tiles[2]), 'wb') as f:
+        f.write(build_png()[:40])
+    mtime = os.stat(store.path(*tiles[3])).st_mtime_ns + 10 ** 9
+    os.utime(store.path(*tiles[3]), ns=(mtime, mtime))
+    stats, bad = verify_store(store, workers=2)
+    assert stats[12]['checked'] == 2 and stats[12]['skipped'] == 4
+    assert bad == [(12, 2, 7, 'truncated')]
+
+    # force 忽略增量记录
+    stats, _ = verify_store(store, workers=2, force=True)
+    assert stats[12]['checked'] == 6
+
+    discard_bad(store, bad)
+    assert not store.exists(*tiles[2])
+    assert not os.path.exists(store.path(*tiles[2]))
+    assert store.manifest.get(*tiles[2])['result'] == 'corrupt_truncated'
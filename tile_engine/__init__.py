@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片引擎 - 离线地图瓦片的规划、下载与存储
+
+    TilePlan   一次性计算各缩放级别的瓦片范围
+    Fetcher    可替换的瓦片抓取器
+    TileStore  目录布局的瓦片存储（MBTilesStore 为单文件归档）
+    Manifest   记录每个瓦片状态的 SQLite 清单
+
+根目录下的 download_tiles.py 等脚本只是本包命令行模式的快捷入口，
+也可以直接运行 python -m tile_engine <模式>。
+"""
+
+from .plan import TilePlan, latlon_to_tile, bbox_tile_range
+from .tilekeys import TileKeys, latlon_to_tiles
+from .fetcher import Fetcher, FetchResult
+from .store import BaseTileStore, TileStore
+from .mbtiles import MBTilesStore, open_tile_store, export_tiles
+from .manifest import Manifest
+from .ratelimit import TokenBucket
+from .retry import RetryPolicy, RetryQueue
+from .downloader import download_tile, download_sequential, download_threaded
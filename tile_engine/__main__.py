@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""python -m tile_engine 入口"""
+
+from .cli import main
+
+if __name__ == "__main__":
+    main()
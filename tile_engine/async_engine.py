@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio 下载引擎
+
+所有瓦片请求在同一个事件循环里发出，复用少量长连接（keep-alive，
+https 且安装了 h2 时使用 HTTP/2 多路复用），并发数由信号量限制。
+相比线程池 + 每个瓦片新建连接，省掉了大量 TCP/TLS 握手和线程开销。
+保存瓦片（写文件、改名、清单提交）用 asyncio.to_thread 放到线程中，不阻塞事件循环。
+
+依赖 httpx（可选）:
+    pip install httpx[http2]
+"""
+
+import time
+import asyncio
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import h2  # noqa: F401  仅用于检测 HTTP/2 支持
+    HAS_HTTP2 = True
+except ImportError:
+    HAS_HTTP2 = False
+
+from .config import TILE_URL, HEADERS, TIMEOUT
+from .fetcher import FetchResult, IncompleteTile, check_tile, CHUNK_SIZE, MAX_TILE_SIZE
+from .retry import RetryQueue
+from .downloader import OK_RESULTS, WINDOW_PER_WORKER, save_result, new_stats, count_result, task_total
+
+# 默认参数
+ASYNC_CONCURRENCY = 64    # 同时在途的请求数
+ASYNC_CONNECTIONS = 8     # 连接池大小
+
+
+async def read_body_async(response):
+    """
+    按块读取 httpx 的流式响应，与 read_body 一样超过 MAX_TILE_SIZE 即中止
+
+    返回:
+        bytes: 响应体
+    """
+    body = bytearray()
+    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+        if len(body) + len(chunk) > MAX_TILE_SIZE:
+            raise IncompleteTile(f"响应超过 {MAX_TILE_SIZE} 字节")
+        body += chunk
+    return bytes(body)
+
+
+class AsyncFetcher:
+    """
+    基于 httpx.AsyncClient 的异步瓦片抓取器
+
+    用法:
+        async with AsyncFetcher() as fetcher:
+            result = await fetcher.fetch(z, x, y)
+    """
+
+    def __init__(self, url_template=TILE_URL, headers=HEADERS, timeout=TIMEOUT,
+                 max_connections=ASYNC_CONNECTIONS, http2=True, metrics=None, pool=None):
+        if httpx is None:
+            raise RuntimeError("异步引擎需要 httpx: pip install httpx[http2]")
+        self.url_template = url_template
+        self.headers = dict(headers)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.http2 = http2 and HAS_HTTP2
+        self.metrics = metrics
+        # 可选的 EndpointPool，指定时在多个地址之间分配请求（见 mirrors.py）
+        self.pool = pool
+        self._client = None
+
+    def url_for(self, z, x, y):
+        """生成瓦片 URL"""
+        return self.url_template.format(z=z, x=x, y=y)
+
+    async def open(self):
+        """创建连接池"""
+        limits = httpx.Limits(max_connections=self.max_connections,
+                              max_keepalive_connections=self.max_connections)
+        self._client = httpx.AsyncClient(headers=self.headers, timeout=self.timeout,
+                                         limits=limits, http2=self.http2)
+
+    async def close(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def fetch(self, z, x, y, validators=None):
+        """
+        下载单个瓦片
+
+        参数:
+            validators: 条件请求头（If-None-Match / If-Modified-Since）
+
+        返回:
+            FetchResult，网络异常和 IncompleteTile 直接向上抛出
+        """
+        if self.pool is not None:
+            return await self.pool.fetch_async(self.fetch_url, z, x, y, validators)
+        return await self.fetch_url(self.url_for(z, x, y), validators)
+
+    async def fetch_url(self, url, validators=None):
+        """按完整 URL 下载单个瓦片，返回值同 fetch"""
+        if self.metrics is None:
+            async with self._client.stream('GET', url, headers=validators) as response:
+                content = await read_body_async(response)
+        else:
+            response, content = await self._timed_get(url, validators)
+        if response.status_code == 200:
+            check_tile(content, response.headers)
+        return FetchResult(response.status_code, content, response.headers)
+
+    async def _timed_get(self, url, validators):
+        """流式请求，用 httpx 的 trace 扩展记录建连耗时，另外记录首字节和响应体耗时"""
+        metrics = self.metrics
+        marks = {}
+
+        async def trace(event, info):
+            if event == 'connection.connect_tcp.started':
+                marks['connect'] = time.perf_counter()
+            elif event in ('connection.connect_tcp.complete', 'connection.start_tls.complete'):
+                marks['connected'] = time.perf_counter()
+
+        metrics.begin()
+        start = time.perf_counter()
+        try:
+            async with self._client.stream('GET', url, headers=validators,
+                                           extensions={'trace': trace}) as response:
+                first_byte = time.perf_counter()
+                content = await read_body_async(response)
+        except Exception as e:
+            metrics.observe_error(e)
+            raise
+        connect = marks['connected'] - marks['connect'] if 'connected' in marks else None
+        metrics.observe_response(response.status_code, len(content), connect,
+                                 first_byte - start, time.perf_counter() - first_byte)
+        return response, content
+
+
+async def download_tile_async(fetcher, store, z, x, y, limiter=None, refresh=False):
+    """异步下载单个瓦片，参数和返回值与 download_tile 相同"""
+    validators = None
+    if refresh:
+        validators = await asyncio.to_thread(store.validators, z, x, y)
+    elif store.exists(z, x, y):
+        return 'exists'
+
+    if limiter:
+        await limiter.acquire_async()
+
+    try:
+        result = await fetcher.fetch(z, x, y, validators)
+    except Exception as e:
+        return f'error_{str(e) or type(e).__name__}'
+
+    if limiter:
+        limiter.observe(result)
+
+    # 写文件、改名和清单提交都是阻塞调用，放到线程里执行，不卡住其他在途请求
+    return await asyncio.to_thread(save_result, store, z, x, y, result, refresh)
+
+
+async def download_all_async(tasks, fetcher, store, concurrency=ASYNC_CONCURRENCY, on_result=None,
+                             limiter=None, retry=None, refresh=False, total=None, window=None):
+    """
+    在一个事件循环里并发下载全部瓦片
+
+    瓦片从 tasks 中按需取出，同时存在的协程不超过 window 个；
+    失败的瓦片在退避期间释放信号量，不占用并发名额（但仍占窗口）。
+
+    参数:
+        tasks: (z, x, y) 列表或迭代器，可以跨多个缩放级别
+        fetcher: 已打开的 AsyncFetcher
+        concurrency: 同时在途的请求数上限
+        on_result: 每个瓦片得到最终结果时调用 on_result(done, total, tile, result)
+        limiter: 共享的 TokenBucket
+        retry: RetryQueue，这里只使用其策略和 failures 记录
+        refresh: 刷新模式，见 download_tile
+        total: 瓦片总数，tasks 为迭代器时用于 on_result
+        window: 同时存在的瓦片协程上限，默认 concurrency * WINDOW_PER_WORKER
+
+    返回:
+        dict: 各结果的计数，同 download_threaded
+    """
+    retry = retry if retry is not None else RetryQueue()
+    policy = retry.policy
+    stats = new_stats()
+    total = task_total(tasks, total)
+    semaphore = asyncio.Semaphore(concurrency)
+    slots = asyncio.Semaphore(window or concurrency * WINDOW_PER_WORKER)
+    running = set()
+    errors = []
+    done = 0
+
+    async def worker(tile):
+        nonlocal done
+        attempt = 1
+        try:
+            while True:
+                async with semaphore:
+                    result = await download_tile_async(fetcher, store, *tile, limiter, refresh)
+                if result in OK_RESULTS or not policy.should_retry(result, attempt):
+                    break
+                retry.retried += 1
+                await asyncio.sleep(policy.delay(attempt))
+                attempt += 1
+        finally:
+            slots.release()
+
+        count_result(stats, result)
+        if result not in OK_RESULTS:
+            retry.offer(tile, attempt, result)
+
+        done += 1
+        if on_result:
+            on_result(done, total, tile, result)
+
+    def finished(task):
+        running.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    for tile in tasks:
+        await slots.acquire()
+        if errors:
+            break
+        task = asyncio.create_task(worker(tile))
+        running.add(task)
+        task.add_done_callback(finished)
+
+    if running:
+        await asyncio.gather(*running, return_exceptions=True)
+    if errors:
+        raise errors[0]
+    stats['retried'] = retry.retried
+    return stats
+
+
+def download_async(tasks, store, concurrency=ASYNC_CONCURRENCY, on_result=None, limiter=None,
+                   retry=None, refresh=False, total=None, window=None, **fetcher_kwargs):
+    """
+    同步入口：创建 AsyncFetcher 并运行事件循环
+
+    fetcher_kwargs 透传给 AsyncFetcher（url_template、max_connections 等）
+    """
+    async def run():
+        async with AsyncFetcher(**fetcher_kwargs) as fetcher:
+            return await download_all_async(tasks, fetcher, store, concurrency, on_result, limiter, retry,
+                                            refresh, total, window)
+
+    return asyncio.run(run())
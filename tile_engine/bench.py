@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+下载模式性能对比
+
+启动本地桩服务器（可设置延迟、错误率、429 比例和正文大小），
+用同一批瓦片依次跑各下载模式，比较吞吐量、延迟分位数、CPU 和内存。
+
+    download    逐个下载（同 download 模式，但不加请求间隔）
+    fast:N      线程池引擎，N 个线程（同 fast -t N）
+    async:N     异步引擎，N 个并发（同 fast --engine async -c N）
+
+每个模式在单独的子进程中运行，CPU 时间和峰值内存只统计下载端，
+互不影响；桩服务器留在主进程。瓦片写入临时目录，结束后自动删除。
+错误注入由随机种子决定，同样的参数多次运行结果可以直接比较。
+
+内存优先用 resource 模块（Linux / macOS），没有时尝试 psutil（可选）。
+"""
+
+import sys
+import json
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from .fetcher import Fetcher
+from .store import TileStore
+from .downloader import download_sequential, download_threaded
+from .ratelimit import TokenBucket
+from .retry import RetryPolicy, RetryQueue
+from .metrics import Metrics
+from .stub_server import StubTileServer
+
+DEFAULT_MODES = ('download', 'fast:5', 'fast:10', 'async:64')
+
+
+def make_tasks(count, zoom=15):
+    """生成 count 个互不相同的瓦片坐标"""
+    side = int(count ** 0.5) + 1
+    return [(zoom, i // side, i % side) for i in range(count)]
+
+
+def parse_mode(spec):
+    """
+    解析模式说明
+
+    返回:
+        (引擎, 并发数)，引擎为 'download' / 'fast' / 'async'
+    """
+    engine, _, number = spec.partition(':')
+    if engine not in ('download', 'fast', 'async'):
+        raise ValueError(f"未知的下载模式: {spec}")
+    if engine == 'download':
+        return engine, 1
+    return engine, int(number) if number else (5 if engine == 'fast' else 64)
+
+
+def usage():
+    """
+    当前进程的 CPU 时间和峰值内存
+
+    返回:
+        (CPU 秒数, 峰值 RSS 字节数或 None)
+    """
+    if resource is not None:
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        # Linux 的 ru_maxrss 单位是 KB，macOS 是字节
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return ru.ru_utime + ru.ru_stime, ru.ru_maxrss * scale
+    if psutil is not None:
+        process = psutil.Process()
+        times = process.cpu_times()
+        info = process.memory_info()
+        return times.user + times.system, getattr(info, 'peak_wset', info.rss)
+    return time.process_time(), None
+
+
+def run_mode(spec, tasks, url_template, attempts=3, rate=0):
+    """
+    子进程入口：用一个模式下载一批瓦片
+
+    返回:
+        dict: 耗时、CPU、峰值内存、结果计数和延迟分位数
+    """
+    engine, workers = parse_mode(spec)
+    retry = RetryQueue(RetryPolicy(max_attempts=attempts))
+    metrics = Metrics(retry)
+    limiter = TokenBucket(rate=rate, max_rate=rate * 4) if rate > 0 else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TileStore(tmp)
+        cpu_before, _ = usage()
+        start = time.perf_counter()
+        if engine == 'download':
+            fetcher = Fetcher(url_template, metrics=metrics)
+            stats = download_sequential(tasks, fetcher, store, limiter=limiter, retry=retry)
+            fetcher.close()
+        elif engine == 'fast':
+            fetcher = Fetcher(url_template, metrics=metrics, pool_size=workers)
+            stats = download_threaded(tasks, fetcher, store, workers, limiter=limiter, retry=retry)
+            fetcher.close()
+        else:
+            from .async_engine import download_async
+            stats = download_async(tasks, store, workers, limiter=limiter, retry=retry,
+                                   url_template=url_template, metrics=metrics)
+        seconds = time.perf_counter() - start
+        cpu_after, peak_rss = usage()
+
+    latency = metrics.summary()['latency'].get('total', {})
+    return {
+        'mode': spec,
+        'seconds': seconds,
+        'tiles_per_sec': len(tasks) / seconds if seconds > 0 else 0.0,
+        'p50': latency.get('p50'),
+        'p99': latency.get('p99'),
+        'cpu_seconds': cpu_after - cpu_before,
+        'cpu_percent': 100.0 * (cpu_after - cpu_before) / seconds if seconds > 0 else 0.0,
+        'peak_rss': peak_rss,
+        'retried': stats['retried'],
+        'failed': stats['failed'],
+    }
+
+
+def benchmark(count=1000, modes=DEFAULT_MODES, latency=0.02, jitter=0.0, error_rate=0.0,
+              throttle_rate=0.0, body_size=None, seed=0, attempts=3, rate=0):
+    """
+    依次运行各下载模式
+
+    每个模式使用新的桩服务器（相同参数和种子），保证错误分布一致。
+
+    返回:
+        list: 每个模式一条 dict（见 run_mode，另加 requests 和 statuses）
+    """
+    for spec in modes:
+        parse_mode(spec)
+    tasks = make_tasks(count)
+    rows = []
+    # spawn 启动的子进程不继承主进程的内存，峰值 RSS 可以横向比较
+    context = multiprocessing.get_context('spawn')
+
+    for spec in modes:
+        with StubTileServer(latency=latency, jitter=jitter, error_rate=error_rate,
+                            throttle_rate=throttle_rate, body_size=body_size, seed=seed) as server:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                row = executor.submit(run_mode, spec, tasks, server.url_template, attempts, rate).result()
+            row['requests'] = server.request_count
+            row['statuses'] = {str(k): v for k, v in sorted(server.statuses.items())}
+        rows.append(row)
+
+    return rows
+
+
+def print_rows(rows):
+    """以表格形式显示对比结果"""
+    def ms(value):
+        return f"{value * 1000:.1f}" if value is not None else '--'
+
+    def mb(value):
+        return f"{value / 1024 / 1024:.1f}" if value is not None else '--'
+
+    print(f"{'模式':<12}{'耗时(秒)':>10}{'瓦片/秒':>10}{'p50(ms)':>10}{'p99(ms)':>10}"
+          f"{'CPU(秒)':>10}{'CPU%':>8}{'RSS(MB)':>10}{'请求数':>8}{'重试':>7}{'失败':>6}")
+    print("-" * 101)
+    for row in rows:
+        print(f"{row['mode']:<12}{row['seconds']:>10.2f}{row['tiles_per_sec']:>10.1f}"
+              f"{ms(row['p50']):>10}{ms(row['p99']):>10}{row['cpu_seconds']:>10.2f}"
+              f"{row['cpu_percent']:>8.0f}{mb(row['peak_rss']):>10}{row['requests']:>8}"
+              f"{row['retried']:>7}{row['failed']:>6}")
+
+
+def write_json(path, rows, params):
+    """把结果和参数写入 JSON，便于不同版本之间对比"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'params': params, 'results': rows}, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+离线包 - 把瓦片合并为少量瓦片包，并生成 Service Worker 的预缓存清单
+
+网页原来每个瓦片一个请求，加上 app.js、data.js、style.css，首次打开要发几千个请求。
+这里把同一层级、相邻的 2^span_bits × 2^span_bits 个瓦片合并为一个二进制瓦片包：
+
+    头部    b'VTB1' | z | 瓦片数 n          （小端 uint32）
+    索引    n 条 x | y | 偏移 | 长度        （小端 uint32，偏移从数据区开始算）
+    数据    各瓦片的 PNG，内容相同的瓦片（海面、空地）只存一份
+
+precache.json 列出每个瓦片包的地址、SHA-256、大小，以及静态文件的 SHA-256，
+version 由全部哈希算出。瓦片包文件名带内容哈希，内容不变时地址也不变，
+docs/sw.js 更新时只下载地址变了的瓦片包和哈希变了的静态文件。
+
+打包时把 version 写入生成的 sw-version.js（sw.js 用 importScripts 引入，本身不被修改）。
+浏览器检查 Service Worker 更新时会逐字节比较引入的脚本，版本变了就安装新版本。
+"""
+
+import os
+import json
+import struct
+import hashlib
+
+BUNDLE_MAGIC = b'VTB1'
+HEADER = struct.Struct('<4sII')
+ENTRY = struct.Struct('<IIII')
+
+# 瓦片包边长 2^SPAN_BITS 个瓦片（8×8，z15 约 0.5 MB 一个）
+SPAN_BITS = 3
+# 不超过这个层级的瓦片包在 Service Worker 安装时就下载，更高的层级第一次用到时再下载
+PRECACHE_ZOOM = 13
+# 预缓存的静态文件（相对输出目录，不存在的跳过）
+STATIC_FILES = ('index.html', 'app.js', 'data.js', 'style.css')
+
+BUNDLE_DIR = 'bundles'
+MANIFEST_NAME = 'precache.json'
+VERSION_SCRIPT = 'sw-version.js'
+
+# ==================== 瓦片包格式 ====================
+
+def bundle_key(z, x, y, span_bits=SPAN_BITS):
+    """瓦片所在瓦片包的名字；span_bits 为 None 时每个层级一个包"""
+    if span_bits is None:
+        return str(z)
+    return f"{z}-{x >> span_bits}-{y >> span_bits}"
+
+
+def pack_bundle(z, tiles):
+    """
+    打包一个层级的若干瓦片
+
+    参数:
+        tiles: [(x, y, data)]，按 x、y 排序，保证相同内容得到相同的字节
+
+    返回:
+        bytes
+    """
+    entries = []
+    blobs = []
+    offsets = {}
+    size = 0
+    for x, y, data in tiles:
+        digest = hashlib.sha1(data).digest()
+        if digest not in offsets:
+            offsets[digest] = size
+            blobs.append(data)
+            size += len(data)
+        entries.append(ENTRY.pack(x, y, offsets[digest], len(data)))
+    return HEADER.pack(BUNDLE_MAGIC, z, len(tiles)) + b''.join(entries) + b''.join(blobs)
+
+
+def read_bundle(data):
+    """
+    解包
+
+    返回:
+        (z, {(x, y): PNG 内容})
+    """
+    magic, z, count = HEADER.unpack_from(data)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError("不是瓦片包")
+    start = HEADER.size + count * ENTRY.size
+    tiles = {}
+    for i in range(count):
+        x, y, offset, length = ENTRY.unpack_from(data, HEADER.size + i * ENTRY.size)
+        tiles[(x, y)] = data[start + offset:start + offset + length]
+    return z, tiles
+
+# ==================== 打包 ====================
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_bundles(store, output='docs', span_bits=SPAN_BITS, precache_zoom=PRECACHE_ZOOM,
+                  static_files=STATIC_FILES, on_bundle=None):
+    """
+    打包存储中的全部瓦片，写出瓦片包、precache.json 和 sw-version.js
+
+    参数:
+        store: 瓦片存储
+        output: 网站目录（瓦片包写入 {output}/bundles/）
+        span_bits: 瓦片包边长的位数，None 表示每个层级一个包
+        precache_zoom: 不超过该层级的瓦片包在安装时预缓存
+        on_bundle: 每写出一个瓦片包调用 on_bundle(key, entry)
+
+    返回:
+        dict: 写出的清单，另加 stats {zoom: {'bundles', 'tiles', 'bytes', 'written'}}
+    """
+    groups = {}
+    for z, x, y in store.iter_tiles():
+        groups.setdefault((z, bundle_key(z, x, y, span_bits)), []).append((x, y))
+
+    bundle_dir = os.path.join(output, BUNDLE_DIR)
+    os.makedirs(bundle_dir, exist_ok=True)
+    bundles = {}
+    stats = {}
+    keep = set()
+
+    for (z, key), cells in sorted(groups.items()):
+        cells.sort()
+        data = pack_bundle(z, [(x, y, store.read(z, x, y)) for x, y in cells])
+        digest = hashlib.sha256(data).hexdigest()
+        name = f"{key}.{digest[:12]}.bin"
+        path = os.path.join(bundle_dir, name)
+        keep.add(name)
+
+        # 文件名带哈希：同名文件就是相同内容，不必重写
+        written = not os.path.exists(path)
+        if written:
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        entry = {
+            'url': f"{BUNDLE_DIR}/{name}",
+            'sha256': digest,
+            'bytes': len(data),
+            'tiles': len(cells),
+            'precache': z <= precache_zoom,
+        }
+        bundles[key] = entry
+        s = stats.setdefault(z, {'bundles': 0, 'tiles': 0, 'bytes': 0, 'written': 0})
+        s['bundles'] += 1
+        s['tiles'] += len(cells)
+        s['bytes'] += len(data)
+        s['written'] += written
+        if on_bundle:
+            on_bundle(key, entry)
+
+    # 删除不再引用的旧瓦片包
+    for name in os.listdir(bundle_dir):
+        if name.endswith('.bin') and name not in keep:
+            os.remove(os.path.join(bundle_dir, name))
+
+    static = [{'url': name, 'sha256': sha256_file(os.path.join(output, name)),
+               'bytes': os.path.getsize(os.path.join(output, name))}
+              for name in static_files if os.path.isfile(os.path.join(output, name))]
+
+    version = hashlib.sha256(json.dumps([bundles, static], sort_keys=True).encode()).hexdigest()[:12]
+    manifest = {
+        'version': version,
+        'format': BUNDLE_MAGIC.decode(),
+        'span_bits': span_bits,
+        'bundles': bundles,
+        'static': static,
+    }
+    with open(os.path.join(output, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    write_version_script(os.path.join(output, VERSION_SCRIPT), version)
+
+    manifest['stats'] = stats
+    return manifest
+
+
+def write_version_script(path, version):
+    """写出 sw-version.js，返回是否修改了文件（版本不变时不重写）"""
+    script = f"// 由 python -m tile_engine bundle 生成，请勿手动修改\nself.PRECACHE_VERSION = '{version}';\n"
+    try:
+        with open(path, encoding='utf-8') as f:
+            if f.read() == script:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(script)
+    return True
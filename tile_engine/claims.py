@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+分片租约 - 多个下载进程分工，同一个瓦片只下载一次
+
+README 的流程里 download_missing_tiles.py 常常和 download_tiles_fast.py 同时运行，
+两者各自"先检查、再下载"，同一个瓦片可能被下载两次。这里把瓦片空间按
+2^bits × 2^bits 划分为分片，每个分片在租约目录中对应一个租约文件：
+
+    {z}_{x >> bits}_{y >> bits}.lease    内容为持有者标识，修改时间即最后一次续约
+
+    申领    O_CREAT | O_EXCL 创建租约文件，创建成功即持有，无需加锁
+    续约    后台线程定期更新持有中租约的修改时间
+    释放    分片内交出的瓦片都有了最终结果并空闲片刻后删除租约文件
+    接手    超过 ttl 未续约的租约（进程崩溃）先改名再检查，只有一个进程能接手
+
+遇到别人持有的分片时先跳过，记下其中的瓦片；本轮结束后等这些分片释放或过期，
+接手时重新检查存储，只补下仍然缺失的瓦片。每申领到一个分片，用一次清单范围查询
+把别的进程在其中写入的记录补进本进程的清单缓存，不逐个瓦片访问文件系统。
+
+租约目录跟随瓦片存储（见 default_claims），下载不同存储的进程互不影响。
+租约只依赖文件创建和改名的原子性，多台机器共享同一个租约目录（例如 NFS）也能分工；
+各机器的时钟偏差应远小于 ttl。
+"""
+
+import os
+import time
+import uuid
+import socket
+import threading
+from array import array
+
+from .config import TILES_DIR, CLAIMS_DIR, CLAIMS_SUFFIX, CLAIM_SHARD_BITS, CLAIM_TTL
+from .tilekeys import encode, decode
+
+# 分片内的瓦片都完成后再空闲多久释放（秒），避免光栅顺序下反复申领同一分片
+RELEASE_LINGER = 1.0
+# 等待别人的分片时的轮询间隔（秒）
+CLAIM_POLL = 1.0
+
+
+def default_claims(tiles_dir):
+    """存储默认的租约目录：默认瓦片目录用 CLAIMS_DIR，其他存储用并列的 <路径>.claims"""
+    tiles_dir = os.path.normpath(tiles_dir)
+    if tiles_dir == os.path.normpath(TILES_DIR):
+        return CLAIMS_DIR
+    return tiles_dir + CLAIMS_SUFFIX
+
+
+class ShardClaims:
+    """
+    基于租约文件的分片申领
+
+    参数:
+        directory: 租约目录，所有参与分工的进程必须使用同一个目录
+        ttl: 租约有效期（秒）
+        shard_bits: 分片边长为 2^shard_bits 个瓦片
+
+    属性:
+        owner: 本进程的持有者标识（主机名-进程号-随机串）
+        claimed / taken_over: 申领成功的次数 / 其中接手过期租约的次数
+    """
+
+    def __init__(self, directory=CLAIMS_DIR, ttl=CLAIM_TTL, shard_bits=CLAIM_SHARD_BITS):
+        self.directory = directory
+        self.ttl = ttl
+        self.shard_bits = shard_bits
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.claimed = 0
+        self.taken_over = 0
+        # 持有中的分片 → [在途瓦片数, 最后一次变为空闲的时间, 最后一次续约的时间]
+        self._held = {}
+        # 别人持有的分片 → 其中跳过的瓦片编码
+        self._deferred = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """创建租约目录并启动续约线程"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._heartbeat, name='shard-claims', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """停止续约并释放全部租约"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.release_all()
+
+    def shard_of(self, z, x, y):
+        """瓦片所在的分片 (z, sx, sy)"""
+        return z, x >> self.shard_bits, y >> self.shard_bits
+
+    # ---------- 分工 ----------
+
+    def claim(self, tiles, store):
+        """
+        转发本进程持有（或刚申领到）的分片中的瓦片，其余的记下留到 take
+
+        刚申领到分片时刷新一次该分片的清单记录：别的进程先前写入的瓦片，
+        下载流程随后把它当作已存在跳过
+        """
+        for tile in tiles:
+            shard = self.shard_of(*tile)
+            if shard not in self._deferred and self._hold(shard, store):
+                yield tile
+            else:
+                self._deferred.setdefault(shard, array('Q')).append(encode(*tile))
+
+    def finish(self, tile):
+        """瓦片得到最终结果（on_result 中调用）"""
+        shard = self.shard_of(*tile)
+        with self._lock:
+            entry = self._held.get(shard)
+            if entry is not None:
+                entry[0] -= 1
+                if entry[0] <= 0:
+                    entry[1] = time.monotonic()
+
+    def pending(self):
+        """还有多少个跳过的分片"""
+        return len(self._deferred)
+
+    def pending_tiles(self):
+        """跳过的分片中共有多少个瓦片"""
+        return sum(len(keys) for keys in self._deferred.values())
+
+    def take(self, store):
+        """
+        申领已释放或已过期的跳过分片
+
+        返回:
+            list: 这些分片中存储里仍然没有的瓦片 [(z, x, y)]
+        """
+        tiles = []
+        for shard in list(self._deferred):
+            if not self._try_claim(shard):
+                continue
+            keys = self._deferred.pop(shard)
+            self._refresh(shard, store)
+            missing = [tile for tile in map(decode, keys.tolist()) if not store.exists(*tile)]
+            with self._lock:
+                self._held[shard] = [len(missing), time.monotonic(), time.monotonic()]
+            tiles.extend(missing)
+        return tiles
+
+    def _hold(self, shard, store):
+        """已持有或申领成功时在途数加一；新申领到的分片先刷新清单记录"""
+        with self._lock:
+            entry = self._held.get(shard)
+            if entry is not None:
+                entry[0] += 1
+                return True
+        if not self._try_claim(shard):
+            return False
+        self._refresh(shard, store)
+        with self._lock:
+            now = time.monotonic()
+            self._held[shard] = [1, now, now]
+        return True
+
+    def _refresh(self, shard, store):
+        """重新读取分片范围内的存储记录（绕过本进程的清单缓存）"""
+        z, sx, sy = shard
+        side = 1 << self.shard_bits
+        store.refresh(z, sx * side, sx * side + side - 1, sy * side, sy * side + side - 1)
+
+    # ---------- 租约文件 ----------
+
+    def _path(self, shard):
+        return os.path.join(self.directory, '%d_%d_%d.lease' % shard)
+
+    def _try_claim(self, shard):
+        """创建租约文件；已存在但过期时接手"""
+        path = self._path(shard)
+        if self._create(path):
+            self.claimed += 1
+            return True
+        if not self._expired(path) or not self._take_over(path):
+            return False
+        self.claimed += 1
+        self.taken_over += 1
+        return True
+
+    def _create(self, path):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, 'w') as f:
+            f.write(self.owner)
+        return True
+
+    def _expired(self, path):
+        try:
+            return time.time() - os.stat(path).st_mtime > self.ttl
+        except FileNotFoundError:
+            return False
+
+    def _take_over(self, path):
+        """
+        接手过期租约：先改名，只有一个进程能改名成功；
+        改名后确认拿走的确实是过期的那份（而不是刚被续约或新建的）
+        """
+        stale = f"{path}.{self.owner}.stale"
+        try:
+            os.rename(path, stale)
+        except FileNotFoundError:
+            return False
+        try:
+            if time.time() - os.stat(stale).st_mtime <= self.ttl:
+                # 改名前一刻被续约或重建了：放回去（已有新租约时放弃）
+                try:
+                    os.link(stale, path)
+                except FileExistsError:
+                    pass
+                return False
+        finally:
+            os.unlink(stale)
+        return self._create(path)
+
+    def _owns(self, path):
+        try:
+            with open(path) as f:
+                return f.read() == self.owner
+        except FileNotFoundError:
+            return False
+
+    def _release(self, shard):
+        path = self._path(shard)
+        if self._owns(path):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    def release_all(self):
+        """释放全部持有的租约（所有瓦片都已有结果时调用）"""
+        with self._lock:
+            shards = list(self._held)
+            self._held.clear()
+        for shard in shards:
+            self._release(shard)
+
+    def _heartbeat(self):
+        """续约持有中的分片，释放空闲的分片"""
+        interval = min(RELEASE_LINGER, self.ttl / 3)
+        while not self._stop.wait(interval):
+            now = time.monotonic()
+            renew = []
+            with self._lock:
+                for shard, entry in list(self._held.items()):
+                    if entry[0] <= 0 and now - entry[1] >= RELEASE_LINGER:
+                        # 持锁删除租约文件，_hold 不会看到"已不在持有表、文件却还在"的中间状态
+                        del self._held[shard]
+                        self._release(shard)
+                    elif now - entry[2] >= self.ttl / 3:
+                        entry[2] = now
+                        renew.append(shard)
+            for shard in renew:
+                try:
+                    os.utime(self._path(shard))
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片引擎命令行
+
+模式:
+    download  普通下载（逐个下载，带延迟）
+    fast      快速下载（线程池或 asyncio 并发，无延迟）
+    missing   只下载指定层级缺失的瓦片
+    monitor   实时监控下载进度
+    wait      等待下载完成并播放提示音
+    index     扫描瓦片目录重建清单
+    export    在目录布局和 MBTiles 归档之间转换
+    bench     用本地桩服务器对比各下载模式的吞吐量、延迟、CPU 和内存
+    plan      只计算下载计划，可导出瓦片列表
+    optimize  在进程池中重新压缩瓦片（无损 deflate / 调色板量化 / WebP）
+    dedupe    相同内容的瓦片只保存一份，并按层级报告重复率
+    synth     由相邻层级合成缺失的瓦片（缩小子瓦片 / 放大祖先瓦片），不联网
+    bundle    把瓦片合并为瓦片包，生成 Service Worker 的预缓存清单
+    verify    在线程池中检查瓦片是否为完整的 PNG，坏瓦片移出存储，--repair 时重新下载
+    delta     按内容哈希比较两个快照（目录 / MBTiles / 清单），生成只含增删改瓦片的增量包
+    apply     把增量包就地应用到 --tiles-dir，先核对旧内容，有冲突时不修改
+    serve     本地瓦片服务器：提供 docs/ 网页，缺失的瓦片按需下载一次并保存
+
+--tiles-dir 以 .mbtiles 结尾时直接读写 MBTiles 归档。
+--bbox / --geojson / --corridor / --pois 指定规划区域（可组合、可重复），
+不指定时使用 config.py 中的矩形范围。
+
+用法:
+    python -m tile_engine fast -y -t 10
+"""
+
+import argparse
+
+from .config import (TILES_DIR, TILE_URL, TILE_SUBDOMAINS, ENDPOINT_CONCURRENCY, DOWNLOAD_DELAY, THREAD_COUNT, RATE_LIMIT, RATE_LIMIT_MAX,
+                     MAX_ATTEMPTS, FAILURE_REPORT, MANIFEST_PATH, MANIFEST_SUFFIX, PROGRESS_LOG, CLAIMS_DIR, CLAIMS_SUFFIX,
+                     MIN_ZOOM, MAX_ZOOM, POI_DATA, POI_RADIUS_KM, POI_DETAIL_ZOOM,
+                     POI_DETAIL_RADIUS_KM)
+from .manifest import default_manifest
+from .priority import ZOOM_WEIGHT_KM
+from .bench import DEFAULT_MODES
+from .bundle import SPAN_BITS, PRECACHE_ZOOM
+from .verify import WORKERS as VERIFY_WORKERS
+from .delta import DELTA_PATH
+from .commands.common import fix_windows_console
+from .commands.download import run_download
+from .commands.fast import run_fast
+from .commands.missing import run_missing
+from .commands.monitor import run_monitor
+from .commands.wait import run_wait
+from .commands.index import run_index
+from .commands.export import run_export
+from .commands.plan import run_plan
+from .commands.optimize import run_optimize
+from .commands.synth import run_synth
+from .commands.bundle import run_bundle
+from .commands.verify import run_verify
+from .commands.delta import run_delta
+from .commands.apply import run_apply
+from .commands.dedupe import run_dedupe
+from .commands.serve import run_serve
+from .commands.bench import run_bench
+
+# ==================== 主程序 ====================
+
+# 多个模式共用的参数：键 -> (参数名, add_argument 的关键字参数)
+OPTIONS = {
+    'yes': (('--yes', '-y'), dict(action='store_true', help='跳过确认直接开始下载')),
+    'rate': (('--rate',), dict(type=float, default=RATE_LIMIT,
+                               help='初始请求速率（请求/秒），默认收到 429/503 之前不限流，0 表示始终不限流')),
+    'max_rate': (('--max-rate',), dict(type=float, default=RATE_LIMIT_MAX, help='自适应回升的速率上限（请求/秒），默认不设上限')),
+    'attempts': (('--attempts',), dict(type=int, default=MAX_ATTEMPTS, help='每个瓦片最多尝试次数')),
+    'report': (('--report',), dict(default=FAILURE_REPORT, help='最终失败瓦片的 JSON 报告路径')),
+    'priority': (('--priority',), dict(action='store_true', help='按到 data.js 中景点的距离和层级排序，先下载最常看的瓦片')),
+    'zoom_weight': (('--zoom-weight',), dict(type=float, default=ZOOM_WEIGHT_KM,
+                                             help=f'--priority 时深一级相当于远多少公里（默认 {ZOOM_WEIGHT_KM:g}）')),
+    'time_budget': (('--time-budget',), dict(type=float, metavar='MINUTES', help='下载时间预算（分钟），用尽后停止取新瓦片')),
+    'byte_budget': (('--byte-budget',), dict(type=float, metavar='MB', help='新写入数据的预算（MB），用尽后停止取新瓦片')),
+}
+
+OPTION_GROUPS = {
+    'confirm': ['yes'],
+    'rate': ['rate', 'max_rate'],
+    'retry': ['attempts', 'report'],
+    'priority': ['priority', 'zoom_weight', 'time_budget', 'byte_budget'],
+}
+
+def add_option_groups(parser, *groups, **overrides):
+    """
+    按组添加多个模式共用的参数
+
+    overrides 以 OPTIONS 的键指定要改动的关键字参数，如 report={'help': ...}
+    """
+    for group in groups:
+        for key in OPTION_GROUPS[group]:
+            names, kwargs = OPTIONS[key]
+            parser.add_argument(*names, **dict(kwargs, **overrides.get(key, {})))
+
+def add_global_options(parser, suppress=False):
+    """
+    全局参数
+
+    加在主解析器上，也加在每个模式上（suppress=True 时不设默认值，
+    没写在模式名之后的参数不会覆盖写在前面的），原有脚本把参数接在模式名之后也能使用
+    """
+    def add(*names, **kwargs):
+        if suppress:
+            kwargs['default'] = argparse.SUPPRESS
+        parser.add_argument(*names, **kwargs)
+
+    add('--tiles-dir', default=TILES_DIR,
+        help=f'瓦片保存目录，或 .mbtiles 归档路径（默认 {TILES_DIR}）')
+    add('--url', action='append',
+        help=f'瓦片服务器 URL 模板，可重复指定多个镜像，{{s}} 按子域名展开（默认 {TILE_URL}）')
+    add('--subdomains', default=TILE_SUBDOMAINS, help=f'{{s}} 展开的子域名（默认 {TILE_SUBDOMAINS}）')
+    add('--per-host', type=int, default=ENDPOINT_CONCURRENCY,
+        help=f'多个地址时每个地址的并发上限（默认 {ENDPOINT_CONCURRENCY}）')
+    add('--manifest',
+        help=f'瓦片清单路径（默认瓦片目录为 {MANIFEST_PATH}，其他 --tiles-dir 为 <tiles-dir>{MANIFEST_SUFFIX}）')
+    add('--no-manifest', action='store_true', help='不使用清单，逐文件检查')
+    add('--dedup', action='store_true', help='与已有瓦片内容相同的新瓦片用硬链接保存')
+    add('--claims', action='store_true',
+        help=f'按分片租约与同时运行的其他下载进程分工（租约目录默认瓦片目录用 {CLAIMS_DIR}，'
+             f'其他 --tiles-dir 用 <tiles-dir>{CLAIMS_SUFFIX}）')
+    add('--claims-dir', help='指定租约目录（隐含 --claims），多台机器共享瓦片目录时指向同一个共享目录')
+    add('--progress-log', default=PROGRESS_LOG,
+        help=f'进度事件日志，下载时写入、monitor / wait 订阅（默认 {PROGRESS_LOG}）')
+    add('--no-progress-log', action='store_true', help='不写也不读进度事件日志')
+    add('--metrics-port', type=int, default=0,
+        help='下载时在本地该端口提供 /metrics（Prometheus）和 /metrics.json，0 表示关闭')
+    add('--metrics-json', help='下载结束时把指标汇总写入该 JSON 文件')
+    add('--bbox', action='append', metavar='MIN_LAT,MIN_LON,MAX_LAT,MAX_LON',
+        help='规划矩形，可重复')
+    add('--geojson', action='append', metavar='FILE',
+        help='GeoJSON 区域（多边形按原形状，线按走廊，点按圆形），可重复')
+    add('--corridor', action='append', metavar='LAT,LON;LAT,LON;...',
+        help='路线走廊，沿折线两侧缓冲 --buffer-km，可重复')
+    add('--buffer-km', type=float, default=1.0, help='走廊和点的缓冲半径（公里，默认 1）')
+    add('--pois', action='store_true', help='按行程数据中酒店、机场、景点的坐标规划')
+    add('--poi-data', default=POI_DATA, help=f'行程数据文件（默认 {POI_DATA}）')
+    add('--poi-km', type=float, default=POI_RADIUS_KM,
+        help=f'每个景点周围的半径（公里，默认 {POI_RADIUS_KM}）')
+    add('--detail-zoom', type=int,
+        help=f'--pois 时只在景点附近下载到的最高层级（如 {POI_DETAIL_ZOOM}）')
+    add('--detail-km', type=float, default=POI_DETAIL_RADIUS_KM,
+        help=f'详细层级景点周围的半径（公里，默认 {POI_DETAIL_RADIUS_KM}）')
+    add('--min-zoom', type=int, default=MIN_ZOOM, help=f'最小缩放级别（默认 {MIN_ZOOM}）')
+    add('--max-zoom', type=int, default=MAX_ZOOM, help=f'最大缩放级别（默认 {MAX_ZOOM}）')
+
+def build_parser():
+    """构建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog='tile_engine', description='离线地图瓦片引擎')
+    add_global_options(parser)
+    subparsers = parser.add_subparsers(dest='mode', required=True)
+
+    p = subparsers.add_parser('download', help='普通下载（带延迟）')
+    p.add_argument('--delay', type=float, default=DOWNLOAD_DELAY, help='两次请求之间的最小间隔（秒），跳过的瓦片不等待')
+    add_option_groups(p, 'confirm', 'retry', 'priority')
+    p.set_defaults(func=run_download)
+
+    p = subparsers.add_parser('fast', help='快速下载（线程池并发）')
+    p.add_argument('--threads', '-t', type=int, default=THREAD_COUNT, help='并发线程数')
+    p.add_argument('--engine', choices=['threads', 'async'], default='threads', help='下载引擎')
+    p.add_argument('--concurrency', '-c', type=int, default=64, help='异步引擎同时在途的请求数')
+    p.add_argument('--connections', type=int, default=8, help='异步引擎连接池大小')
+    p.add_argument('--refresh', action='store_true', help='刷新模式：对到期的已有瓦片发条件请求')
+    p.add_argument('--max-age', type=float, help='刷新模式下所有层级统一的最长保留天数')
+    p.add_argument('--zoom-age', action='append', metavar='Z=DAYS', help='单独指定某层级的保留天数，可重复')
+    add_option_groups(p, 'confirm', 'rate', 'retry', 'priority')
+    p.set_defaults(func=run_fast)
+
+    p = subparsers.add_parser('missing', help='下载缺失的瓦片')
+    p.add_argument('--zoom', '-z', type=int, default=15, help='缩放级别（默认15）')
+    p.add_argument('--from-report', help='只补下失败报告中的瓦片')
+    p.add_argument('--threads', '-t', type=int, default=10, help='并发线程数')
+    add_option_groups(p, 'rate', 'retry')
+    p.set_defaults(func=run_missing)
+
+    p = subparsers.add_parser('monitor', help='实时监控下载进度')
+    p.add_argument('--interval', type=float, default=2, help='刷新间隔（秒）')
+    p.set_defaults(func=run_monitor)
+
+    p = subparsers.add_parser('wait', help='等待下载完成并播放提示音')
+    p.add_argument('--interval', type=float, default=5, help='检查间隔（秒）')
+    p.set_defaults(func=run_wait)
+
+    p = subparsers.add_parser('index', help='扫描瓦片目录重建清单')
+    p.set_defaults(func=run_index)
+
+    p = subparsers.add_parser('export', help='在目录布局和 MBTiles 归档之间转换')
+    p.add_argument('src', help='源目录或 .mbtiles 文件')
+    p.add_argument('dst', help='目标目录或 .mbtiles 文件')
+    p.set_defaults(func=run_export)
+
+    p = subparsers.add_parser('plan', help='只计算下载计划')
+    p.add_argument('--output', '-o', help='把瓦片列表（每行 z/x/y）写入文件')
+    p.set_defaults(func=run_plan)
+
+    p = subparsers.add_parser('optimize', help='重新压缩瓦片，缩小离线包')
+    p.add_argument('--method', '-m', choices=['deflate', 'quantize', 'webp'], default='deflate',
+                   help='deflate 无损（默认）/ quantize 调色板量化 / webp 另存 WebP')
+    p.add_argument('--workers', '-w', type=int, help='进程数（默认 CPU 核数）')
+    p.add_argument('--colors', type=int, default=256, help='quantize 的颜色数')
+    p.add_argument('--quality', type=int, default=80, help='webp 的质量（0-100）')
+    p.add_argument('--output', '-o', default='docs/tiles_webp', help='webp 的输出目录')
+    p.add_argument('--force', action='store_true', help='忽略增量记录，全部重新处理')
+    p.set_defaults(func=run_optimize)
+
+    p = subparsers.add_parser('dedupe', help='相同内容的瓦片只保存一份')
+    p.add_argument('--dry-run', action='store_true', help='只统计重复率，不修改')
+    p.add_argument('--symlink', action='store_true', help='目录布局使用相对符号链接代替硬链接')
+    p.set_defaults(func=run_dedupe)
+
+    p = subparsers.add_parser('synth', help='由相邻层级合成缺失的瓦片，不联网')
+    p.add_argument('--up-to', type=int, metavar='ZOOM', help='放大合成到的最高层级（如 17），默认 --max-zoom')
+    p.add_argument('--no-down', action='store_true', help='不由子瓦片缩小合成父瓦片')
+    p.add_argument('--no-up', action='store_true', help='不由祖先瓦片放大合成')
+    p.add_argument('--workers', '-w', type=int, help='进程数（默认 CPU 核数）')
+    p.set_defaults(func=run_synth)
+
+    p = subparsers.add_parser('bundle', help='把瓦片合并为瓦片包，生成 Service Worker 预缓存清单')
+    p.add_argument('--output', '-o', default='docs', help='网站目录，写入 bundles/ 和 precache.json（默认 docs）')
+    p.add_argument('--span-bits', type=int, default=SPAN_BITS,
+                   help=f'瓦片包边长为 2^N 个瓦片（默认 {SPAN_BITS}，即 {2 ** SPAN_BITS}×{2 ** SPAN_BITS}）')
+    p.add_argument('--per-zoom', action='store_true', help='每个层级打成一个包')
+    p.add_argument('--precache-zoom', type=int, default=PRECACHE_ZOOM,
+                   help=f'不超过该层级的瓦片包在首次打开时预缓存，更高的按需下载（默认 {PRECACHE_ZOOM}）')
+    p.set_defaults(func=run_bundle)
+
+    p = subparsers.add_parser('verify', help='检查瓦片是否为完整的 PNG，坏瓦片移出存储并可重新下载')
+    p.add_argument('--workers', '-w', type=int, default=VERIFY_WORKERS, help=f'校验线程数（默认 {VERIFY_WORKERS}）')
+    p.add_argument('--force', action='store_true', help='忽略增量记录，全部重新检查')
+    p.add_argument('--dry-run', action='store_true', help='只报告，不移出坏瓦片')
+    p.add_argument('--repair', action='store_true', help='坏瓦片移出后立即重新下载')
+    p.add_argument('--threads', '-t', type=int, default=10, help='重新下载的并发线程数')
+    add_option_groups(p, 'rate', 'retry', report={'help': '坏瓦片 / 最终失败瓦片的 JSON 报告路径'})
+    p.set_defaults(func=run_verify)
+
+    p = subparsers.add_parser('delta', help='比较两个快照，生成只含增删改瓦片的增量包')
+    p.add_argument('old', help='旧快照：目录、.mbtiles 或清单文件（如上次部署时的清单副本）')
+    p.add_argument('new', help='新快照：目录或 .mbtiles')
+    p.add_argument('--output', '-o', default=DELTA_PATH, help=f'增量包路径（默认 {DELTA_PATH}）')
+    p.set_defaults(func=run_delta)
+
+    p = subparsers.add_parser('apply', help='把增量包就地应用到 --tiles-dir')
+    p.add_argument('delta', help='增量包路径')
+    p.add_argument('--dry-run', action='store_true', help='只核对，不修改')
+    p.add_argument('--force', action='store_true', help='有冲突时仍以增量包为准')
+    p.set_defaults(func=run_apply)
+
+    p = subparsers.add_parser('serve', help='本地瓦片服务器，缺失的瓦片按需下载并保存')
+    p.add_argument('--host', default='127.0.0.1', help='监听地址（默认 127.0.0.1）')
+    p.add_argument('--port', '-p', type=int, default=8000, help='端口（默认 8000）')
+    p.add_argument('--root', default='docs', help='静态文件目录（默认 docs）')
+    p.add_argument('--cache-mb', type=float, default=64, help='内存 LRU 缓存大小（MB，默认 64）')
+    p.add_argument('--offline', action='store_true', help='只用本地瓦片，不向上游补齐')
+    add_option_groups(p, 'rate', rate={'help': '上游请求速率（请求/秒），默认收到 429/503 之前不限流，0 表示始终不限流'})
+    p.set_defaults(func=run_serve)
+
+    p = subparsers.add_parser('bench', help='对比各下载模式的性能')
+    p.add_argument('--count', '-n', type=int, default=1000, help='瓦片数量')
+    p.add_argument('--modes', nargs='+', default=list(DEFAULT_MODES), metavar='MODE',
+                   help='download / fast:线程数 / async:并发数（默认 %s）' % ' '.join(DEFAULT_MODES))
+    p.add_argument('--latency', type=float, default=0.02, help='桩服务器每个请求的延迟（秒）')
+    p.add_argument('--jitter', type=float, default=0.0, help='延迟随机波动比例（0.5 表示 ±50%%）')
+    p.add_argument('--error-rate', type=float, default=0.0, help='返回 500 的比例')
+    p.add_argument('--throttle-rate', type=float, default=0.0, help='返回 429 的比例')
+    p.add_argument('--body-size', type=int, help='瓦片正文填充到的字节数')
+    p.add_argument('--seed', type=int, default=0, help='错误注入的随机种子')
+    p.add_argument('--attempts', type=int, default=MAX_ATTEMPTS, help='每个瓦片最多尝试次数')
+    p.add_argument('--rate', type=float, default=0, help='启用自适应限流的初始速率，0 表示不限流')
+    p.add_argument('--json', help='把结果写入 JSON 文件')
+    p.set_defaults(func=run_bench)
+
+    for p in subparsers.choices.values():
+        add_global_options(p, suppress=True)
+    return parser
+
+def main(argv=None):
+    """命令行入口"""
+    fix_windows_console()
+    args = build_parser().parse_args(argv)
+    # 清单跟随瓦片存储，换了 --tiles-dir 不会误用默认目录的清单
+    args.manifest = args.manifest or default_manifest(args.tiles_dir)
+    return args.func(args)
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+命令行各模式的实现
+
+每个模式一个模块，提供 run_<模式>(args)；参数定义和分派在 cli.py。
+common.py 是各模式共用的工具函数。
+"""
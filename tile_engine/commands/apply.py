@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""apply 模式 - 把增量包就地应用到 --tiles-dir"""
+
+import time
+import zipfile
+
+from .common import open_store
+from .delta import print_delta_stats
+
+def run_apply(args):
+    """把增量包就地应用到瓦片存储"""
+    from ..delta import apply_delta
+
+    print("=" * 60)
+    print("🩹 应用增量包")
+    print("=" * 60)
+
+    store = open_store(args)
+    print(f"增量包: {args.delta} | 目标: {store.root}")
+
+    def on_progress(done, tile):
+        if done % 500 == 0:
+            print(f"  已修改: {done} 个瓦片")
+
+    start = time.perf_counter()
+    try:
+        result = apply_delta(args.delta, store, args.force, args.dry_run, on_progress)
+    except (OSError, ValueError, zipfile.BadZipFile) as e:
+        print(f"❌ {e}")
+        store.close()
+        return
+    store.close()
+
+    print_delta_stats(result['stats'])
+    conflicts = result['conflicts']
+    if conflicts:
+        print(f"⚠️  冲突: {len(conflicts)} 个瓦片与增量包的旧快照不一致")
+        for z, x, y, reason in conflicts[:10]:
+            print(f"   {z}/{x}/{y}.png  {reason}")
+        if len(conflicts) > 10:
+            print("   ...")
+    if result['skipped']:
+        print(f"已是新内容，跳过: {result['skipped']} 个瓦片")
+
+    if args.dry_run:
+        print("🔎 只核对，未修改" if not conflicts or args.force else "✗ 有冲突，实际应用时会停止（--force 以增量包为准）")
+    elif not result['applied']:
+        print("✗ 有冲突，未做任何修改（确认后用 --force 以增量包为准）")
+    else:
+        print(f"✓ 写入 {result['written']} 个瓦片，删除 {result['removed']} 个瓦片，"
+              f"用时 {time.perf_counter() - start:.1f} 秒")
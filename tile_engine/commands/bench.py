@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""bench 模式 - 用本地桩服务器对比各下载模式的性能"""
+
+
+def run_bench(args):
+    """用本地桩服务器对比各下载模式"""
+    from ..bench import benchmark, print_rows, write_json
+
+    print("=" * 60)
+    print("⏱️  下载模式性能对比（本地桩服务器）")
+    print("=" * 60)
+    print(f"瓦片数: {args.count} | 模拟延迟: {args.latency * 1000:.0f}ms ±{args.jitter * 100:.0f}% | "
+          f"正文: {args.body_size or '默认'} 字节")
+    print(f"错误率: {args.error_rate:.1%} | 429 比例: {args.throttle_rate:.1%} | 种子: {args.seed}")
+    print(f"模式: {' '.join(args.modes)}\n")
+
+    params = {'count': args.count, 'latency': args.latency, 'jitter': args.jitter,
+              'error_rate': args.error_rate, 'throttle_rate': args.throttle_rate,
+              'body_size': args.body_size, 'seed': args.seed, 'attempts': args.attempts, 'rate': args.rate}
+    try:
+        rows = benchmark(modes=args.modes, **params)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    print_rows(rows)
+    if args.json:
+        write_json(args.json, rows, dict(params, modes=args.modes))
+        print(f"\n📝 结果: {args.json}")
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""bundle 模式 - 把瓦片合并为瓦片包，生成 Service Worker 的预缓存清单"""
+
+import time
+
+from ..mbtiles import open_tile_store
+
+def run_bundle(args):
+    """打包瓦片，按层级报告瓦片包数量和请求数的减少"""
+    from ..bundle import build_bundles, MANIFEST_NAME, BUNDLE_DIR
+
+    print("=" * 60)
+    print("📦 离线包")
+    print("=" * 60)
+
+    store = open_tile_store(args.tiles_dir)
+    span_bits = None if args.per_zoom else args.span_bits
+    layout = '每个层级一个包' if span_bits is None else f"每包 {2 ** span_bits}×{2 ** span_bits} 个瓦片"
+    print(f"瓦片: {store.root} | {layout} | 预缓存到 Z{args.precache_zoom}")
+
+    start = time.perf_counter()
+    manifest = build_bundles(store, args.output, span_bits, args.precache_zoom)
+    store.close()
+    stats = manifest['stats']
+
+    print(f"\n{'层级':<6}{'瓦片':>8}{'瓦片包':>8}{'大小(MB)':>10}{'新写入':>8}{'预缓存':>8}")
+    print("-" * 50)
+    for zoom in sorted(stats):
+        s = stats[zoom]
+        print(f"Z{zoom:<5}{s['tiles']:>8}{s['bundles']:>8}{s['bytes'] / 1024 / 1024:>10.2f}{s['written']:>8}"
+              f"{'是' if zoom <= args.precache_zoom else '按需':>8}")
+    print("-" * 50)
+
+    tiles = sum(s['tiles'] for s in stats.values())
+    bundles = sum(s['bundles'] for s in stats.values())
+    print(f"✓ {tiles} 个瓦片 → {bundles} 个瓦片包（请求数减少 {tiles - bundles} 个），"
+          f"用时 {time.perf_counter() - start:.1f} 秒")
+    print(f"📝 {args.output}/{MANIFEST_NAME}（版本 {manifest['version']}）| 瓦片包: {args.output}/{BUNDLE_DIR}/")
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""命令行模式共用的工具函数 - 构建计划、打开存储，限流 / 重试 / 进度 / 指标 / 预算 / 租约的创建与收尾"""
+
+import os
+import sys
+import time
+
+from ..config import TILE_URL
+from ..plan import TilePlan
+from ..regions import parse_bbox, parse_points, load_geojson, corridor
+from ..pois import load_pois, nearby, poi_regions
+from ..mbtiles import open_tile_store
+from ..manifest import Manifest
+from ..downloader import new_stats, merge_stats
+from ..ratelimit import TokenBucket, format_rate
+from ..retry import RetryPolicy, RetryQueue, write_failure_report
+from ..progress import ProgressLog
+from ..metrics import Metrics, MetricsServer
+from ..priority import PriorityOrder, Budget
+from ..mirrors import EndpointPool, expand_urls
+from ..claims import ShardClaims, CLAIM_POLL, default_claims
+
+def fix_windows_console():
+    """修复 Windows 控制台编码问题"""
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+        # 打开控制台的 ANSI 转义支持（清屏用）
+        os.system('')
+
+def play_done_sound():
+    """播放完成提示音"""
+    if sys.platform == 'win32':
+        try:
+            import winsound
+            print("\n🔔 播放完成提示音...")
+            # 频率: 800Hz, 时长: 1000ms
+            winsound.Beep(800, 1000)
+        except:
+            print('\a')
+    else:
+        print('\a')
+
+def clear_screen():
+    """清屏（ANSI 转义序列，不启动子进程）"""
+    print('\033[2J\033[H', end='', flush=True)
+
+def build_plan(args, min_zoom=None, max_zoom=None):
+    """
+    根据 --bbox / --geojson / --corridor / --pois 生成下载计划
+
+    没有指定任何区域时返回 config.py 中的默认矩形计划。
+    --pois 额外在景点周围规划 MAX_ZOOM 之上到 --detail-zoom 的层级。
+    """
+    min_zoom = args.min_zoom if min_zoom is None else min_zoom
+    max_zoom = args.max_zoom if max_zoom is None else max_zoom
+
+    regions = [parse_bbox(text) for text in args.bbox or []]
+    for path in args.geojson or []:
+        regions.extend(load_geojson(path, args.buffer_km))
+    for text in args.corridor or []:
+        regions.extend(corridor(parse_points(text), args.buffer_km))
+
+    pois = []
+    if args.pois:
+        pois, dropped = nearby(load_pois(args.poi_data))
+        for poi in dropped:
+            print(f"⚠️  {poi['name']} 离主要区域太远，不参与规划")
+        regions.extend(poi_regions(pois, args.poi_km))
+
+    if not regions:
+        return TilePlan(min_zoom=min_zoom, max_zoom=max_zoom)
+    plan = TilePlan.from_regions(regions, min_zoom, max_zoom)
+
+    detail_zoom = args.detail_zoom if args.detail_zoom is not None else max_zoom
+    if pois and detail_zoom > max_zoom:
+        detail = TilePlan.from_regions(poi_regions(pois, args.detail_km), max_zoom + 1, detail_zoom)
+        plan = plan.merge(detail)
+    return plan
+
+def print_plan(plan):
+    """显示计划中各缩放级别的瓦片数量"""
+    min_lat, min_lon, max_lat, max_lon = plan.bbox
+
+    print("\n📊 计算瓦片数量...")
+    print(f"地图范围:")
+    print(f"  纬度: {min_lat:.4f}° ~ {max_lat:.4f}°")
+    print(f"  经度: {min_lon:.4f}° ~ {max_lon:.4f}°")
+    print(f"  缩放: {plan.min_zoom} ~ {plan.max_zoom}")
+    if plan.regions:
+        kinds = {}
+        for region in plan.regions:
+            kinds[region.kind] = kinds.get(region.kind, 0) + 1
+        print(f"  区域: " + "，".join(f"{kind} × {n}" for kind, n in kinds.items()))
+    print()
+
+    for zoom in plan.zooms():
+        if plan.is_rectangular:
+            print(f"  缩放级别 {zoom}: {plan.count(zoom)} 个瓦片")
+        else:
+            print(f"  缩放级别 {zoom}: {plan.count(zoom)} 个瓦片（外包矩形 {plan.envelope_count(zoom)}）")
+
+    total_tiles = plan.count()
+    print(f"\n📈 总计: {total_tiles} 个瓦片")
+    if not plan.is_rectangular:
+        envelope = plan.envelope_count()
+        saved = envelope - total_tiles
+        print(f"✂️  比外包矩形少 {saved} 个瓦片（{saved * 100 / envelope:.1f}%）")
+    print(f"💾 预估大小: {total_tiles * 10 / 1024 / 1024:.1f} MB (假设每个瓦片 10KB)\n")
+
+def open_store(args, readonly=False):
+    """
+    打开瓦片存储，默认带清单
+
+    只读模式（监控）下清单不存在时退回到逐文件检查
+    """
+    if args.no_manifest:
+        return open_tile_store(args.tiles_dir)
+    if readonly and not os.path.exists(args.manifest):
+        print(f"⚠️  清单 {args.manifest} 不存在，退回到逐个瓦片检查")
+        return open_tile_store(args.tiles_dir)
+    try:
+        manifest = Manifest(args.manifest, readonly=readonly, root=args.tiles_dir)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if manifest.is_new:
+        print(f"📇 首次使用清单，正在索引 {args.tiles_dir} ...")
+    return open_tile_store(args.tiles_dir, manifest, dedup=args.dedup and not readonly)
+
+def make_pool(args):
+    """
+    根据 --url（可重复，{s} 按 --subdomains 展开）准备瓦片地址
+
+    返回:
+        (第一个地址, EndpointPool 或 None)，只有一个地址时不使用地址池
+    """
+    urls = expand_urls(args.url or [TILE_URL], args.subdomains)
+    if len(urls) == 1:
+        return urls[0], None
+    print(f"🌐 瓦片地址: {len(urls)} 个，每个最多 {args.per_host} 个并发请求，出错或限流时自动切换")
+    return urls[0], EndpointPool(urls, args.per_host)
+
+def print_pool(pool):
+    """显示各地址的请求数、出错数和平均耗时"""
+    if pool is None:
+        return
+    print(f"🌐 故障转移: {pool.failovers} 次")
+    for row in pool.summary():
+        latency = f"{row['latency'] * 1000:.0f}ms" if row['latency'] is not None else '--'
+        state = '冷却中' if row['state'] == 'cooling' else '正常'
+        print(f"   {row['name']:<32} 请求 {row['requests']:>6} | 出错 {row['errors']:>4} | "
+              f"限流 {row['throttled']:>4} | 平均 {latency:>7} | {state}")
+
+def make_limiter(args):
+    """
+    根据 --rate / --max-rate 创建共享限流器
+
+    不指定 --rate 时起步不限流，第一次被限流后自适应；--rate 0 表示完全不限流
+    """
+    if args.rate is not None and args.rate <= 0:
+        return None
+    return TokenBucket(rate=args.rate, max_rate=args.max_rate)
+
+def print_limiter(limiter):
+    """显示限流统计"""
+    if limiter:
+        print(f"🚦 被限流: {limiter.throttled_count} 次 | 最终速率: {format_rate(limiter.rate)} 请求/秒")
+
+def make_retry(args):
+    """根据 --attempts 创建重试队列"""
+    return RetryQueue(RetryPolicy(max_attempts=max(1, args.attempts)))
+
+def finish_retry(args, retry, total, store):
+    """显示重试统计，失败的瓦片记入清单，并写出报告"""
+    print(f"🔁 重试: {retry.retried} 次 | 最终失败: {len(retry.failures)} 个瓦片")
+    for failure in retry.failures:
+        store.mark_failed(failure['z'], failure['x'], failure['y'], failure['result'])
+    if retry.failures:
+        write_failure_report(args.report, retry.failures, total)
+        print(f"📝 失败报告: {args.report}（可用 missing --from-report 补下）")
+
+def start_progress(args, store, mode, total, done):
+    """
+    打开进度事件日志并挂到存储上，monitor / wait 模式据此显示进度
+
+    参数:
+        total / done: {z: 数量}
+    """
+    if args.no_progress_log:
+        return None
+    events = ProgressLog(args.progress_log)
+    events.start(mode, total, done)
+    store.events = events
+    return events
+
+def plan_progress(args, store, mode, plan):
+    """按计划发布本轮的开始事件"""
+    return start_progress(args, store, mode, {z: plan.count(z) for z in plan.zooms()},
+                          {z: store.count(plan, z) for z in plan.zooms()})
+
+def end_progress(events):
+    """写出结束事件"""
+    if events is not None:
+        events.end()
+
+def start_metrics(args, retry):
+    """
+    --metrics-port / --metrics-json 任一指定时收集下载指标
+
+    返回:
+        (Metrics 或 None, MetricsServer 或 None)
+    """
+    if not args.metrics_port and not args.metrics_json:
+        return None, None
+    metrics = Metrics(retry)
+    server = None
+    if args.metrics_port:
+        server = MetricsServer(metrics, args.metrics_port).start()
+        print(f"📈 指标: {server.url}")
+    return metrics, server
+
+def track_results(metrics, on_result):
+    """把最终结果同时计入指标"""
+    if metrics is None:
+        return on_result
+
+    def wrapped(i, total, tile, result):
+        metrics.observe_result(result)
+        on_result(i, total, tile, result)
+    return wrapped
+
+def finish_metrics(args, metrics, server):
+    """显示延迟汇总，写出 JSON，关闭 /metrics 端点"""
+    if metrics is None:
+        return
+    summary = metrics.summary()
+    print(f"📈 请求: {summary['requests']} 次（{summary['requests_per_sec']:.1f}/秒）| "
+          f"状态码: {summary['statuses']} | 异常: {sum(summary['errors'].values())}")
+    for phase, stat in summary['latency'].items():
+        print(f"   {phase:<8} p50 {stat['p50'] * 1000:7.1f}ms  p90 {stat['p90'] * 1000:7.1f}ms  "
+              f"p99 {stat['p99'] * 1000:7.1f}ms  ({stat['count']} 次)")
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+        print(f"📝 指标汇总: {args.metrics_json}")
+    if server is not None:
+        server.stop()
+
+def make_order(args, plan):
+    """--priority 时按 data.js 中的景点建立优先级排序，否则返回 None"""
+    if not args.priority:
+        return None
+    pois, _ = nearby(load_pois(args.poi_data))
+    if not pois:
+        print(f"⚠️  {args.poi_data} 中没有可用的景点坐标，按原顺序下载")
+        return None
+    print(f"🎯 优先级: 按到 {len(pois)} 个景点的距离排序，深一级相当于远 {args.zoom_weight:g} 公里")
+    return PriorityOrder([(poi['lat'], poi['lng']) for poi in pois], plan.min_zoom, args.zoom_weight)
+
+def make_budget(args, store):
+    """--time-budget / --byte-budget 任一指定时创建预算"""
+    if args.time_budget is None and args.byte_budget is None:
+        return None
+    seconds = args.time_budget * 60 if args.time_budget is not None else None
+    max_bytes = int(args.byte_budget * 1024 * 1024) if args.byte_budget is not None else None
+    limits = []
+    if seconds is not None:
+        limits.append(f"{args.time_budget:g} 分钟")
+    if max_bytes is not None:
+        limits.append(f"{args.byte_budget:g} MB")
+    print(f"⏳ 预算: {' / '.join(limits)}，用尽后不再取新瓦片")
+    return Budget(seconds, max_bytes, store)
+
+def schedule(tiles, budget):
+    """给瓦片流加上预算"""
+    return budget.limit(tiles) if budget is not None else tiles
+
+def finish_budget(budget):
+    """显示预算是否用尽"""
+    if budget is None or not budget.stopped:
+        return
+    reason = '时间' if budget.stopped == 'time' else '字节'
+    print(f"⏳ {reason}预算用尽，已停止（新写入 {budget.spent_bytes() / 1024 / 1024:.1f} MB）；"
+          f"重新运行会跳过已完成的瓦片继续下载")
+
+def make_claims(args):
+    """指定 --claims / --claims-dir 时按分片租约与同时运行的其他下载进程分工"""
+    if not args.claims and not args.claims_dir:
+        return None
+    directory = args.claims_dir or default_claims(args.tiles_dir)
+    claims = ShardClaims(directory).start()
+    side = 2 ** claims.shard_bits
+    print(f"🤝 分片租约: {directory}/（每片 {side}×{side} 个瓦片），与同时运行的其他下载进程分工")
+    return claims
+
+def claimed(claims, store, tiles):
+    """只交出本进程申领到的分片中的瓦片"""
+    return claims.claim(tiles, store) if claims is not None else tiles
+
+def track_claims(claims, on_result):
+    """瓦片有了最终结果时通知租约，分片空闲后释放"""
+    if claims is None:
+        return on_result
+
+    def wrapped(i, total, tile, result):
+        claims.finish(tile)
+        on_result(i, total, tile, result)
+    return wrapped
+
+def finish_claims(claims, store, download, stopped=False):
+    """
+    第一轮跳过的分片：等其他进程释放或租约过期后接手，只补下仍缺的瓦片
+
+    参数:
+        download: download(tiles, total) → 结果计数
+        stopped: 预算已用尽，不再接手，只释放租约
+
+    返回:
+        dict: 接手后补下的结果计数
+    """
+    totals = new_stats()
+    if claims is None:
+        return totals
+    # 提交清单再等待，不让未提交的事务挡住其他进程写入
+    store.flush()
+    claims.release_all()
+    if claims.pending() and not stopped:
+        print(f"\n⏳ {claims.pending()} 个分片（{claims.pending_tiles()} 个瓦片）正由其他进程下载，"
+              f"等待它们完成或租约过期...")
+        while claims.pending():
+            tiles = claims.take(store)
+            if tiles:
+                print(f"🤝 接手 {len(tiles)} 个仍缺失的瓦片")
+                merge_stats(totals, download(tiles, len(tiles)))
+            # 接手时补记的清单记录也要提交，再释放租约或等待
+            store.flush()
+            claims.release_all()
+            if claims.pending() and not tiles:
+                time.sleep(CLAIM_POLL)
+    claims.close()
+    print(f"🤝 分片: 申领 {claims.claimed} 次（其中接手过期租约 {claims.taken_over} 次）")
+    return totals
+
+def announce_zooms(tiles):
+    """按需转发瓦片，每进入一个新的缩放级别时显示一行"""
+    current = None
+    for tile in tiles:
+        if tile[0] != current:
+            current = tile[0]
+            print(f"\n📦 正在下载缩放级别 {current}...")
+        yield tile
+
+def confirm_start(args):
+    """确认是否开始下载"""
+    if args.yes:
+        return True
+    confirm = input("⚠️  是否开始下载？(y/n): ")
+    if confirm.lower() != 'y':
+        print("❌ 已取消下载")
+        return False
+    return True
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""dedupe 模式 - 相同内容的瓦片只保存一份，并按层级报告重复率"""
+
+import time
+
+from ..mbtiles import MBTilesStore, open_tile_store
+
+def run_dedupe(args):
+    """统计重复瓦片，并把重复的瓦片换成链接（目录）或转换为去重布局（MBTiles）"""
+    from ..dedup import scan, link_duplicates
+
+    print("=" * 60)
+    print("🧬 瓦片去重")
+    print("=" * 60)
+
+    store = open_tile_store(args.tiles_dir)
+    start = time.perf_counter()
+    groups, stats = scan(store)
+
+    print(f"\n{'层级':<6}{'瓦片':>8}{'不同内容':>10}{'重复率':>8}{'大小(KB)':>12}{'去重后(KB)':>12}")
+    print("-" * 60)
+    for zoom in sorted(stats):
+        s = stats[zoom]
+        ratio = (s['tiles'] - s['unique']) * 100 / s['tiles'] if s['tiles'] else 0
+        print(f"Z{zoom:<5}{s['tiles']:>8}{s['unique']:>10}{ratio:>7.1f}%"
+              f"{s['bytes'] / 1024:>12.1f}{s['unique_bytes'] / 1024:>12.1f}")
+    print("-" * 60)
+
+    tiles = sum(s['tiles'] for s in stats.values())
+    total_bytes = sum(s['bytes'] for s in stats.values())
+    unique_bytes = sum(s['unique_bytes'] for s in stats.values())
+    ratio = (tiles - len(groups)) * 100 / tiles if tiles else 0
+    print(f"共 {tiles} 个瓦片，{len(groups)} 种内容，重复率 {ratio:.1f}%，"
+          f"可节省 {(total_bytes - unique_bytes) / 1024 / 1024:.2f} MB")
+
+    if args.dry_run:
+        store.close()
+        return
+
+    if isinstance(store, MBTilesStore):
+        if store.deduplicate():
+            print("\n✓ 归档已转换为去重布局（map + images）")
+        else:
+            print("\n✓ 归档已是去重布局")
+    else:
+        linked = link_duplicates(store, groups, args.symlink)
+        kind = "符号链接" if args.symlink else "硬链接"
+        print(f"\n✓ 新建 {linked} 个{kind}")
+    store.close()
+    print(f"用时 {time.perf_counter() - start:.1f} 秒")
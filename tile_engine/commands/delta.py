@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""delta 模式 - 比较两个快照，生成只含增删改瓦片的增量包"""
+
+import time
+
+
+def print_delta_stats(stats):
+    """按层级显示增删改数量"""
+    print(f"\n{'层级':<6}{'新增':>8}{'变化':>8}{'删除':>8}")
+    print("-" * 30)
+    for zoom in sorted(stats):
+        s = stats[zoom]
+        print(f"Z{zoom:<5}{s['added']:>8}{s['changed']:>8}{s['deleted']:>8}")
+    print("-" * 30)
+
+def run_delta(args):
+    """比较两个快照，写出增量包"""
+    from ..delta import build_delta, delta_stats
+
+    print("=" * 60)
+    print("🧮 增量包")
+    print("=" * 60)
+    print(f"旧快照: {args.old}")
+    print(f"新快照: {args.new}\n")
+
+    def on_progress(done, tile):
+        if done % 2000 == 0:
+            print(f"  已计算哈希: {done} 个瓦片")
+
+    start = time.perf_counter()
+    try:
+        index = build_delta(args.old, args.new, args.output, on_progress)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"❌ {e}")
+        return
+
+    added, changed, deleted = index['added'], index['changed'], index['deleted']
+    print_delta_stats(delta_stats(added, changed, deleted))
+    print(f"旧快照 {index['base_tiles']} 个瓦片 → 新快照 {index['target_tiles']} 个瓦片，"
+          f"用时 {time.perf_counter() - start:.1f} 秒")
+    if not (added or changed or deleted):
+        print("✓ 两个快照内容相同，无需部署")
+        return
+    print(f"✓ 新增 {len(added)} | 变化 {len(changed)} | 删除 {len(deleted)} → {args.output}"
+          f"（{index['blobs']} 份内容，{index['bytes'] / 1024 / 1024:.2f} MB）")
+    print(f"💡 部署端: python -m tile_engine --tiles-dir docs/tiles apply {args.output}")
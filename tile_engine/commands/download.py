@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""download 模式 - 逐个下载，两次请求之间保持最小间隔"""
+
+from ..fetcher import Fetcher
+from ..downloader import download_sequential, merge_stats
+from ..ratelimit import TokenBucket
+from .common import (play_done_sound, build_plan, print_plan, open_store, make_pool, print_pool, print_limiter,
+                     make_retry, finish_retry, plan_progress, end_progress, start_metrics, track_results,
+                     finish_metrics, make_order, make_budget, schedule, finish_budget, make_claims, claimed,
+                     track_claims, finish_claims, announce_zooms, confirm_start)
+
+def run_download(args):
+    """普通模式：逐个下载，每个瓦片之间延迟"""
+    print("=" * 60)
+    print("🗺️  OpenStreetMap 瓦片下载器")
+    print("=" * 60)
+
+    plan = build_plan(args)
+    # 固定间隔 = 速率 1/delay 的令牌桶，只有真正发请求才等待，被限流时自动降速
+    rate = 1.0 / args.delay if args.delay > 0 else None
+    limiter = TokenBucket(rate=rate, max_rate=rate, burst=1)
+    print_plan(plan)
+
+    if not confirm_start(args):
+        return
+
+    store = open_store(args)
+    events = plan_progress(args, store, 'download', plan)
+
+    print("\n" + "=" * 60)
+    print("🚀 开始下载瓦片...")
+    print("=" * 60 + "\n")
+
+    retry = make_retry(args)
+    metrics, server = start_metrics(args, retry)
+    url, pool = make_pool(args)
+    fetcher = Fetcher(url, metrics=metrics, pool=pool)
+    total_downloaded = 0
+    total_failed = 0
+
+    def on_result(i, total, tile, result):
+        z, x, y = tile
+        if result == 'success':
+            print(f"✓ 下载成功: {z}/{x}/{y}.png")
+        elif result != 'exists':
+            print(f"✗ 下载失败: {z}/{x}/{y}.png ({result})")
+
+    # 所有层级在一条流水线里按需生成，不预先展开瓦片列表
+    order = make_order(args, plan)
+    budget = make_budget(args, store)
+    tiles = order.plan_tiles(plan) if order else announce_zooms(plan.tiles())
+    claims = make_claims(args)
+    callback = track_results(metrics, track_claims(claims, on_result))
+
+    def download(tasks, total):
+        return download_sequential(tasks, fetcher, store, callback, limiter, retry, total=total)
+
+    if metrics:
+        metrics.add_planned(plan.count())
+    stats = download(schedule(claimed(claims, store, tiles), budget), plan.count())
+    merge_stats(stats, finish_claims(claims, store, download, budget is not None and budget.stopped))
+    fetcher.close()
+    total_downloaded += stats['success'] + stats['exists']
+    total_failed += stats['failed']
+
+    print("\n" + "=" * 60)
+    print("📊 下载完成！")
+    print("=" * 60)
+    print(f"✓ 成功下载: {total_downloaded} 个瓦片")
+    print(f"✗ 下载失败: {total_failed} 个瓦片")
+    finish_budget(budget)
+    print_limiter(limiter)
+    print_pool(pool)
+    finish_retry(args, retry, plan.count(), store)
+    finish_metrics(args, metrics, server)
+    print(f"💾 保存位置: {store.root}/")
+    print("=" * 60)
+
+    end_progress(events)
+    store.close()
+    play_done_sound()
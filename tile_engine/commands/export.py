@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""export 模式 - 在目录布局和 MBTiles 归档之间转换"""
+
+import time
+
+from ..mbtiles import open_tile_store, export_tiles
+
+def run_export(args):
+    """在目录布局和 MBTiles 归档之间转换"""
+    print("=" * 60)
+    print("📦 瓦片导出")
+    print("=" * 60)
+    print(f"源: {args.src}")
+    print(f"目标: {args.dst}\n")
+
+    start = time.perf_counter()
+    src = open_tile_store(args.src)
+    dst = open_tile_store(args.dst)
+
+    def on_progress(done, tile):
+        if done % 500 == 0:
+            print(f"  已复制: {done} 个瓦片")
+
+    count, total_bytes = export_tiles(src, dst, on_progress)
+    src.close()
+    dst.close()
+
+    print(f"\n✓ 已导出 {count} 个瓦片（{total_bytes / 1024 / 1024:.1f} MB），"
+          f"用时 {time.perf_counter() - start:.1f} 秒")
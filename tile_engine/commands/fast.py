@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""fast 模式 - 线程池或 asyncio 并发下载，--refresh 时对到期瓦片发条件请求"""
+
+from ..config import REFRESH_DEFAULT_AGE
+from ..fetcher import Fetcher
+from ..downloader import download_threaded, new_stats, merge_stats
+from ..ratelimit import format_rate
+from ..refresh import RefreshPolicy, parse_zoom_ages
+from .common import (play_done_sound, build_plan, print_plan, open_store, make_pool, print_pool, make_limiter,
+                     print_limiter, make_retry, finish_retry, plan_progress, end_progress, start_metrics,
+                     track_results, finish_metrics, make_order, make_budget, schedule, finish_budget, make_claims,
+                     claimed, track_claims, finish_claims, confirm_start)
+
+def run_fast(args):
+    """快速模式：线程池或 asyncio 并发下载，无延迟"""
+    print("=" * 60)
+    print("🗺️  OpenStreetMap 瓦片下载器（快速版）")
+    print("=" * 60)
+
+    plan = build_plan(args)
+    limiter = make_limiter(args)
+    print_plan(plan)
+
+    if args.refresh and args.no_manifest:
+        print("❌ 刷新模式需要瓦片清单，不能与 --no-manifest 同时使用")
+        return
+
+    if not confirm_start(args):
+        return
+
+    store = open_store(args)
+    events = plan_progress(args, store, 'refresh' if args.refresh else 'fast', plan)
+    refresh = None
+    if args.refresh:
+        default_age = args.max_age if args.max_age is not None else REFRESH_DEFAULT_AGE
+        max_age = {} if args.max_age is not None else None
+        refresh = RefreshPolicy(max_age, default_age)
+        refresh.max_age.update(parse_zoom_ages(args.zoom_age))
+
+    print("\n" + "=" * 60)
+    print("🔄 开始刷新到期瓦片（条件请求）..." if refresh else "🚀 开始下载瓦片...")
+    if args.engine == 'async':
+        print(f"⚙️  异步并发数: {args.concurrency} | 连接数: {args.connections}")
+    else:
+        print(f"⚙️  并发线程数: {args.threads}")
+    if limiter:
+        print(f"🚦 限流: {format_rate(limiter.rate)} ~ {format_rate(limiter.max_rate)} 请求/秒"
+              f"（自适应{'，收到 429/503 后开始限流' if limiter.rate is None else ''}）")
+    print("=" * 60 + "\n")
+
+    retry = make_retry(args)
+    metrics, server = start_metrics(args, retry)
+    url, pool = make_pool(args)
+
+    fetcher = None
+    if args.engine == 'async':
+        from ..async_engine import download_async
+
+        def download(tasks, total, on_result):
+            return download_async(tasks, store, args.concurrency, on_result, limiter, retry,
+                                  args.refresh, total, url_template=url,
+                                  max_connections=args.connections, metrics=metrics, pool=pool)
+    else:
+        fetcher = Fetcher(url, metrics=metrics, pool=pool, pool_size=args.threads)
+
+        def download(tasks, total, on_result):
+            return download_threaded(tasks, fetcher, store, args.threads, on_result, limiter, retry,
+                                     args.refresh, total)
+
+    def on_result(i, total, tile, result):
+        if i % 50 == 0 or i == total:
+            print(f"  进度: {i}/{total} ({i*100//total}%)")
+
+    # 所有层级在一条流水线里按需生成，低层级的收尾和高层级的开头可以同时进行
+    order = make_order(args, plan)
+    budget = make_budget(args, store)
+    if refresh:
+        due = {}
+        for zoom in plan.zooms():
+            due[zoom] = refresh.due_tiles(store, plan, zoom)
+            print(f"📦 缩放级别 {zoom}: {len(due[zoom])} 个瓦片超过 {refresh.age_days(zoom):g} 天，需要刷新")
+        tasks = (tile for zoom in plan.zooms() for tile in due[zoom])
+        if order:
+            tasks = order.order(tasks)
+        total = sum(len(tiles) for tiles in due.values())
+    else:
+        for zoom in plan.zooms():
+            print(f"📦 缩放级别 {zoom}: {plan.count(zoom)} 个瓦片")
+        tasks = order.plan_tiles(plan) if order else plan.tiles()
+        total = plan.count()
+    print()
+    claims = make_claims(args)
+    callback = track_results(metrics, track_claims(claims, on_result))
+    if metrics:
+        metrics.add_planned(total)
+    totals = download(schedule(claimed(claims, store, tasks), budget), total, callback) if total else new_stats()
+    merge_stats(totals, finish_claims(claims, store, lambda tiles, count: download(tiles, count, callback),
+                                      budget is not None and budget.stopped))
+    if fetcher is not None:
+        fetcher.close()
+
+    print("\n" + "=" * 60)
+    print("📊 下载完成！")
+    print("=" * 60)
+    print(f"✓ 新下载: {totals['success']} 个瓦片")
+    print(f"⊙ 已存在: {totals['exists']} 个瓦片")
+    if refresh:
+        print(f"↺ 未变化: {totals['not_modified']} 个瓦片（304 或内容相同，未写盘）")
+    print(f"✗ 下载失败: {totals['failed']} 个瓦片")
+    finish_budget(budget)
+    print_limiter(limiter)
+    print_pool(pool)
+    finish_retry(args, retry, plan.count(), store)
+    finish_metrics(args, metrics, server)
+    print(f"💾 保存位置: {store.root}/")
+    print("=" * 60)
+
+    end_progress(events)
+    store.close()
+    play_done_sound()
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""index 模式 - 扫描瓦片目录重建清单"""
+
+import time
+
+from ..mbtiles import open_tile_store
+from ..manifest import Manifest
+
+def run_index(args):
+    """扫描瓦片目录，重建清单"""
+    print("=" * 60)
+    print("📇 重建瓦片清单")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    try:
+        manifest = Manifest(args.manifest, root=args.tiles_dir)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+    store = open_tile_store(args.tiles_dir, manifest, autoindex=False)
+    count = store.reindex()
+    progress = store.manifest.progress()
+    store.close()
+
+    for zoom, done in progress.items():
+        print(f"  缩放级别 {zoom}: {done} 个瓦片")
+    print(f"\n✓ 已索引 {count} 个瓦片，用时 {time.perf_counter() - start:.1f} 秒")
+    print(f"💾 清单: {args.manifest}")
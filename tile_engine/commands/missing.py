@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""missing 模式 - 只下载指定层级缺失的瓦片，或补下失败报告中的瓦片"""
+
+from ..fetcher import Fetcher
+from ..downloader import download_threaded, merge_stats, OK_RESULTS
+from ..retry import load_failure_report
+from .common import (play_done_sound, build_plan, open_store, make_pool, print_pool, make_limiter, print_limiter,
+                     make_retry, finish_retry, start_progress, end_progress, start_metrics, track_results,
+                     finish_metrics, make_claims, claimed, track_claims, finish_claims)
+
+def run_missing(args):
+    """补漏模式：只下载指定层级（或失败报告中）缺失的瓦片"""
+    print("=" * 60)
+    print("缺失瓦片下载器")
+    print("=" * 60)
+
+    store = open_store(args)
+    limiter = make_limiter(args)
+    retry = make_retry(args)
+
+    print("检查已下载瓦片...")
+    if args.from_report:
+        # 直接使用上次运行的失败报告，不扫描整个层级
+        candidates = load_failure_report(args.from_report)
+        print(f"\n失败报告: {args.from_report}")
+        print(f"总需求: {len(candidates)} 个瓦片\n")
+        label = "报告中的瓦片"
+        total, done = {}, {}
+        for z, x, y in candidates:
+            total[z] = total.get(z, 0) + 1
+            done[z] = done.get(z, 0) + store.exists(z, x, y)
+    else:
+        zoom = args.zoom
+        plan = build_plan(args, zoom, zoom)
+        x_min, x_max, y_min, y_max = plan.ranges[zoom]
+        candidates = plan.tiles(zoom)
+        print(f"\n缩放级别: {zoom}")
+        print(f"范围: X({x_min}-{x_max}), Y({y_min}-{y_max})")
+        print(f"总需求: {plan.count(zoom)} 个瓦片\n")
+        label = f"层级 {zoom}"
+        total, done = {zoom: plan.count(zoom)}, {zoom: store.count(plan, zoom)}
+
+    # 缺失的瓦片在下载时按需筛选，不预先展开列表
+    tasks = (tile for tile in candidates if not store.exists(*tile))
+    total_needed = sum(total.values())
+    downloaded_count = sum(done.values())
+    missing_count = total_needed - downloaded_count
+
+    percent = downloaded_count * 100 // total_needed if total_needed > 0 else 100
+    print(f"已下载: {downloaded_count}/{total_needed} ({percent}%)")
+    print(f"缺失: {missing_count} 个瓦片")
+
+    if missing_count == 0:
+        print("\n所有瓦片已完整下载！")
+        store.close()
+        return
+
+    events = start_progress(args, store, 'missing', total, done)
+
+    print(f"\n开始下载 {missing_count} 个缺失瓦片...")
+    print(f"并发线程: {args.threads}")
+    print("=" * 60)
+
+    progress = {'success': 0, 'failed': 0}
+
+    def on_result(i, total, tile, result):
+        # 其他进程已下载（exists）也算完成，不计为失败
+        if result in OK_RESULTS:
+            progress['success'] += 1
+        else:
+            progress['failed'] += 1
+        if i % 50 == 0 or i == total:
+            print(f"进度: {i}/{total} ({i*100//total}%) | 成功: {progress['success']} | 失败: {progress['failed']}")
+
+    metrics, server = start_metrics(args, retry)
+    url, pool = make_pool(args)
+    fetcher = Fetcher(url, metrics=metrics, pool=pool, pool_size=args.threads)
+    claims = make_claims(args)
+    callback = track_results(metrics, track_claims(claims, on_result))
+
+    def download(tasks, total):
+        return download_threaded(tasks, fetcher, store, args.threads, callback, limiter, retry, total=total)
+
+    if metrics:
+        metrics.add_planned(missing_count)
+    stats = download(claimed(claims, store, tasks), missing_count)
+    # 接手其他进程分片时补下的瓦片也计入结果
+    merge_stats(stats, finish_claims(claims, store, download))
+    fetcher.close()
+
+    print("\n" + "=" * 60)
+    print("下载完成！")
+    print("=" * 60)
+    print(f"新下载: {stats['success']} 个瓦片")
+    if stats['exists']:
+        print(f"其他进程已下载: {stats['exists']} 个瓦片")
+    print(f"下载失败: {stats['failed']} 个瓦片")
+    print_limiter(limiter)
+    print_pool(pool)
+    finish_retry(args, retry, total_needed, store)
+    finish_metrics(args, metrics, server)
+
+    if claims is None:
+        # 最终结果由本次下载结果推算，无需再扫描一遍
+        final_count = downloaded_count + stats['success'] + stats['exists']
+    else:
+        # 其他进程同时补下的瓦片不在本次结果中，重新统计
+        store.flush()
+        if args.from_report:
+            final_count = sum(store.exists(*tile) for tile in candidates)
+        else:
+            final_count = store.count(plan, zoom)
+    final_percent = final_count * 100 // total_needed
+    print(f"\n{label} 最终状态: {final_count}/{total_needed} ({final_percent}%)")
+
+    if final_count < total_needed:
+        print(f"仍缺失: {total_needed - final_count} 个瓦片")
+    else:
+        print("已完整！")
+    print("💡 最终状态只统计已保存的瓦片，可用 verify 检查内容是否完整")
+
+    print("=" * 60)
+
+    end_progress(events)
+    store.close()
+    play_done_sound()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""monitor 模式 - 订阅进度事件日志实时显示进度，没有日志时轮询清单 / 目录"""
+
+import os
+import time
+
+from ..progress import ProgressTail, format_duration
+from .common import clear_screen, build_plan, open_store
+
+def run_monitor(args):
+    """实时监控各层级的下载进度"""
+    if not args.no_progress_log and os.path.exists(args.progress_log):
+        return monitor_events(args)
+
+    print("=" * 70)
+    print(" " * 20 + "瓦片下载实时监控")
+    print("=" * 70)
+    print("\n监控中... (按 Ctrl+C 停止)\n")
+
+    # 计划只计算一次，每次刷新只查询清单，不扫描文件系统
+    plan = build_plan(args)
+    store = open_store(args, readonly=True)
+
+    last_totals = {}
+    check_count = 0
+    total_downloaded = 0
+    total_needed = plan.count()
+    total_percent = 0
+
+    try:
+        while True:
+            clear_screen()
+
+            print("=" * 70)
+            print(" " * 22 + "瓦片下载实时监控")
+            print("=" * 70)
+
+            total_downloaded = 0
+
+            # 显示各层级状态
+            for zoom in plan.zooms():
+                needed = plan.count(zoom)
+                downloaded = store.count(plan, zoom)
+                total_downloaded += downloaded
+
+                percent = downloaded * 100 // needed if needed > 0 else 0
+                remaining = needed - downloaded
+
+                # 进度条
+                bar_width = 30
+                filled = int(bar_width * downloaded / needed) if needed > 0 else 0
+                bar = '=' * filled + '-' * (bar_width - filled)
+
+                status = "OK" if downloaded >= needed else "DL"
+
+                # 计算速度（与上次比较）
+                speed = ""
+                if zoom in last_totals:
+                    diff = downloaded - last_totals[zoom]
+                    if diff > 0:
+                        speed = f" (+{diff})"
+
+                print(f"[{status}] Z{zoom}: {downloaded:4d}/{needed} |{bar}| {percent:3d}%  剩余:{remaining:4d}{speed}")
+
+                last_totals[zoom] = downloaded
+
+            # 总计
+            total_percent = total_downloaded * 100 // total_needed if total_needed > 0 else 0
+            total_remaining = total_needed - total_downloaded
+
+            print("=" * 70)
+            print(f"总计: {total_downloaded}/{total_needed} ({total_percent}%)  剩余: {total_remaining} 个")
+            print("=" * 70)
+
+            if total_remaining == 0:
+                print("\n*** 所有瓦片下载完成！ ***\n")
+                break
+
+            print(f"\n检查次数: {check_count + 1} | 刷新间隔: {args.interval}秒")
+            print("提示: 在另一个窗口运行 python download_missing_tiles.py\n")
+
+            check_count += 1
+            time.sleep(args.interval)
+
+    except KeyboardInterrupt:
+        print("\n\n监控已停止")
+
+    store.close()
+    print(f"\n最终统计: {total_downloaded}/{total_needed} ({total_percent}%)")
+
+def monitor_events(args):
+    """订阅下载进程的进度事件：不扫描文件，也不查询清单"""
+    tail = ProgressTail(args.progress_log)
+
+    try:
+        while True:
+            tail.poll()
+            clear_screen()
+
+            print("=" * 70)
+            print(" " * 22 + "瓦片下载实时监控")
+            print("=" * 70)
+
+            for zoom in sorted(tail.total):
+                needed = tail.total[zoom]
+                downloaded = tail.done.get(zoom, 0)
+                percent = downloaded * 100 // needed if needed > 0 else 100
+                filled = int(30 * downloaded / needed) if needed > 0 else 30
+                bar = '=' * filled + '-' * (30 - filled)
+                status = "OK" if downloaded >= needed else "DL"
+                print(f"[{status}] Z{zoom}: {downloaded:5d}/{needed:<5d} |{bar}| {percent:3d}%  剩余:{needed - downloaded:5d}")
+
+            total_needed = sum(tail.total.values())
+            total_done = sum(tail.done.values())
+            tiles_per_sec, bytes_per_sec = tail.rates()
+            print("=" * 70)
+            print(f"总计: {total_done}/{total_needed}  剩余: {tail.remaining()} 个  失败: {tail.failed}")
+            print(f"速度: {tiles_per_sec:.1f} 瓦片/秒 | {bytes_per_sec / 1024:.1f} KB/秒 | "
+                  f"已下载 {tail.bytes / 1024 / 1024:.1f} MB | 预计剩余 {format_duration(tail.eta())}")
+            print("=" * 70)
+
+            if tail.total and tail.remaining() == 0:
+                print("\n*** 所有瓦片下载完成！ ***\n")
+                break
+            if not tail.running:
+                if tail.expired:
+                    print(f"\n⚠️ {tail.expired} 个下载进程没有正常结束（被强制终止？），进度停在上面的位置")
+                print("\n下载进程未在运行，等待下一轮开始... (按 Ctrl+C 停止)")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n\n监控已停止")
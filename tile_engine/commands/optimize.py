@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""optimize 模式 - 在进程池中重新压缩瓦片"""
+
+import os
+import time
+
+from .common import open_store
+
+def run_optimize(args):
+    """重新压缩已下载的瓦片，按层级报告节省的空间"""
+    from ..optimize import optimize_store, check_method
+
+    print("=" * 60)
+    print("🗜️  瓦片压缩")
+    print("=" * 60)
+
+    try:
+        check_method(args.method)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+
+    store = open_store(args)
+    print(f"方式: {args.method} | 进程数: {args.workers or os.cpu_count()}")
+    if args.method == 'webp':
+        print(f"输出: {args.output}/")
+    if store.manifest is None:
+        print("⚠️  未使用清单，无法增量处理，将压缩全部瓦片")
+    print()
+
+    def on_progress(done, tile):
+        if done % 500 == 0:
+            print(f"  已处理: {done} 个瓦片")
+
+    start = time.perf_counter()
+    stats = optimize_store(store, args.method, args.workers, args.output, args.force, on_progress,
+                           colors=args.colors, quality=args.quality)
+    store.close()
+
+    print(f"\n{'层级':<6}{'处理':>8}{'跳过':>8}{'压缩前(KB)':>14}{'压缩后(KB)':>14}{'节省':>8}")
+    print("-" * 60)
+    before = after = 0
+    for zoom in sorted(stats):
+        s = stats[zoom]
+        before += s['before']
+        after += s['after']
+        saved = (s['before'] - s['after']) * 100 / s['before'] if s['before'] else 0
+        print(f"Z{zoom:<5}{s['tiles']:>8}{s['skipped']:>8}{s['before'] / 1024:>14.1f}"
+              f"{s['after'] / 1024:>14.1f}{saved:>7.1f}%")
+    print("-" * 60)
+
+    errors = sum(s['errors'] for s in stats.values())
+    saved = (before - after) * 100 / before if before else 0
+    print(f"✓ 共节省 {(before - after) / 1024 / 1024:.2f} MB（{saved:.1f}%），"
+          f"用时 {time.perf_counter() - start:.1f} 秒")
+    if errors:
+        print(f"✗ 处理失败: {errors} 个瓦片（保留原图）")
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""plan 模式 - 只计算下载计划，可导出瓦片列表"""
+
+from .common import build_plan, print_plan
+
+def run_plan(args):
+    """只计算下载计划，不下载"""
+    print("=" * 60)
+    print("🧭 下载计划")
+    print("=" * 60)
+
+    plan = build_plan(args)
+    print_plan(plan)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for z, x, y in plan.tiles():
+                f.write(f"{z}/{x}/{y}\n")
+        print(f"📝 瓦片列表: {args.output}")
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""serve 模式 - 本地瓦片服务器，缺失的瓦片按需下载一次并保存"""
+
+from ..fetcher import Fetcher
+from .common import open_store, make_pool, print_pool, make_limiter
+
+def run_serve(args):
+    """本地瓦片服务器：docs/ 静态文件 + 按需补齐的 /tiles"""
+    from ..server import TileCache, TileServer
+
+    store = open_store(args)
+    fetcher = pool = limiter = None
+    if not args.offline:
+        url, pool = make_pool(args)
+        fetcher = Fetcher(url, pool=pool)
+        limiter = make_limiter(args)
+    cache = TileCache(store, fetcher, int(args.cache_mb * 1024 * 1024), limiter)
+    server = TileServer(cache, args.root, args.host, args.port)
+
+    print("=" * 60)
+    print("🗺️  本地瓦片服务器")
+    print("=" * 60)
+    print(f"🌐 地址: {server.url}")
+    print(f"📁 网页: {args.root}/ | 瓦片: {store.root}")
+    print(f"🧠 内存缓存: {args.cache_mb:g} MB")
+    print("📴 离线模式：缺失的瓦片返回 404" if args.offline else "⬇️  缺失的瓦片向上游下载一次并保存")
+    print("按 Ctrl+C 停止\n")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if fetcher is not None:
+            fetcher.close()
+        store.close()
+
+    stats = cache.stats
+    print(f"\n📊 内存命中 {stats['memory']} | 本地命中 {stats['store']} | 上游补齐 {stats['upstream']} | "
+          f"合并请求 {stats['coalesced']} | 缺失 {stats['missing']}")
+    print_pool(pool)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""synth 模式 - 由相邻层级合成缺失的瓦片，不联网"""
+
+import os
+import time
+
+from .common import build_plan, open_store
+
+def run_synth(args):
+    """用已有瓦片合成缺失的瓦片，按层级报告数量"""
+    from ..synth import synthesize, check_pillow
+
+    print("=" * 60)
+    print("🧩 瓦片合成")
+    print("=" * 60)
+
+    try:
+        check_pillow()
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+
+    up_to = max(args.max_zoom, args.up_to or args.max_zoom)
+    plan = build_plan(args, args.min_zoom, up_to)
+    store = open_store(args)
+    print(f"层级: {plan.zooms()[0]}-{plan.zooms()[-1]} | 进程数: {args.workers or os.cpu_count()}")
+    if store.manifest is None:
+        print("⚠️  未使用清单，合成的瓦片无法标记，刷新时不会被真实瓦片替换")
+    print()
+
+    def on_progress(done, tile):
+        if done % 500 == 0:
+            print(f"  已合成: {done} 个瓦片")
+
+    start = time.perf_counter()
+    stats = synthesize(store, plan, args.workers, not args.no_down, not args.no_up, on_progress)
+    missing = {z: plan.count(z) - store.count(plan, z) for z in plan.zooms()}
+    store.close()
+
+    print(f"\n{'层级':<6}{'缩小合成':>10}{'放大合成':>10}{'失败':>6}{'仍缺失':>8}")
+    print("-" * 44)
+    for zoom in sorted(stats):
+        s = stats[zoom]
+        print(f"Z{zoom:<5}{s['down']:>10}{s['up']:>10}{s['errors']:>6}{missing[zoom]:>8}")
+    print("-" * 44)
+    made = sum(s['down'] + s['up'] for s in stats.values())
+    print(f"✓ 合成 {made} 个瓦片，用时 {time.perf_counter() - start:.1f} 秒")
+    if store.manifest is not None and made:
+        print("💡 合成的瓦片已在清单中标记，联网时 fast --refresh 会用真实瓦片替换")
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""verify 模式 - 检查瓦片是否为完整的 PNG，坏瓦片移出存储，--repair 时重新下载"""
+
+import time
+
+from ..fetcher import Fetcher
+from ..downloader import download_threaded
+from ..retry import write_failure_report
+from .common import open_store, make_pool, print_pool, make_limiter, print_limiter, make_retry, finish_retry
+
+def run_verify(args):
+    """检查瓦片内容，按层级报告坏瓦片；坏瓦片移出存储，--repair 时立即重新下载"""
+    from ..verify import verify_store, discard_bad, CORRUPT_PREFIX
+
+    print("=" * 60)
+    print("🔍 瓦片校验")
+    print("=" * 60)
+
+    store = open_store(args)
+    print(f"瓦片: {store.root} | 线程数: {args.workers}")
+    if store.manifest is None:
+        print("⚠️  未使用清单，无法增量检查，将检查全部瓦片")
+    print()
+
+    def on_progress(done, tile):
+        if done % 2000 == 0:
+            print(f"  已检查: {done} 个瓦片")
+
+    start = time.perf_counter()
+    stats, bad = verify_store(store, args.workers, args.force, on_progress)
+
+    print(f"\n{'层级':<6}{'检查':>8}{'跳过':>8}{'损坏':>8}{'大小(MB)':>10}")
+    print("-" * 40)
+    for zoom in sorted(stats):
+        s = stats[zoom]
+        print(f"Z{zoom:<5}{s['checked']:>8}{s['skipped']:>8}{s['bad']:>8}{s['bytes'] / 1024 / 1024:>10.2f}")
+    print("-" * 40)
+    checked = sum(s['checked'] for s in stats.values())
+    skipped = sum(s['skipped'] for s in stats.values())
+    print(f"检查 {checked} 个瓦片，跳过 {skipped} 个未变化的瓦片，用时 {time.perf_counter() - start:.1f} 秒")
+
+    if not bad:
+        print("✓ 瓦片全部完好")
+        store.close()
+        return
+
+    reasons = {}
+    for _, _, _, reason in bad:
+        reasons[reason] = reasons.get(reason, 0) + 1
+    print(f"✗ 损坏: {len(bad)} 个瓦片（" + "，".join(f"{k} {v}" for k, v in sorted(reasons.items())) + "）")
+    for z, x, y, reason in bad[:10]:
+        print(f"   {z}/{x}/{y}.png  {reason}")
+    if len(bad) > 10:
+        print("   ...")
+
+    if args.dry_run:
+        store.close()
+        return
+
+    discard_bad(store, bad)
+    tiles = [(z, x, y) for z, x, y, _ in bad]
+    if not args.repair:
+        write_failure_report(args.report, [{'z': z, 'x': x, 'y': y, 'attempts': 0, 'result': CORRUPT_PREFIX + reason}
+                                           for z, x, y, reason in bad], len(bad))
+        print(f"🗑️  已移出存储 | 📝 失败报告: {args.report}（可用 missing --from-report 补下）")
+        store.close()
+        return
+
+    print(f"\n🔧 重新下载 {len(tiles)} 个坏瓦片...")
+    limiter = make_limiter(args)
+    retry = make_retry(args)
+    url, pool = make_pool(args)
+    fetcher = Fetcher(url, pool=pool, pool_size=args.threads)
+    results = download_threaded(tiles, fetcher, store, args.threads, None, limiter, retry)
+    fetcher.close()
+    print(f"✓ 修复: {results['success']} 个瓦片 | 失败: {results['failed']} 个")
+    print_limiter(limiter)
+    print_pool(pool)
+    finish_retry(args, retry, len(tiles), store)
+    store.close()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""wait 模式 - 等待下载完成并播放提示音"""
+
+import os
+import time
+
+from ..progress import ProgressTail, format_duration
+from .common import play_done_sound, build_plan, open_store
+
+def run_wait(args):
+    """等待下载完成并播放提示音"""
+    if not args.no_progress_log and os.path.exists(args.progress_log):
+        return wait_events(args)
+
+    print("=" * 60)
+    print("🔔 下载完成监控")
+    print("=" * 60)
+    print(f"正在监控 {args.tiles_dir}/ ...")
+    print("下载完成后会播放提示音\n")
+
+    plan = build_plan(args)
+    store = open_store(args, readonly=True)
+    expected_total = plan.count()
+    last_count = -1
+
+    try:
+        while True:
+            current_count = store.count(plan)
+
+            if current_count != last_count:
+                progress = current_count * 100 / expected_total
+                print(f"📊 进度: {current_count}/{expected_total} ({progress:.1f}%)")
+                last_count = current_count
+
+            if current_count >= expected_total:
+                print("\n" + "=" * 60)
+                print("✅ 下载完成！")
+                print("=" * 60)
+                play_done_sound()
+                break
+
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n\n监控已停止")
+
+    store.close()
+
+def wait_events(args):
+    """订阅进度事件，全部完成时播放提示音"""
+    print("=" * 60)
+    print("🔔 下载完成监控")
+    print("=" * 60)
+    print(f"正在订阅 {args.progress_log} ...")
+    print("下载完成后会播放提示音\n")
+
+    tail = ProgressTail(args.progress_log)
+    last_done = -1
+    try:
+        while True:
+            tail.poll()
+            total = sum(tail.total.values())
+            done = sum(tail.done.values())
+            if total and done != last_done:
+                tiles_per_sec, _ = tail.rates()
+                print(f"📊 进度: {done}/{total} ({done * 100 / total:.1f}%) | "
+                      f"{tiles_per_sec:.1f} 瓦片/秒 | 预计剩余 {format_duration(tail.eta())}")
+                last_done = done
+            if total and done >= total:
+                print("\n" + "=" * 60)
+                print("✅ 下载完成！")
+                print("=" * 60)
+                play_done_sound()
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\n\n监控已停止")
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片引擎配置参数
+
+原先分散在各下载脚本中的常量统一放在这里，所有模式共用一份。
+"""
+
+# ==================== 配置参数 ====================
+
+# 瓦片保存目录
+TILES_DIR = "docs/tiles"
+
+# 地图坐标范围（胡志明市及周边）
+# 激进优化范围 - 景点范围 + 1-2km 缓冲
+# 覆盖范围：胡志明市中心 + 美拖市（湄公河三角洲）
+MIN_LAT = 10.33   # 泰山岛（10.34）以南缓冲
+MAX_LAT = 10.79   # 粉红教堂（10.7815）以北缓冲
+MIN_LON = 106.36  # 美拖市（106.37）以西缓冲
+MAX_LON = 106.71  # 歌剧院（106.7018）以东缓冲
+
+# 缩放级别范围
+# 10: 整个胡志明市大区域
+# 11-13: 市区级别
+# 14-15: 街道详细级别
+MIN_ZOOM = 10
+MAX_ZOOM = 15    # 限制到15级以减少文件数量
+
+# OpenStreetMap 瓦片服务器
+TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+# 多个瓦片地址时（--url 可重复，{s} 按子域名展开）每个地址的并发上限
+TILE_SUBDOMAINS = "abc"
+ENDPOINT_CONCURRENCY = 4
+
+# 请求头设置（模拟浏览器）
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# 请求超时（秒）
+TIMEOUT = 10
+
+# 下载延迟（秒）- 普通模式使用，避免请求过快被限制
+DOWNLOAD_DELAY = 0.1
+
+# 并发下载线程数 - 快速模式默认值
+THREAD_COUNT = 5
+
+# 限流（请求/秒）- 快速模式的初始速率和自适应回升上限
+# 初始速率 None：第一次收到 429/503 之前不限流；上限 None：不设上限
+RATE_LIMIT = None
+RATE_LIMIT_MAX = None
+
+# 失败重试 - 每个瓦片最多尝试次数，以及指数退避的起始/最大等待（秒）
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+
+# 最终仍失败的瓦片报告
+FAILURE_REPORT = "failed_tiles.json"
+
+# 瓦片清单（SQLite），记录每个瓦片的状态、大小、哈希和 ETag
+# 默认瓦片目录使用 MANIFEST_PATH；其他 --tiles-dir 默认使用与之并列的 <tiles-dir>.manifest.sqlite
+MANIFEST_PATH = "tiles_manifest.sqlite"
+MANIFEST_SUFFIX = ".manifest.sqlite"
+
+# 进度事件日志（JSON Lines），下载进程追加写入，monitor / wait 模式持续读取
+PROGRESS_LOG = "tiles_progress.jsonl"
+
+# 分片租约目录：同时运行的多个下载进程（或共享目录的多台机器）按分片分工（--claims 开启）
+# 默认瓦片目录使用 CLAIMS_DIR；其他 --tiles-dir 默认使用与之并列的 <tiles-dir>.claims
+# 每个分片 2^CLAIM_SHARD_BITS × 2^CLAIM_SHARD_BITS 个瓦片，租约超过 CLAIM_TTL 秒未续约即视为失效
+CLAIMS_DIR = "tiles_claims"
+CLAIMS_SUFFIX = ".claims"
+CLAIM_SHARD_BITS = 4
+CLAIM_TTL = 60
+
+# 增量刷新 - 各缩放级别瓦片的最长保留天数，超过后用条件请求重新确认
+# 低层级只有大范围地物，很少变化
+REFRESH_MAX_AGE = {10: 180, 11: 180, 12: 90, 13: 60, 14: 30, 15: 30}
+REFRESH_DEFAULT_AGE = 30
+
+# ==================== 按景点规划 ====================
+
+# 行程数据（--pois 默认读取）
+POI_DATA = "data/data.js"
+# MIN_ZOOM ~ MAX_ZOOM 每个点周围保留的半径（公里）
+POI_RADIUS_KM = 1.5
+# 只在景点附近下载的更高层级
+POI_DETAIL_ZOOM = 17
+POI_DETAIL_RADIUS_KM = 0.3
+# 离主要区域超过这个距离的点不参与规划（例如出发地机场）
+POI_MAX_DISTANCE_KM = 100
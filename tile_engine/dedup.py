@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片去重 - 内容完全相同的瓦片只保存一份
+
+湄公河和美拖周边大量瓦片是纯水面或空地，逐字节相同。
+
+    目录布局   重复的瓦片换成指向第一份的硬链接（或相对符号链接）
+    MBTiles    转换为 map + images 去重布局（见 mbtiles.py）
+
+两种方式 Leaflet 看到的 {z}/{x}/{y}.png 都不变，显示效果完全一样。
+硬链接在 git 和 GitHub Pages 中按普通文件处理；符号链接适合打包好的离线包，
+下载过程中的去重请用 --dedup（硬链接）。
+"""
+
+import os
+import hashlib
+import tempfile
+
+
+def scan(store):
+    """
+    按内容哈希统计存储中的瓦片
+
+    返回:
+        (groups, stats)
+            groups: {sha1: [(z, x, y), ...]}，按遍历顺序，第一个为保留的那份
+            stats: {zoom: {'tiles', 'unique', 'bytes', 'unique_bytes'}}
+                   unique 为该层级中首次出现的内容数，跨层级重复只计一次
+    """
+    groups = {}
+    stats = {}
+    for z, x, y in sorted(store.iter_tiles()):
+        data = store.read(z, x, y)
+        if data is None:
+            continue
+        sha1 = hashlib.sha1(data).hexdigest()
+        s = stats.setdefault(z, {'tiles': 0, 'unique': 0, 'bytes': 0, 'unique_bytes': 0})
+        s['tiles'] += 1
+        s['bytes'] += len(data)
+        if sha1 not in groups:
+            groups[sha1] = []
+            s['unique'] += 1
+            s['unique_bytes'] += len(data)
+        groups[sha1].append((z, x, y))
+    return groups, stats
+
+
+def link_duplicates(store, groups, symlink=False):
+    """
+    把目录布局中的重复瓦片换成链接
+
+    已经是同一个 inode（之前链接过）的瓦片跳过，可以重复运行。
+
+    参数:
+        store: TileStore
+        groups: scan() 返回的分组
+        symlink: 使用相对符号链接代替硬链接
+
+    返回:
+        int: 新建的链接数
+    """
+    linked = 0
+    for tiles in groups.values():
+        if len(tiles) < 2:
+            continue
+        first = store.path(*tiles[0])
+        for tile in tiles[1:]:
+            path = store.path(*tile)
+            if symlink:
+                if os.path.islink(path):
+                    continue
+            elif os.path.samefile(first, path):
+                continue
+            _replace_with_link(first, path, symlink)
+            linked += 1
+    return linked
+
+
+def _replace_with_link(src, dst, symlink):
+    """先在同目录建好链接再原子替换，中途失败不会丢瓦片"""
+    directory = os.path.dirname(dst)
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    os.close(fd)
+    os.remove(tmp_path)
+    try:
+        if symlink:
+            os.symlink(os.path.relpath(src, directory), tmp_path)
+        else:
+            os.link(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+增量包 - 按内容哈希比较两个瓦片快照，只打包新增、变化和删除的瓦片
+
+换了规划区域或刷新瓦片之后，原来要重新提交、部署整个 docs/tiles。
+这里按 SHA-1 比较旧快照和新快照，部署时间和流量只取决于变化的部分：
+
+    快照     目录、.mbtiles 归档，或清单文件（只用其中记录的 SHA-1，
+             例如上次部署时留存的清单副本）；新快照要打包内容，必须是目录或归档
+
+增量包是一个 zip（PNG 已经压缩过，按 ZIP_STORED 存放）:
+
+    delta.json         格式、生成时间、新旧快照的瓦片数，以及
+                       added / changed / deleted 三个列表，每项 [z, x, y, 旧 SHA-1, 新 SHA-1]
+    blobs/{sha1}.png   新增和变化瓦片的内容，内容相同的瓦片（海面、空地）只存一份
+
+应用前先核对目标存储：要变化或删除的瓦片必须仍是旧内容，要新增的瓦片必须还不存在，
+已经是新内容的瓦片跳过。全部核对通过才开始修改，写入走存储的原子写并同步更新清单，
+同一个增量包重复应用不会做任何修改。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import zipfile
+import hashlib
+
+from .mbtiles import is_archive, open_tile_store
+from .manifest import Manifest
+
+DELTA_FORMAT = 'vn-tour-delta/1'
+DELTA_INDEX = 'delta.json'
+BLOB_DIR = 'blobs'
+
+SQLITE_HEADER = b'SQLite format 3\x00'
+# 清单 tiles 表特有的列
+MANIFEST_COLUMNS = {'z', 'x', 'y', 'state', 'sha1'}
+
+# 默认输出路径
+DELTA_PATH = 'tiles_delta.zip'
+
+# ==================== 快照 ====================
+
+def store_hashes(store, on_progress=None):
+    """
+    读取存储中每个瓦片的内容哈希
+
+    返回:
+        dict: {(z, x, y): sha1}
+    """
+    hashes = {}
+    for z, x, y in store.iter_tiles():
+        data = store.read(z, x, y)
+        if data is None:
+            continue
+        hashes[(z, x, y)] = hashlib.sha1(data).hexdigest()
+        if on_progress:
+            on_progress(len(hashes), (z, x, y))
+    return hashes
+
+
+def is_manifest(path):
+    """
+    是否为瓦片清单：SQLite 文件，且 tiles 表带有 state / sha1 列
+    （MBTiles 也是 SQLite，但它的 tiles 表没有这两列）
+    """
+    if not os.path.isfile(path):
+        return False
+    with open(path, 'rb') as f:
+        if f.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+            return False
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(tiles)")}
+    except sqlite3.DatabaseError:
+        return False
+    finally:
+        conn.close()
+    return MANIFEST_COLUMNS <= columns
+
+
+def snapshot(path, on_progress=None):
+    """
+    读取快照的内容哈希：清单直接查 SHA-1，目录和归档逐个瓦片计算
+
+    返回:
+        dict: {(z, x, y): sha1}
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"快照不存在: {path}")
+    if os.path.isfile(path) and not is_archive(path) and not is_manifest(path):
+        raise ValueError(f"无法识别的快照（不是目录、.mbtiles 或瓦片清单）: {path}")
+    if is_manifest(path):
+        manifest = Manifest(path, readonly=True)
+        try:
+            return manifest.hashes()
+        finally:
+            manifest.close()
+    store = open_tile_store(path)
+    try:
+        return store_hashes(store, on_progress)
+    finally:
+        store.close()
+
+
+def diff(old, new):
+    """
+    比较两个快照
+
+    返回:
+        (added, changed, deleted)，每项 [z, x, y, 旧 SHA-1, 新 SHA-1]，按 z、x、y 排序
+    """
+    added = [[*tile, None, sha1] for tile, sha1 in new.items() if tile not in old]
+    changed = [[*tile, old[tile], sha1] for tile, sha1 in new.items()
+               if tile in old and old[tile] != sha1]
+    deleted = [[*tile, sha1, None] for tile, sha1 in old.items() if tile not in new]
+    return sorted(added), sorted(changed), sorted(deleted)
+
+
+def delta_stats(added, changed, deleted):
+    """各层级的增删改数量 {zoom: {'added', 'changed', 'deleted'}}"""
+    stats = {}
+    for kind, entries in (('added', added), ('changed', changed), ('deleted', deleted)):
+        for z, *_ in entries:
+            s = stats.setdefault(z, {'added': 0, 'changed': 0, 'deleted': 0})
+            s[kind] += 1
+    return stats
+
+# ==================== 生成 ====================
+
+def build_delta(old_path, new_path, output=DELTA_PATH, on_progress=None):
+    """
+    比较两个快照并写出增量包
+
+    参数:
+        old_path: 旧快照（目录、.mbtiles 或清单）
+        new_path: 新快照（目录或 .mbtiles）
+        output: 增量包路径，没有任何变化时不写文件
+        on_progress: 计算哈希时每个瓦片调用 on_progress(done, tile)
+
+    返回:
+        dict: 增量包的索引（见模块说明），另加 blobs、bytes（写入的内容字节数）
+    """
+    if not os.path.exists(new_path):
+        # open_tile_store 会为不存在的 .mbtiles 新建空归档，生成的包就成了"删除全部瓦片"
+        raise FileNotFoundError(f"快照不存在: {new_path}")
+    if os.path.isfile(new_path) and not is_archive(new_path):
+        raise ValueError("新快照需要瓦片内容，请指定目录或 .mbtiles 归档")
+    old = snapshot(old_path, on_progress)
+
+    store = open_tile_store(new_path)
+    try:
+        new = store_hashes(store, on_progress)
+        added, changed, deleted = diff(old, new)
+        index = {
+            'format': DELTA_FORMAT,
+            'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'base_tiles': len(old),
+            'target_tiles': len(new),
+            'added': added,
+            'changed': changed,
+            'deleted': deleted,
+        }
+        blobs, size = write_package(output, index, store) if added or changed or deleted else (0, 0)
+        index.update(blobs=blobs, bytes=size)
+    finally:
+        store.close()
+    return index
+
+
+def write_package(output, index, store):
+    """
+    写出 zip，相同内容只存一份
+
+    返回:
+        (内容数, 内容字节数)
+    """
+    blobs = set()
+    size = 0
+    tmp = output + '.tmp'
+    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as package:
+        for z, x, y, _, sha1 in index['added'] + index['changed']:
+            if sha1 in blobs:
+                continue
+            data = store.read(z, x, y)
+            if hashlib.sha1(data).hexdigest() != sha1:
+                raise RuntimeError(f"瓦片 {z}/{x}/{y} 在打包过程中被修改，请重新生成")
+            package.writestr(f"{BLOB_DIR}/{sha1}.png", data)
+            blobs.add(sha1)
+            size += len(data)
+        # 索引放在最后写入，只有内容全部写完的包才带索引
+        package.writestr(DELTA_INDEX, json.dumps(index, separators=(',', ':')))
+    os.replace(tmp, output)
+    return len(blobs), size
+
+# ==================== 应用 ====================
+
+def read_index(package):
+    """读取并检查增量包索引"""
+    try:
+        index = json.loads(package.read(DELTA_INDEX))
+    except KeyError:
+        raise ValueError(f"不是增量包（缺少 {DELTA_INDEX}）")
+    if index.get('format') != DELTA_FORMAT:
+        raise ValueError(f"不支持的增量包格式: {index.get('format')}")
+    return index
+
+
+def current_hash(store, z, x, y):
+    """目标存储中瓦片内容的哈希（读取实际内容，不信任清单），不存在时返回 None"""
+    data = store.read(z, x, y)
+    return hashlib.sha1(data).hexdigest() if data is not None else None
+
+
+def plan_apply(index, store):
+    """
+    核对目标存储
+
+    返回:
+        (writes, removes, skipped, conflicts)
+        writes: 要写入的 (z, x, y, sha1)；removes: 要删除的 (z, x, y)
+        skipped: 已是新状态的瓦片数；conflicts: 与旧快照不一致的 [(z, x, y, 原因)]
+    """
+    writes, removes, conflicts = [], [], []
+    skipped = 0
+    for kind in ('added', 'changed', 'deleted'):
+        for z, x, y, old, new in index[kind]:
+            current = current_hash(store, z, x, y)
+            if current == new:
+                skipped += 1
+            elif current != old:
+                conflicts.append((z, x, y, 'exists' if old is None else
+                                  'missing' if current is None else 'modified'))
+            elif new is None:
+                removes.append((z, x, y))
+            else:
+                writes.append((z, x, y, new))
+    return writes, removes, skipped, conflicts
+
+
+def apply_delta(path, store, force=False, dry_run=False, on_progress=None):
+    """
+    把增量包应用到存储
+
+    参数:
+        path: 增量包路径
+        store: 目标存储（通常是部署用的 docs/tiles）
+        force: 有冲突时仍然应用（冲突的瓦片也按增量包改写或删除）
+        dry_run: 只核对，不修改
+        on_progress: 每修改一个瓦片调用 on_progress(done, tile)
+
+    返回:
+        dict: {'written', 'removed', 'skipped', 'conflicts', 'applied', 'stats'}
+              conflicts 为 [(z, x, y, 原因)]，有冲突且未 force 时 applied 为 False
+    """
+    with zipfile.ZipFile(path) as package:
+        index = read_index(package)
+        writes, removes, skipped, conflicts = plan_apply(index, store)
+        if force and conflicts:
+            # 冲突的瓦片同样以增量包为准
+            targets = {(z, x, y): new for kind in ('added', 'changed', 'deleted')
+                       for z, x, y, _, new in index[kind]}
+            for z, x, y, _ in conflicts:
+                new = targets[(z, x, y)]
+                if new is None:
+                    removes.append((z, x, y))
+                else:
+                    writes.append((z, x, y, new))
+
+        result = {'written': 0, 'removed': 0, 'skipped': skipped, 'conflicts': conflicts,
+                  'applied': False, 'stats': delta_stats(index['added'], index['changed'], index['deleted'])}
+        if dry_run or (conflicts and not force):
+            return result
+
+        names = set(package.namelist())
+        missing = {sha1 for _, _, _, sha1 in writes if f"{BLOB_DIR}/{sha1}.png" not in names}
+        if missing:
+            raise ValueError(f"增量包不完整，缺少 {len(missing)} 个瓦片内容")
+
+        done = 0
+        for z, x, y, sha1 in writes:
+            data = package.read(f"{BLOB_DIR}/{sha1}.png")
+            if hashlib.sha1(data).hexdigest() != sha1:
+                raise ValueError(f"增量包损坏: {BLOB_DIR}/{sha1}.png")
+            store.write(z, x, y, data)
+            result['written'] += 1
+            done += 1
+            if on_progress:
+                on_progress(done, (z, x, y))
+        for z, x, y in removes:
+            store.delete(z, x, y)
+            result['removed'] += 1
+            done += 1
+            if on_progress:
+                on_progress(done, (z, x, y))
+
+    store.flush()
+    result['applied'] = True
+    return result
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+下载流程 - 把 Fetcher 取回的瓦片写入 TileStore
+
+单个瓦片的结果用字符串表示，与原脚本保持一致:
+    'success'       新下载成功
+    'exists'        已存在，跳过
+    'not_modified'  刷新模式下服务器返回 304 或内容未变，未写盘
+    'failed_<code>' 服务器返回非 200 状态码
+    'error_<msg>'   网络异常
+
+tasks 可以是列表，也可以是惰性生成的 (z, x, y) 迭代器（例如 plan.tiles()）。
+调度器只在在途窗口有空位时才取下一个瓦片，大范围、多层级的计划
+也只占用固定的内存，不会一次创建几百万个 future。
+"""
+
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .retry import RetryQueue
+
+# 视为完成的结果
+OK_RESULTS = ('success', 'exists', 'not_modified')
+
+# 每个线程（或每个并发名额）对应的在途瓦片数，决定调度窗口大小
+WINDOW_PER_WORKER = 4
+
+
+def download_tile(fetcher, store, z, x, y, limiter=None, refresh=False):
+    """
+    下载单个瓦片
+
+    参数:
+        fetcher: 瓦片抓取器
+        store: 瓦片存储
+        z, x, y: 瓦片坐标
+        limiter: 共享的 TokenBucket，None 表示不限流
+        refresh: 刷新模式，对已有瓦片带 ETag / Last-Modified 发条件请求
+
+    返回:
+        str: 下载结果
+    """
+    validators = None
+    if refresh:
+        validators = store.validators(z, x, y)
+    elif store.exists(z, x, y):
+        return 'exists'
+
+    # 只有真正发请求时才消耗令牌
+    if limiter:
+        limiter.acquire()
+
+    try:
+        if validators:
+            result = fetcher.fetch(z, x, y, validators)
+        else:
+            result = fetcher.fetch(z, x, y)
+    except Exception as e:
+        return f'error_{str(e)}'
+
+    if limiter:
+        limiter.observe(result)
+
+    return save_result(store, z, x, y, result, refresh)
+
+
+def save_result(store, z, x, y, result, refresh=False):
+    """
+    根据抓取结果写入存储
+
+    刷新模式下 304 或内容哈希未变时只更新检查时间，不写盘
+    """
+    if refresh and result.status == 304:
+        store.touch(z, x, y, result.headers)
+        return 'not_modified'
+
+    if not result.ok:
+        return f'failed_{result.status}'
+
+    if refresh and store.unchanged(z, x, y, result.content):
+        store.touch(z, x, y, result.headers)
+        return 'not_modified'
+
+    store.write(z, x, y, result.content, result.headers)
+    return 'success'
+
+
+def download_sequential(tasks, fetcher, store, on_result=None, limiter=None, retry=None, refresh=False,
+                        total=None):
+    """
+    逐个下载，失败的瓦片进入重试队列，在主循环间隙按退避时间重试
+
+    参数与返回值同 download_threaded
+    """
+    retry = retry if retry is not None else RetryQueue()
+    stats = new_stats()
+    total = task_total(tasks, total)
+    done = 0
+    tiles = iter(tasks)
+    ready = deque()
+
+    while True:
+        # 到期的重试优先，其次取下一个新瓦片
+        ready.extend(retry.pop_ready())
+        if ready:
+            task, attempt = ready.popleft()
+        else:
+            task = next(tiles, None)
+            if task is None:
+                if not len(retry):
+                    break
+                time.sleep(retry.next_wait())
+                continue
+            attempt = 1
+
+        result = download_tile(fetcher, store, *task, limiter, refresh)
+        if result not in OK_RESULTS and retry.offer(task, attempt, result):
+            continue
+
+        done += 1
+        count_result(stats, result)
+        if on_result:
+            on_result(done, total, task, result)
+
+    stats['retried'] = retry.retried
+    return stats
+
+
+def download_threaded(tasks, fetcher, store, threads, on_result=None, limiter=None, retry=None,
+                      refresh=False, total=None, window=None):
+    """
+    使用线程池并发下载
+
+    瓦片从 tasks 中按需取出，在途数量不超过 window；
+    失败的瓦片不会立即计为失败，而是按指数退避重新提交，
+    用完尝试次数后记入 retry.failures。
+
+    参数:
+        tasks: (z, x, y) 列表或迭代器，可以跨多个缩放级别
+        threads: 并发线程数
+        on_result: 每个瓦片得到最终结果时调用 on_result(done, total, tile, result)
+        limiter: 所有线程共享的 TokenBucket
+        retry: RetryQueue，None 时使用默认策略
+        refresh: 刷新模式，见 download_tile
+        total: 瓦片总数，tasks 为迭代器时用于 on_result
+        window: 在途瓦片数上限，默认 threads * WINDOW_PER_WORKER
+
+    返回:
+        dict: 各结果的计数 {'success', 'exists', 'not_modified', 'failed', 'retried'}
+    """
+    retry = retry if retry is not None else RetryQueue()
+    stats = new_stats()
+    total = task_total(tasks, total)
+    window = window or threads * WINDOW_PER_WORKER
+    tiles = iter(tasks)
+    exhausted = False
+    done = 0
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        def submit(task, attempt):
+            future = executor.submit(download_tile, fetcher, store, *task, limiter, refresh)
+            futures[future] = (task, attempt)
+
+        futures = {}
+        while True:
+            for task, attempt in retry.pop_ready():
+                submit(task, attempt)
+            # 窗口有空位时才从迭代器取新瓦片（背压）
+            while not exhausted and len(futures) < window:
+                task = next(tiles, None)
+                if task is None:
+                    exhausted = True
+                else:
+                    submit(task, 1)
+
+            if not futures:
+                if not len(retry):
+                    break
+                time.sleep(retry.next_wait())
+                continue
+
+            finished, _ = wait(futures, timeout=retry.next_wait(), return_when=FIRST_COMPLETED)
+            for future in finished:
+                task, attempt = futures.pop(future)
+                result = future.result()
+                if result not in OK_RESULTS and retry.offer(task, attempt, result):
+                    continue
+
+                done += 1
+                count_result(stats, result)
+                if on_result:
+                    on_result(done, total, task, result)
+
+    stats['retried'] = retry.retried
+    return stats
+
+
+def task_total(tasks, total=None):
+    """瓦片总数：优先用调用方给出的 total，迭代器没有长度时为 None"""
+    if total is not None:
+        return total
+    try:
+        return len(tasks)
+    except TypeError:
+        return None
+
+
+def new_stats():
+    """空的结果计数"""
+    return {'success': 0, 'exists': 0, 'not_modified': 0, 'failed': 0}
+
+
+def merge_stats(totals, stats):
+    """把另一轮的结果计数累加到 totals"""
+    for key, value in stats.items():
+        totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def count_result(stats, result):
+    """累计一个最终结果"""
+    if result in OK_RESULTS:
+        stats[result] += 1
+    else:
+        stats['failed'] += 1
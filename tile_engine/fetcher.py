@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片抓取器
+
+Fetcher 只负责"给定 z/x/y 取回瓦片内容"，不关心保存位置。
+需要换成其他数据源（镜像、本地渲染服务、测试桩）时，
+实现同样的 fetch(z, x, y) 方法即可替换。
+
+响应体按块读入每个线程复用的缓冲区（超过 MAX_TILE_SIZE 即中止），
+读完后检查长度和 PNG 签名，过大、截断或损坏的瓦片抛出 IncompleteTile，按网络异常处理（会被重试），
+不会写入存储。
+
+每个 Fetcher 持有一个 requests.Session，所有线程共用其中的连接池
+（pool_size 应不小于并发线程数），用完后调用 close() 释放连接。
+传入 Metrics 时记录每个请求的建连、首字节、读取响应体耗时。
+"""
+
+import time
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from .config import TILE_URL, HEADERS, TIMEOUT
+
+# 每次读取的块大小
+CHUNK_SIZE = 16 * 1024
+# 单个瓦片响应体的上限，服务器出错返回大页面或无尽的流时中止读取
+MAX_TILE_SIZE = 4 * 1024 * 1024
+# 每个主机保留的连接数（默认与 requests 相同）
+POOL_SIZE = 10
+
+# PNG 文件头和结尾的 IEND 块（含 CRC）
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_TRAILER = b'IEND\xaeB`\x82'
+
+# 每个线程一个读缓冲区，只增不减，并发再高内存也不会随请求数增长
+_buffers = threading.local()
+# 每个线程最近一次建连的耗时
+_timing = threading.local()
+
+
+class IncompleteTile(Exception):
+    """响应体不完整、过大或不是有效的 PNG"""
+
+
+def check_tile(data, headers):
+    """
+    检查 200 响应的瓦片内容
+
+    参数:
+        data: 响应体
+        headers: 响应头
+
+    异常:
+        IncompleteTile: 长度与 Content-Length 不符，或 PNG 签名 / 结尾缺失
+    """
+    expected = headers.get('Content-Length')
+    # 有 Content-Encoding 时 Content-Length 是压缩后的长度，不能直接比较
+    if expected is not None and not headers.get('Content-Encoding'):
+        if len(data) != int(expected):
+            raise IncompleteTile(f"长度不符 {len(data)}/{expected}")
+
+    content_type = headers.get('Content-Type', 'image/png')
+    if content_type.startswith('image/png'):
+        if not data.startswith(PNG_SIGNATURE):
+            raise IncompleteTile("不是 PNG 数据")
+        if not data.endswith(PNG_TRAILER):
+            raise IncompleteTile("PNG 不完整")
+
+
+def read_body(response):
+    """
+    把 requests 的流式响应按块读入本线程复用的缓冲区
+
+    返回:
+        bytes: 响应体（只做一次按实际大小的拷贝）
+
+    异常:
+        IncompleteTile: 响应体超过 MAX_TILE_SIZE
+    """
+    buf = getattr(_buffers, 'buf', None)
+    if buf is None:
+        buf = _buffers.buf = bytearray(CHUNK_SIZE * 4)
+
+    size = 0
+    for chunk in response.iter_content(CHUNK_SIZE):
+        end = size + len(chunk)
+        if end > MAX_TILE_SIZE:
+            raise IncompleteTile(f"响应超过 {MAX_TILE_SIZE} 字节")
+        if end > len(buf):
+            buf.extend(bytes(max(end - len(buf), len(buf))))
+        buf[size:end] = chunk
+        size = end
+    return bytes(memoryview(buf)[:size])
+
+
+class FetchResult:
+    """
+    一次抓取的结果
+
+    属性:
+        status: HTTP 状态码
+        content: 响应内容（bytes）
+        headers: 响应头（dict-like）
+    """
+
+    def __init__(self, status, content=b'', headers=None):
+        self.status = status
+        self.content = content
+        self.headers = headers if headers is not None else {}
+
+    @property
+    def ok(self):
+        return self.status == 200
+
+
+# ==================== 建连计时 ====================
+
+class _TimedConnect:
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timing.connect = time.perf_counter() - start
+
+
+class TimedHTTPConnection(_TimedConnect, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnect, HTTPSConnection):
+    pass
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedAdapter(HTTPAdapter):
+    """记录建连耗时的 requests 适配器（结果用 take_connect_time 取）"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+def take_connect_time():
+    """取出当前线程上一次建连的耗时（秒），没有新建连接时返回 None"""
+    value = getattr(_timing, 'connect', None)
+    _timing.connect = None
+    return value
+
+# ==================== 抓取器 ====================
+
+class Fetcher:
+    """
+    基于 requests 的 HTTP 瓦片抓取器
+
+    参数:
+        metrics: 可选的 Metrics，记录各阶段耗时、状态码和字节数
+        pool: 可选的 EndpointPool（见 mirrors.py），指定时忽略 url_template，
+              在多个地址之间分配请求并自动故障转移
+        pool_size: 每个主机保留的连接数，多线程下载时设为线程数
+    """
+
+    def __init__(self, url_template=TILE_URL, headers=HEADERS, timeout=TIMEOUT, metrics=None, pool=None,
+                 pool_size=POOL_SIZE):
+        self.url_template = url_template
+        self.headers = dict(headers)
+        self.timeout = timeout
+        self.metrics = metrics
+        self.pool = pool
+        self.session = requests.Session()
+        adapter = TimedAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def url_for(self, z, x, y):
+        """生成瓦片 URL"""
+        return self.url_template.format(z=z, x=x, y=y)
+
+    def fetch(self, z, x, y, validators=None):
+        """
+        下载单个瓦片
+
+        参数:
+            validators: 条件请求头（If-None-Match / If-Modified-Since），
+                        服务器返回 304 时 content 为空
+
+        返回:
+            FetchResult，网络异常和 IncompleteTile 直接向上抛出
+        """
+        if self.pool is not None:
+            return self.pool.fetch(self.fetch_url, z, x, y, validators)
+        return self.fetch_url(self.url_for(z, x, y), validators)
+
+    def fetch_url(self, url, validators=None):
+        """按完整 URL 下载单个瓦片，返回值同 fetch"""
+        headers = self.headers
+        if validators:
+            headers = dict(headers, **validators)
+        if self.metrics is None:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                content = read_body(response)
+        else:
+            response, content = self._timed_get(url, headers)
+        if response.status_code == 200:
+            check_tile(content, response.headers)
+        return FetchResult(response.status_code, content, response.headers)
+
+    def _timed_get(self, url, headers):
+        """同一个会话发请求，另外记录各阶段耗时"""
+        metrics = self.metrics
+        metrics.begin()
+        take_connect_time()
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            with response:
+                first_byte = time.perf_counter()
+                content = read_body(response)
+        except Exception as e:
+            metrics.observe_error(e)
+            raise
+        metrics.observe_response(response.status_code, len(content), take_connect_time(),
+                                 first_byte - start, time.perf_counter() - first_byte)
+        return response, content
+
+    def close(self):
+        """关闭会话，释放连接池"""
+        self.session.close()
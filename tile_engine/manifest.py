@@ -0,0 +1,445 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片清单 - 记录每个瓦片的下载状态
+
+清单是一个 SQLite 文件，每个瓦片一行：状态、大小、SHA-1、ETag、
+Last-Modified，以及最后一次确认内容最新的时间（updated）。
+断点续传、缺失检测和进度查询都查清单，
+不再对每个 {z}/{x}/{y}.png 调用 os.path.exists。
+
+    tiles      每个瓦片一行，主键 (z, x, y)
+    progress   每个缩放级别已完成的数量，由触发器维护，进度查询 O(1)
+    optimized  压缩过的瓦片及压缩后的 SHA-1，用于增量压缩
+    verified   校验通过时瓦片文件的大小和修改时间，用于增量校验
+    meta       清单所属的瓦片存储路径等
+
+清单只对应一个瓦片存储：打开时核对 meta 中记录的存储路径，
+对着别的目录使用会直接报错，而不是把那个目录里没有的瓦片当作已下载跳过。
+
+使用 WAL 模式，下载进程写入的同时监控进程可以并发读取。
+"""
+
+import os
+import time
+import sqlite3
+import threading
+
+from .config import TILES_DIR, MANIFEST_PATH, MANIFEST_SUFFIX
+from .tilekeys import cell_keys
+
+# 瓦片状态
+STATE_DONE = 'done'
+STATE_FAILED = 'failed'
+
+# 攒够多少条写入或多少秒后提交一次事务
+COMMIT_EVERY = 200
+COMMIT_INTERVAL = 1.0
+# 多个进程共用清单时，等待对方提交的最长时间（秒）
+BUSY_TIMEOUT = 30
+# 只读打开时，每隔多少秒检查一次其他进程是否提交了新记录
+REFRESH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tiles (
+    z INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    size INTEGER,
+    sha1 TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    result TEXT,
+    updated REAL,
+    PRIMARY KEY (z, x, y)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS tiles_sha1 ON tiles (sha1);
+
+CREATE TABLE IF NOT EXISTS progress (
+    z INTEGER PRIMARY KEY,
+    done INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS optimized (
+    z INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    method TEXT NOT NULL,
+    sha1 TEXT,
+    PRIMARY KEY (z, x, y, method)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS verified (
+    z INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    size INTEGER,
+    mtime INTEGER,
+    PRIMARY KEY (z, x, y)
+) WITHOUT ROWID;
+
+-- 计数用 UPSERT：tiles 的 UPSERT 触发时，外层语句的冲突处理会覆盖触发器内的 INSERT OR IGNORE，
+-- 失败的瓦片重新下载成功（failed → done）时会报 progress.z 冲突；旧版清单打开时替换触发器
+DROP TRIGGER IF EXISTS tiles_insert;
+CREATE TRIGGER tiles_insert AFTER INSERT ON tiles
+WHEN NEW.state = 'done'
+BEGIN
+    INSERT INTO progress (z, done) VALUES (NEW.z, 1) ON CONFLICT (z) DO UPDATE SET done = done + 1;
+END;
+
+DROP TRIGGER IF EXISTS tiles_done;
+CREATE TRIGGER tiles_done AFTER UPDATE OF state ON tiles
+WHEN OLD.state != 'done' AND NEW.state = 'done'
+BEGIN
+    INSERT INTO progress (z, done) VALUES (NEW.z, 1) ON CONFLICT (z) DO UPDATE SET done = done + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tiles_undone AFTER UPDATE OF state ON tiles
+WHEN OLD.state = 'done' AND NEW.state != 'done'
+BEGIN
+    UPDATE progress SET done = done - 1 WHERE z = OLD.z;
+END;
+
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TRIGGER IF NOT EXISTS tiles_delete AFTER DELETE ON tiles
+WHEN OLD.state = 'done'
+BEGIN
+    UPDATE progress SET done = done - 1 WHERE z = OLD.z;
+END;
+"""
+
+UPSERT = """
+INSERT INTO tiles (z, x, y, state, size, sha1, etag, last_modified, result, updated)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (z, x, y) DO UPDATE SET
+    state = excluded.state, size = excluded.size, sha1 = excluded.sha1,
+    etag = excluded.etag, last_modified = excluded.last_modified,
+    result = excluded.result, updated = excluded.updated
+"""
+
+COLUMNS = ('z', 'x', 'y', 'state', 'size', 'sha1', 'etag', 'last_modified', 'result', 'updated')
+
+
+def default_manifest(tiles_dir):
+    """存储默认的清单路径：默认瓦片目录用 MANIFEST_PATH，其他存储用并列的 <路径>.manifest.sqlite"""
+    tiles_dir = os.path.normpath(tiles_dir)
+    if tiles_dir == os.path.normpath(TILES_DIR):
+        return MANIFEST_PATH
+    return tiles_dir + MANIFEST_SUFFIX
+
+
+class Manifest:
+    """
+    SQLite 瓦片清单
+
+    参数:
+        path: 清单文件路径
+        readonly: 只读打开（监控进程使用），文件不存在时抛出 sqlite3.OperationalError
+        root: 清单所属的瓦片存储路径；与清单中记录的不是同一个存储时抛出 ValueError
+    """
+
+    def __init__(self, path=MANIFEST_PATH, readonly=False, root=None):
+        self.path = path
+        self.readonly = readonly
+        self.is_new = not readonly and not os.path.exists(path)
+
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+        self._lock = threading.Lock()
+        self._done = None
+        self._data_version = None
+        self._last_refresh = 0.0
+        self._pending = 0
+        self._last_commit = time.monotonic()
+        if root is not None:
+            self._check_root(root)
+
+    def _check_root(self, root):
+        """核对清单所属的存储，旧版清单（没有记录）第一次打开时记下当前存储"""
+        root = os.path.abspath(root)
+        try:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'root'").fetchone()
+        except sqlite3.OperationalError:
+            # 只读打开的旧版清单没有 meta 表
+            row = None
+        stored = row[0] if row else None
+        if stored is not None and stored != root and os.path.exists(stored) and not (
+                os.path.exists(root) and os.path.samefile(stored, root)):
+            self._conn.close()
+            raise ValueError(f"清单 {self.path} 属于 {stored}，不是 {root}；请用 --manifest 指定这个存储的清单")
+        if stored != root and not self.readonly:
+            # 新清单，或原存储已被移动
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('root', ?)", (root,))
+            self._conn.commit()
+
+    # ---------- 查询 ----------
+
+    def _done_set(self):
+        """
+        已完成瓦片的内存索引，首次使用时加载
+
+        只读打开时清单由其他进程写入，每隔 REFRESH_INTERVAL 秒查看 data_version，
+        对方提交过新记录就重新加载
+        """
+        if self.readonly and self._done is not None:
+            now = time.monotonic()
+            if now - self._last_refresh >= REFRESH_INTERVAL:
+                self._last_refresh = now
+                with self._lock:
+                    version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                if version != self._data_version:
+                    self._done = None
+        if self._done is None:
+            with self._lock:
+                if self.readonly:
+                    self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+                    self._last_refresh = time.monotonic()
+                rows = self._conn.execute("SELECT z, x, y FROM tiles WHERE state = ?", (STATE_DONE,))
+                self._done = set(rows)
+        return self._done
+
+    def is_done(self, z, x, y):
+        """瓦片是否已下载完成"""
+        return (z, x, y) in self._done_set()
+
+    def get(self, z, x, y):
+        """返回瓦片记录 dict，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM tiles WHERE z = ? AND x = ? AND y = ?",
+                (z, x, y)).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def progress(self):
+        """各缩放级别已完成数量 {z: done}"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT z, done FROM progress ORDER BY z"))
+
+    def count_in_range(self, z, x_min, x_max, y_min, y_max):
+        """统计矩形范围内已完成的瓦片（走主键索引，不访问文件系统）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM tiles WHERE z = ? AND x BETWEEN ? AND ? "
+                "AND y BETWEEN ? AND ? AND state = ?",
+                (z, x_min, x_max, y_min, y_max, STATE_DONE)).fetchone()
+        return row[0]
+
+    def refresh_range(self, z, x_min, x_max, y_min, y_max):
+        """把矩形范围内其他进程提交的已完成记录补进内存索引"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT z, x, y FROM tiles WHERE z = ? AND x BETWEEN ? AND ? "
+                "AND y BETWEEN ? AND ? AND state = ?",
+                (z, x_min, x_max, y_min, y_max, STATE_DONE)).fetchall()
+        self._done_set().update(rows)
+
+    def count_cells(self, z, cells):
+        """
+        统计瓦片集合中已完成的瓦片（区域计划用）
+
+        参数:
+            cells: TileKeys；只取外包范围内的记录，与集合的编码做一次有序查找
+        """
+        x_min, x_max, y_min, y_max = cells.bounds()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT x, y FROM tiles WHERE z = ? AND x BETWEEN ? AND ? "
+                "AND y BETWEEN ? AND ? AND state = ?",
+                (z, x_min, x_max, y_min, y_max, STATE_DONE)).fetchall()
+        return cells.count_in(cell_keys(z, rows))
+
+    def due(self, z, x_min, x_max, y_min, y_max, before):
+        """
+        矩形范围内最后确认时间早于 before 的已完成瓦片
+
+        返回:
+            list: [(z, x, y)]
+        """
+        with self._lock:
+            return list(self._conn.execute(
+                "SELECT z, x, y FROM tiles WHERE z = ? AND x BETWEEN ? AND ? AND y BETWEEN ? AND ? "
+                "AND state = ? AND (updated IS NULL OR updated < ?) ORDER BY x, y",
+                (z, x_min, x_max, y_min, y_max, STATE_DONE, before)))
+
+    def optimized(self, method):
+        """
+        压缩后内容没再变过的瓦片（压缩记录的 SHA-1 与当前一致）
+
+        返回:
+            set: {(z, x, y)}
+        """
+        with self._lock:
+            return set(self._conn.execute(
+                "SELECT o.z, o.x, o.y FROM optimized o JOIN tiles t USING (z, x, y) "
+                "WHERE o.method = ? AND t.state = ? AND o.sha1 = t.sha1",
+                (method, STATE_DONE)))
+
+    def verified(self):
+        """
+        校验通过的瓦片及当时的文件版本
+
+        返回:
+            dict: {(z, x, y): (size, mtime)}
+        """
+        with self._lock:
+            return {(z, x, y): (size, mtime) for z, x, y, size, mtime in
+                    self._conn.execute("SELECT z, x, y, size, mtime FROM verified")}
+
+    def hashes(self):
+        """
+        已完成瓦片的内容哈希（用于比较快照）
+
+        返回:
+            dict: {(z, x, y): sha1}
+        """
+        with self._lock:
+            return {(z, x, y): sha1 for z, x, y, sha1 in self._conn.execute(
+                "SELECT z, x, y, sha1 FROM tiles WHERE state = ?", (STATE_DONE,))}
+
+    def find_sha1(self, sha1, exclude=None):
+        """
+        找一个内容哈希为 sha1 的已完成瓦片（用于去重）
+
+        参数:
+            exclude: 排除的 (z, x, y)，通常是正在写入的瓦片本身
+
+        返回:
+            (z, x, y) 或 None
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT z, x, y FROM tiles WHERE sha1 = ? AND state = ? LIMIT 2", (sha1, STATE_DONE))
+            for row in rows:
+                if row != exclude:
+                    return row
+        return None
+
+    def synthetic(self, kind):
+        """
+        由其他层级合成（而不是下载）的瓦片
+
+        返回:
+            set: {(z, x, y)}，kind 为 mark_synthetic 时的标记
+        """
+        with self._lock:
+            return set(self._conn.execute(
+                "SELECT z, x, y FROM tiles WHERE state = ? AND result = ?", (STATE_DONE, kind)))
+
+    def failed(self):
+        """返回所有失败瓦片 [(z, x, y, result)]"""
+        with self._lock:
+            return list(self._conn.execute(
+                "SELECT z, x, y, result FROM tiles WHERE state = ? ORDER BY z, x, y", (STATE_FAILED,)))
+
+    # ---------- 写入 ----------
+
+    def record_done(self, z, x, y, size, sha1, etag=None, last_modified=None):
+        """记录一个下载完成的瓦片"""
+        self._write((z, x, y, STATE_DONE, size, sha1, etag, last_modified, None, time.time()))
+        self._done_set().add((z, x, y))
+
+    def record_failed(self, z, x, y, result):
+        """记录一个最终失败的瓦片"""
+        self._write((z, x, y, STATE_FAILED, None, None, None, None, result, time.time()))
+        self._done_set().discard((z, x, y))
+
+    def record_content(self, z, x, y, size, sha1):
+        """瓦片内容在本地被改写（例如压缩），只更新大小和哈希，保留 ETag 等校验值"""
+        with self._lock:
+            self._conn.execute("UPDATE tiles SET size = ?, sha1 = ? WHERE z = ? AND x = ? AND y = ?",
+                               (size, sha1, z, x, y))
+            self._pending += 1
+            self._maybe_commit()
+
+    def record_optimized(self, z, x, y, method, sha1):
+        """记录瓦片已用 method 压缩，sha1 为压缩后的内容哈希"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO optimized (z, x, y, method, sha1) VALUES (?, ?, ?, ?, ?)",
+                               (z, x, y, method, sha1))
+            self._pending += 1
+            self._maybe_commit()
+
+    def record_verified(self, z, x, y, size, mtime):
+        """记录瓦片校验通过，size / mtime 为校验时文件的大小和修改时间"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO verified (z, x, y, size, mtime) VALUES (?, ?, ?, ?, ?)",
+                               (z, x, y, size, mtime))
+            self._pending += 1
+            self._maybe_commit()
+
+    def touch(self, z, x, y, etag=None, last_modified=None):
+        """刷新确认瓦片未变：更新确认时间，服务器给了新的校验值时一并保存"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tiles SET updated = ?, etag = COALESCE(?, etag), "
+                "last_modified = COALESCE(?, last_modified) WHERE z = ? AND x = ? AND y = ?",
+                (time.time(), etag, last_modified, z, x, y))
+            self._pending += 1
+            self._maybe_commit()
+
+    def mark_synthetic(self, z, x, y, kind):
+        """标记合成的瓦片：确认时间记为 0，刷新时优先用真实瓦片替换"""
+        with self._lock:
+            self._conn.execute("UPDATE tiles SET result = ?, updated = 0 WHERE z = ? AND x = ? AND y = ?",
+                               (kind, z, x, y))
+            self._pending += 1
+            self._maybe_commit()
+
+    def remove(self, z, x, y):
+        """删除瓦片记录"""
+        with self._lock:
+            self._conn.execute("DELETE FROM tiles WHERE z = ? AND x = ? AND y = ?", (z, x, y))
+            self._pending += 1
+            self._maybe_commit()
+        self._done_set().discard((z, x, y))
+
+    def clear(self):
+        """清空清单"""
+        with self._lock:
+            self._conn.execute("DELETE FROM tiles")
+            self._conn.execute("DELETE FROM progress")
+            # 压缩和校验记录只对清空前的文件有效
+            self._conn.execute("DELETE FROM optimized")
+            self._conn.execute("DELETE FROM verified")
+            self._conn.commit()
+            self._pending = 0
+        self._done = set()
+
+    def _write(self, row):
+        with self._lock:
+            self._conn.execute(UPSERT, row)
+            self._pending += 1
+            self._maybe_commit()
+
+    def _maybe_commit(self):
+        """批量提交，调用方需持有锁"""
+        now = time.monotonic()
+        if self._pending >= COMMIT_EVERY or now - self._last_commit >= COMMIT_INTERVAL:
+            self._conn.commit()
+            self._pending = 0
+            self._last_commit = now
+
+    def flush(self):
+        """提交未写入的记录"""
+        if self.readonly:
+            return
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        """提交并关闭"""
+        self.flush()
+        self._conn.close()
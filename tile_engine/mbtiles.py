@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+MBTiles 单文件瓦片归档
+
+把所有瓦片写进一个 SQLite 文件（MBTiles 1.3 规范），代替上千个小文件：
+复制、校验和部署都只处理一个文件，也不需要为每个瓦片建目录。
+
+注意 MBTiles 的 tile_row 使用 TMS 坐标（y 轴自下而上），
+读写时与 OSM 的 XYZ 坐标互相换算。
+
+新建的归档使用去重布局（规范允许的 map + images 表，tiles 为视图）：
+内容相同的瓦片只存一份 BLOB，按 SHA-1 引用。旧的单表归档照常读写，
+可以用 deduplicate() 转换。
+"""
+
+import os
+import hashlib
+import sqlite3
+import threading
+
+from .config import MIN_LAT, MAX_LAT, MIN_LON, MAX_LON
+from .store import BaseTileStore
+
+# 攒够多少个瓦片提交一次事务
+BATCH_SIZE = 500
+
+# 单表布局（旧归档）
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (
+    zoom_level INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row INTEGER NOT NULL,
+    tile_data BLOB NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+"""
+
+# 去重布局：images 按内容哈希存一份，map 记录每个瓦片引用哪份内容
+DEDUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS images (
+    tile_id TEXT PRIMARY KEY,
+    tile_data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS map (
+    zoom_level INTEGER NOT NULL,
+    tile_column INTEGER NOT NULL,
+    tile_row INTEGER NOT NULL,
+    tile_id TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS map_index ON map (zoom_level, tile_column, tile_row);
+CREATE INDEX IF NOT EXISTS map_tile_id ON map (tile_id);
+CREATE VIEW IF NOT EXISTS tiles AS
+    SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+           map.tile_row AS tile_row, images.tile_data AS tile_data
+    FROM map JOIN images ON images.tile_id = map.tile_id;
+"""
+
+
+def xyz_to_tms(z, y):
+    """XYZ 的 y 与 TMS 的 tile_row 互相换算（两个方向公式相同）"""
+    return (1 << z) - 1 - y
+
+
+def is_archive(path):
+    """根据扩展名判断是否为 MBTiles 归档"""
+    return str(path).lower().endswith('.mbtiles')
+
+
+class MBTilesStore(BaseTileStore):
+    """
+    MBTiles 归档存储，接口与 TileStore 相同
+
+    写入在内存中攒批，每 BATCH_SIZE 个瓦片提交一次事务；
+    close() 时提交剩余数据并更新 minzoom / maxzoom 等元数据。
+
+    参数:
+        path: .mbtiles 文件路径
+        manifest: 可选的 Manifest
+        autoindex: 清单是新建的时，先从归档索引一次已有瓦片
+        name: 写入元数据的图层名
+    """
+
+    def __init__(self, path, manifest=None, autoindex=True, name='Vietnam tour offline tiles'):
+        self.path = path
+        self.root = path
+        self._lock = threading.Lock()
+        self._pending = 0
+
+        is_new = not os.path.exists(path)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self.deduplicated = is_new or self._is_deduplicated()
+        self._conn.executescript(DEDUP_SCHEMA if self.deduplicated else SCHEMA)
+        if is_new:
+            self._set_metadata({
+                'name': name,
+                'format': 'png',
+                'type': 'baselayer',
+                'version': '1.0',
+                'bounds': f"{MIN_LON},{MIN_LAT},{MAX_LON},{MAX_LAT}",
+                'attribution': '&copy; OpenStreetMap contributors',
+            })
+            self._conn.commit()
+
+        super().__init__(manifest, autoindex)
+
+    def read(self, z, x, y):
+        """读取瓦片内容，不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, xyz_to_tms(z, y))).fetchone()
+        return row[0] if row else None
+
+    def iter_tiles(self):
+        """遍历归档中的瓦片，生成 (z, x, y)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT zoom_level, tile_column, tile_row FROM tiles "
+                "ORDER BY zoom_level, tile_column, tile_row").fetchall()
+        for z, x, row in rows:
+            yield z, x, xyz_to_tms(z, row)
+
+    def metadata(self):
+        """返回元数据 dict"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT name, value FROM metadata"))
+
+    def flush(self):
+        """提交未写入的瓦片"""
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+        super().flush()
+
+    def close(self):
+        """提交数据、更新元数据并关闭归档"""
+        with self._lock:
+            zooms = self._conn.execute("SELECT MIN(zoom_level), MAX(zoom_level) FROM tiles").fetchone()
+            if zooms[0] is not None:
+                self._set_metadata({'minzoom': str(zooms[0]), 'maxzoom': str(zooms[1])})
+            if self.deduplicated:
+                # 瓦片被替换后不再被引用的内容
+                self._conn.execute("DELETE FROM images WHERE tile_id NOT IN (SELECT tile_id FROM map)")
+            self._conn.commit()
+            self._conn.close()
+        super().close()
+
+    def deduplicate(self):
+        """
+        把单表布局的归档转换为去重布局，并回收空间
+
+        返回:
+            bool: 是否做了转换（已是去重布局时返回 False）
+        """
+        if self.deduplicated:
+            return False
+        with self._lock:
+            self._conn.create_function('sha1', 1, lambda data: hashlib.sha1(data).hexdigest(),
+                                       deterministic=True)
+            self._conn.commit()
+            self._conn.execute("ALTER TABLE tiles RENAME TO tiles_old")
+            self._conn.execute("DROP INDEX IF EXISTS tile_index")
+            self._conn.executescript(DEDUP_SCHEMA)
+            self._conn.execute("INSERT OR IGNORE INTO images (tile_id, tile_data) "
+                               "SELECT sha1(tile_data), tile_data FROM tiles_old")
+            self._conn.execute("INSERT INTO map (zoom_level, tile_column, tile_row, tile_id) "
+                               "SELECT zoom_level, tile_column, tile_row, sha1(tile_data) FROM tiles_old")
+            self._conn.execute("DROP TABLE tiles_old")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            self.deduplicated = True
+        return True
+
+    def _is_deduplicated(self):
+        """已有归档中的 tiles 是否为视图（去重布局）"""
+        row = self._conn.execute("SELECT type FROM sqlite_master WHERE name = 'tiles'").fetchone()
+        return row is not None and row[0] == 'view'
+
+    def _has(self, z, x, y):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, xyz_to_tms(z, y))).fetchone()
+        return row is not None
+
+    def _put(self, z, x, y, data, sha1=None, link=False):
+        # 归档按内容哈希去重时同内容的瓦片本来就共用一行，link 不需要处理
+        with self._lock:
+            if self.deduplicated:
+                tile_id = sha1 or hashlib.sha1(data).hexdigest()
+                self._conn.execute("INSERT OR IGNORE INTO images (tile_id, tile_data) VALUES (?, ?)",
+                                   (tile_id, sqlite3.Binary(data)))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO map (zoom_level, tile_column, tile_row, tile_id) VALUES (?, ?, ?, ?)",
+                    (z, x, xyz_to_tms(z, y), tile_id))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) "
+                    "VALUES (?, ?, ?, ?)", (z, x, xyz_to_tms(z, y), sqlite3.Binary(data)))
+            self._pending += 1
+            if self._pending >= BATCH_SIZE:
+                self._conn.commit()
+                self._pending = 0
+
+    def _delete(self, z, x, y):
+        with self._lock:
+            table = 'map' if self.deduplicated else 'tiles'
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, xyz_to_tms(z, y)))
+            self._pending += 1
+
+    def _count_range(self, z, x_min, x_max, y_min, y_max):
+        # y 翻转后范围的上下界也互换
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM tiles WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? "
+                "AND tile_row BETWEEN ? AND ?",
+                (z, x_min, x_max, xyz_to_tms(z, y_max), xyz_to_tms(z, y_min))).fetchone()
+        return row[0]
+
+    def _set_metadata(self, values):
+        """写入元数据，调用方负责提交"""
+        self._conn.executemany("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)",
+                               list(values.items()))
+
+
+def open_tile_store(path, manifest=None, autoindex=True, dedup=False):
+    """
+    按路径打开存储：.mbtiles 为归档，否则为目录
+
+    参数:
+        dedup: 目录布局下相同内容的新瓦片用硬链接保存（归档本身总是去重）
+    """
+    from .store import TileStore
+
+    if is_archive(path):
+        return MBTilesStore(path, manifest, autoindex)
+    return TileStore(path, manifest, autoindex, dedup)
+
+
+def export_tiles(src, dst, on_progress=None):
+    """
+    把一个存储中的全部瓦片复制到另一个存储
+
+    目录 → 归档、归档 → 目录、归档 → 归档均可。
+
+    参数:
+        src, dst: 已打开的存储
+        on_progress: 每复制一个瓦片调用 on_progress(done, (z, x, y))
+
+    返回:
+        (瓦片数, 字节数)
+    """
+    count = 0
+    total_bytes = 0
+    for z, x, y in src.iter_tiles():
+        data = src.read(z, x, y)
+        if data is None:
+            continue
+        dst.write(z, x, y, data)
+        count += 1
+        total_bytes += len(data)
+        if on_progress:
+            on_progress(count, (z, x, y))
+    dst.flush()
+    return count, total_bytes
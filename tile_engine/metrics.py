@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+下载指标 - Prometheus 文本格式的计数器与延迟直方图
+
+    tile_request_seconds{phase="connect|ttfb|body|total"}  请求各阶段耗时直方图
+    tile_responses_total{status="200"}                      按状态码计数
+    tile_errors_total{kind="ConnectTimeout"}                网络异常计数
+    tile_bytes_total                                        下载字节数
+    tile_results_total{result="success"}                    瓦片最终结果
+    tile_retries_total                                      已安排的重试次数
+    tile_queue_depth                                        尚未完成的瓦片数
+    tile_requests_in_flight                                 正在进行的请求数
+
+运行时可以用 MetricsServer 在本地开一个 /metrics（Prometheus）和
+/metrics.json 端点，结束时用 summary() 得到 JSON 汇总（含 p50/p90/p99）。
+
+connect 只有新建连接时才有值；ttfb 从发出请求到收到响应头，
+包含建连和等待连接池的时间（异步引擎并发数大于连接数时会明显偏高）。
+"""
+
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 直方图桶上限（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ('connect', 'ttfb', 'body', 'total')
+
+
+class Histogram:
+    """固定桶的直方图（非累积存储，输出时再累积）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # 最后一个是 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """按桶线性插值估计分位数，没有数据时返回 None"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, n in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if n and seen + n >= rank:
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+            lower = upper
+        return self.buckets[-1]
+
+    def cumulative(self):
+        """[(上限, 累积计数)]，最后一项上限为 '+Inf'"""
+        total = 0
+        result = []
+        for bound, n in zip(self.buckets + ('+Inf',), self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    """
+    线程安全的下载指标
+
+    参数:
+        retry: 可选的 RetryQueue，重试次数直接读它的 retried
+    """
+
+    def __init__(self, retry=None):
+        self.retry = retry
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.latency = {phase: Histogram() for phase in PHASES}
+        self.statuses = {}
+        self.errors = {}
+        self.results = {}
+        self.bytes = 0
+        self.planned = 0
+        self.finished = 0
+        self.in_flight = 0
+
+    # ---------- 记录 ----------
+
+    def begin(self):
+        """一个请求开始"""
+        with self._lock:
+            self.in_flight += 1
+
+    def observe_response(self, status, size, connect=None, ttfb=None, body=None):
+        """一个请求完成（收到响应），各阶段耗时单位为秒"""
+        with self._lock:
+            self.in_flight -= 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            self.bytes += size
+            if connect is not None:
+                self.latency['connect'].observe(connect)
+            if ttfb is not None:
+                self.latency['ttfb'].observe(ttfb)
+            if body is not None:
+                self.latency['body'].observe(body)
+            if ttfb is not None and body is not None:
+                self.latency['total'].observe(ttfb + body)
+
+    def observe_error(self, error):
+        """一个请求以异常结束"""
+        kind = type(error).__name__
+        with self._lock:
+            self.in_flight -= 1
+            self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def add_planned(self, count):
+        """加入待下载的瓦片数（用于队列深度）"""
+        with self._lock:
+            self.planned += count
+
+    def observe_result(self, result):
+        """一个瓦片得到最终结果"""
+        key = result if not result.startswith('error_') else 'error'
+        with self._lock:
+            self.results[key] = self.results.get(key, 0) + 1
+            self.finished += 1
+
+    # ---------- 输出 ----------
+
+    @property
+    def retries(self):
+        return self.retry.retried if self.retry is not None else 0
+
+    def render(self):
+        """Prometheus 文本格式"""
+        lines = []
+        with self._lock:
+            lines.append('# HELP tile_request_seconds Tile request latency by phase.')
+            lines.append('# TYPE tile_request_seconds histogram')
+            for phase, hist in self.latency.items():
+                for bound, count in hist.cumulative():
+                    lines.append(f'tile_request_seconds_bucket{{phase="{phase}",le="{bound}"}} {count}')
+                lines.append(f'tile_request_seconds_sum{{phase="{phase}"}} {hist.sum:.6f}')
+                lines.append(f'tile_request_seconds_count{{phase="{phase}"}} {hist.count}')
+
+            lines.append('# TYPE tile_responses_total counter')
+            for status, count in sorted(self.statuses.items()):
+                lines.append(f'tile_responses_total{{status="{status}"}} {count}')
+            lines.append('# TYPE tile_errors_total counter')
+            for kind, count in sorted(self.errors.items()):
+                lines.append(f'tile_errors_total{{kind="{kind}"}} {count}')
+            lines.append('# TYPE tile_results_total counter')
+            for result, count in sorted(self.results.items()):
+                lines.append(f'tile_results_total{{result="{result}"}} {count}')
+
+            lines.append('# TYPE tile_bytes_total counter')
+            lines.append(f'tile_bytes_total {self.bytes}')
+            lines.append('# TYPE tile_retries_total counter')
+            lines.append(f'tile_retries_total {self.retries}')
+            lines.append('# TYPE tile_queue_depth gauge')
+            lines.append(f'tile_queue_depth {self.planned - self.finished}')
+            lines.append('# TYPE tile_requests_in_flight gauge')
+            lines.append(f'tile_requests_in_flight {self.in_flight}')
+        return '\n'.join(lines) + '\n'
+
+    def summary(self):
+        """JSON 可序列化的汇总"""
+        with self._lock:
+            elapsed = time.time() - self.started
+            latency = {}
+            for phase, hist in self.latency.items():
+                if not hist.count:
+                    continue
+                latency[phase] = {
+                    'count': hist.count,
+                    'mean': hist.sum / hist.count,
+                    'p50': hist.quantile(0.5),
+                    'p90': hist.quantile(0.9),
+                    'p99': hist.quantile(0.99),
+                }
+            requests = sum(self.statuses.values()) + sum(self.errors.values())
+            return {
+                'elapsed': elapsed,
+                'requests': requests,
+                'requests_per_sec': requests / elapsed if elapsed > 0 else 0.0,
+                'bytes': self.bytes,
+                'statuses': {str(k): v for k, v in sorted(self.statuses.items())},
+                'errors': dict(self.errors),
+                'results': dict(self.results),
+                'retries': self.retries,
+                'queue_depth': self.planned - self.finished,
+                'latency': latency,
+            }
+
+    def write_json(self, path):
+        """把汇总写入 JSON 文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+# ==================== /metrics 端点 ====================
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics 返回 Prometheus 文本，/metrics.json 返回 JSON 汇总"""
+
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path == '/metrics':
+            body = metrics.render().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(metrics.summary(), ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer:
+    """
+    在后台线程中提供 /metrics 端点
+
+    用法:
+        with MetricsServer(metrics, port=9108):
+            ...下载...
+    """
+
+    def __init__(self, metrics, port=0, host='127.0.0.1'):
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        self._server.metrics = metrics
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+多镜像负载均衡 - 在多个瓦片服务器之间分配请求
+
+只用一个瓦片服务器时，它变慢或开始限流，整个下载就跟着变慢。
+EndpointPool 管理一组地址（子域名、镜像、自建渲染服务）：
+
+    并发上限    每个地址同时在途的请求数不超过 max_concurrency
+    健康评分    响应耗时和出错率的指数滑动平均，挑评分最好的地址
+    冷却        429/503 按 Retry-After 暂停该地址，连续出错按指数退避暂停
+    故障转移    一个地址出错或限流时，同一个瓦片立即换下一个地址再试
+
+地址模板中的 {s} 按 Leaflet 的约定展开为各个子域名，例如
+https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png 展开为 a / b / c 三个地址。
+"""
+
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+from .config import TILE_SUBDOMAINS, ENDPOINT_CONCURRENCY
+from .ratelimit import THROTTLE_STATUSES, parse_retry_after, DEFAULT_RETRY_AFTER
+from .retry import RETRY_STATUSES
+
+# 滑动平均的权重
+EWMA_ALPHA = 0.2
+# 连续出错的冷却时间（秒）：BASE * 2^(次数-1)，不超过 MAX
+COOLDOWN_BASE = 1.0
+COOLDOWN_MAX = 60.0
+# 协程等待空位时的轮询间隔（秒）
+POLL_INTERVAL = 0.01
+
+
+def expand_urls(urls, subdomains=TILE_SUBDOMAINS):
+    """把含 {s} 的模板展开为每个子域名一个地址，去掉重复"""
+    expanded = []
+    for url in urls:
+        candidates = [url.replace('{s}', s) for s in subdomains] if '{s}' in url else [url]
+        for candidate in candidates:
+            if candidate not in expanded:
+                expanded.append(candidate)
+    return expanded
+
+
+class Endpoint:
+    """
+    一个瓦片地址及其健康状态
+
+    属性:
+        latency: 响应耗时的滑动平均（秒），还没有数据时为 None
+        error_rate: 出错率的滑动平均（0~1）
+        in_flight: 正在进行的请求数
+    """
+
+    def __init__(self, url_template, max_concurrency=ENDPOINT_CONCURRENCY):
+        self.url_template = url_template
+        self.max_concurrency = max_concurrency
+        self.name = urlsplit(url_template.replace('{', '').replace('}', '')).netloc or url_template
+        self.latency = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.throttled = 0
+
+    def url_for(self, z, x, y):
+        """生成瓦片 URL"""
+        return self.url_template.format(z=z, x=x, y=y)
+
+    def score(self):
+        """评分越小越好：预计等待时间 × 出错惩罚。还没测过的地址优先试探"""
+        if self.latency is None:
+            return 0.0
+        return self.latency * (self.in_flight + 1) * (1 + 4 * self.error_rate)
+
+    def cooling(self, now):
+        return now < self.cooldown_until
+
+
+class EndpointPool:
+    """
+    线程安全的地址池，线程池引擎和异步引擎共用
+
+    参数:
+        urls: 地址模板列表（已展开 {s}）
+        max_concurrency: 每个地址的并发上限
+    """
+
+    def __init__(self, urls, max_concurrency=ENDPOINT_CONCURRENCY):
+        if not urls:
+            raise ValueError("至少需要一个瓦片地址")
+        self.endpoints = [Endpoint(url, max_concurrency) for url in urls]
+        self.failovers = 0
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    # ---------- 选择与归还 ----------
+
+    def try_acquire(self, exclude=()):
+        """
+        不阻塞地挑选一个地址
+
+        返回:
+            (endpoint, wait): 选中时 wait 为 0；否则 endpoint 为 None，
+            wait 为建议等待的秒数（None 表示等有请求完成），
+            故障转移时其余地址都在冷却则 wait 为 -1，表示放弃转移
+        """
+        with self._cond:
+            return self._pick(exclude)
+
+    def acquire(self, exclude=()):
+        """阻塞直到选中一个地址（线程用），放弃转移时返回 None"""
+        with self._cond:
+            while True:
+                endpoint, wait = self._pick(exclude)
+                if endpoint is not None or wait == -1:
+                    return endpoint
+                self._cond.wait(wait)
+
+    async def acquire_async(self, exclude=()):
+        """等待直到选中一个地址（协程用），放弃转移时返回 None"""
+        while True:
+            endpoint, wait = self.try_acquire(exclude)
+            if endpoint is not None or wait == -1:
+                return endpoint
+            await asyncio.sleep(min(wait, POLL_INTERVAL) if wait is not None else POLL_INTERVAL)
+
+    def _pick(self, exclude):
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in exclude]
+        ready = [e for e in candidates if not e.cooling(now)]
+        if not ready:
+            if exclude:
+                return None, -1
+            # 全部在冷却：等最早恢复的那个
+            return None, max(0.0, min(e.cooldown_until for e in candidates) - now)
+        free = [e for e in ready if e.in_flight < e.max_concurrency]
+        if not free:
+            return None, None
+        endpoint = min(free, key=Endpoint.score)
+        endpoint.in_flight += 1
+        endpoint.requests += 1
+        if exclude:
+            self.failovers += 1
+        return endpoint, 0
+
+    def release(self, endpoint, elapsed, status=None, headers=None, error=None):
+        """
+        归还地址并更新健康状态
+
+        参数:
+            elapsed: 本次请求耗时（秒）
+            status: HTTP 状态码，网络异常时为 None
+            headers: 响应头（读取 Retry-After）
+            error: 网络异常
+        """
+        now = time.monotonic()
+        with self._cond:
+            endpoint.in_flight -= 1
+            failed = error is not None or status in RETRY_STATUSES
+            endpoint.error_rate += EWMA_ALPHA * ((1.0 if failed else 0.0) - endpoint.error_rate)
+            if error is None:
+                if endpoint.latency is None:
+                    endpoint.latency = elapsed
+                else:
+                    endpoint.latency += EWMA_ALPHA * (elapsed - endpoint.latency)
+
+            if status in THROTTLE_STATUSES:
+                endpoint.throttled += 1
+                pause = parse_retry_after((headers or {}).get('Retry-After'))
+                endpoint.cooldown_until = now + (pause if pause is not None else DEFAULT_RETRY_AFTER)
+            elif failed:
+                endpoint.errors += 1
+                endpoint.failures += 1
+                pause = min(COOLDOWN_MAX, COOLDOWN_BASE * 2 ** (endpoint.failures - 1))
+                endpoint.cooldown_until = now + pause
+            else:
+                endpoint.failures = 0
+            self._cond.notify_all()
+
+    # ---------- 带故障转移的抓取 ----------
+
+    def fetch(self, fetch_url, z, x, y, validators=None):
+        """
+        用最合适的地址抓取瓦片，出错或限流时换下一个地址
+
+        参数:
+            fetch_url: fetch_url(url, validators) → FetchResult
+
+        返回:
+            FetchResult，所有地址都失败时返回最后一个结果或抛出最后一个异常
+        """
+        tried = []
+        outcome = None
+        while len(tried) < len(self.endpoints):
+            endpoint = self.acquire(tried)
+            if endpoint is None:
+                break
+            start = time.perf_counter()
+            try:
+                result = fetch_url(endpoint.url_for(z, x, y), validators)
+            except BaseException as e:
+                # 取消、中断也要归还名额，但只有普通异常才转移
+                self.release(endpoint, time.perf_counter() - start, error=e)
+                if not isinstance(e, Exception):
+                    raise
+                outcome = e
+            else:
+                self.release(endpoint, time.perf_counter() - start, result.status, result.headers)
+                if result.status not in RETRY_STATUSES:
+                    return result
+                outcome = result
+            tried.append(endpoint)
+        return _finish(outcome)
+
+    async def fetch_async(self, fetch_url, z, x, y, validators=None):
+        """fetch 的协程版本，fetch_url 为协程函数"""
+        tried = []
+        outcome = None
+        while len(tried) < len(self.endpoints):
+            endpoint = await self.acquire_async(tried)
+            if endpoint is None:
+                break
+            start = time.perf_counter()
+            try:
+                result = await fetch_url(endpoint.url_for(z, x, y), validators)
+            except BaseException as e:
+                # 取消、中断也要归还名额，但只有普通异常才转移
+                self.release(endpoint, time.perf_counter() - start, error=e)
+                if not isinstance(e, Exception):
+                    raise
+                outcome = e
+            else:
+                self.release(endpoint, time.perf_counter() - start, result.status, result.headers)
+                if result.status not in RETRY_STATUSES:
+                    return result
+                outcome = result
+            tried.append(endpoint)
+        return _finish(outcome)
+
+    def summary(self):
+        """每个地址一条 dict(name, requests, errors, throttled, latency, state)"""
+        now = time.monotonic()
+        with self._cond:
+            return [{
+                'name': e.name,
+                'requests': e.requests,
+                'errors': e.errors,
+                'throttled': e.throttled,
+                'latency': e.latency,
+                'state': 'cooling' if e.cooling(now) else 'ok',
+            } for e in self.endpoints]
+
+
+def _finish(outcome):
+    """所有地址都失败：返回最后的结果，或抛出最后的异常"""
+    if isinstance(outcome, Exception):
+        raise outcome
+    if outcome is None:
+        raise ConnectionError("所有瓦片地址都在冷却")
+    return outcome
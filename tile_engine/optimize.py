@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片压缩 - 下载完成后在进程池中重新压缩瓦片，缩小离线包
+
+    deflate   无损：解出 PNG 像素数据重新压缩（安装 zopfli 时用 zopfli），
+              去掉文本等附加块，像素完全不变
+    quantize  有损：调色板量化到 --colors 色（需要 Pillow）
+    webp      另存为 WebP 到单独目录（需要 Pillow），Leaflet 地址需改为 .webp
+
+压缩是 CPU 密集型工作，按 CPU 核数开进程，主进程只负责读写存储。
+有清单时记录每个瓦片压缩后的 SHA-1，再次运行只处理内容变化过的瓦片。
+
+依赖（均可选）:
+    pip install zopfli pillow
+"""
+
+import io
+import os
+import zlib
+import struct
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import zopfli.zlib as zopfli_zlib
+except ImportError:
+    zopfli_zlib = None
+
+from .fetcher import PNG_SIGNATURE
+
+METHODS = ('deflate', 'quantize', 'webp')
+
+# 重新压缩时保留的 PNG 块，其余（文本、时间戳等）不影响显示，直接去掉
+KEEP_CHUNKS = (b'IHDR', b'PLTE', b'tRNS', b'IDAT', b'IEND', b'gAMA', b'sRGB', b'cHRM', b'iCCP')
+
+# 每批交给子进程的瓦片数，减少进程间通信次数
+BATCH_SIZE = 32
+
+# ==================== PNG 工具 ====================
+
+def iter_chunks(data):
+    """遍历 PNG 块，生成 (类型, 内容)"""
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack('>I4s', data[pos:pos + 8])
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def make_chunk(kind, body):
+    """生成一个带 CRC 的 PNG 块"""
+    return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+
+def deflate_png(data):
+    """
+    无损重新压缩 PNG
+
+    返回:
+        bytes: 更小的 PNG；无法变小或不是 PNG 时返回 None
+    """
+    if not data.startswith(PNG_SIGNATURE):
+        return None
+    chunks = [(kind, body) for kind, body in iter_chunks(data) if kind in KEEP_CHUNKS]
+    idat = b''.join(body for kind, body in chunks if kind == b'IDAT')
+    raw = zlib.decompress(idat)
+
+    if zopfli_zlib is not None:
+        best = zopfli_zlib.compress(raw)
+    else:
+        best = None
+        for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+            compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+            candidate = compressor.compress(raw) + compressor.flush()
+            if best is None or len(candidate) < len(best):
+                best = candidate
+
+    out = [PNG_SIGNATURE]
+    wrote_idat = False
+    for kind, body in chunks:
+        if kind == b'IDAT':
+            if not wrote_idat:
+                out.append(make_chunk(b'IDAT', best))
+                wrote_idat = True
+            continue
+        out.append(make_chunk(kind, body))
+    result = b''.join(out)
+    return result if len(result) < len(data) else None
+
+
+def quantize_png(data, colors=256):
+    """调色板量化，返回更小的 PNG 或 None"""
+    image = Image.open(io.BytesIO(data))
+    if image.mode == 'P' and len(image.getcolors(256) or ()) <= colors:
+        # 已经是够小的调色板图
+        quantized = image
+    elif 'A' in image.getbands() or 'transparency' in image.info:
+        quantized = image.convert('RGBA').quantize(colors, method=Image.Quantize.FASTOCTREE)
+    else:
+        quantized = image.convert('RGB').quantize(colors)
+    buf = io.BytesIO()
+    quantized.save(buf, 'PNG', optimize=True)
+    result = buf.getvalue()
+    return result if len(result) < len(data) else None
+
+
+def webp_tile(data, quality=80):
+    """转换为 WebP"""
+    image = Image.open(io.BytesIO(data))
+    image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+    buf = io.BytesIO()
+    image.save(buf, 'WEBP', quality=quality, method=6)
+    return buf.getvalue()
+
+
+def process_tile(job):
+    """
+    子进程入口：处理一个瓦片
+
+    参数:
+        job: (z, x, y, data, method, options)
+
+    返回:
+        (z, x, y, 新内容或 None, 错误信息或 None)
+    """
+    z, x, y, data, method, options = job
+    try:
+        if method == 'deflate':
+            return z, x, y, deflate_png(data), None
+        if method == 'quantize':
+            return z, x, y, quantize_png(data, options.get('colors', 256)), None
+        return z, x, y, webp_tile(data, options.get('quality', 80)), None
+    except Exception as e:
+        return z, x, y, None, str(e) or type(e).__name__
+
+
+def process_batch(jobs):
+    """子进程入口：处理一批瓦片"""
+    return [process_tile(job) for job in jobs]
+
+# ==================== 批量处理 ====================
+
+def check_method(method):
+    """检查压缩方式所需的依赖，缺少时抛出 RuntimeError"""
+    if method not in METHODS:
+        raise ValueError(f"未知的压缩方式: {method}")
+    if method in ('quantize', 'webp') and Image is None:
+        raise RuntimeError(f"{method} 需要 Pillow: pip install pillow")
+
+
+def webp_path(root, z, x, y):
+    """WebP 输出路径，与 PNG 目录布局一致"""
+    return os.path.join(root, str(z), str(x), f"{y}.webp")
+
+
+def optimize_store(store, method='deflate', workers=None, output=None, force=False,
+                   on_progress=None, **options):
+    """
+    压缩存储中的全部瓦片
+
+    参数:
+        store: 瓦片存储（有清单时支持增量）
+        method: 'deflate' / 'quantize' / 'webp'
+        workers: 进程数，默认 CPU 核数
+        output: webp 的输出目录
+        force: 忽略增量记录，全部重新处理
+        on_progress: 每处理一个瓦片调用 on_progress(done, tile)
+        options: colors（quantize）、quality（webp）
+
+    返回:
+        dict: {zoom: {'tiles', 'skipped', 'before', 'after', 'errors'}}
+    """
+    check_method(method)
+    workers = workers or os.cpu_count() or 1
+    manifest = store.manifest
+    # 压缩后内容没再变过的瓦片，增量运行时跳过
+    current = manifest.optimized(method) if manifest is not None and not force else set()
+    stats = {}
+    originals = {}
+
+    def zoom_stats(z):
+        if z not in stats:
+            stats[z] = {'tiles': 0, 'skipped': 0, 'before': 0, 'after': 0, 'errors': 0}
+        return stats[z]
+
+    def batches():
+        batch = []
+        for z, x, y in store.iter_tiles():
+            if (z, x, y) in current:
+                zoom_stats(z)['skipped'] += 1
+                continue
+            data = store.read(z, x, y)
+            if data:
+                # 内容交给子进程后主进程只保留大小和哈希
+                originals[(z, x, y)] = (len(data), hashlib.sha1(data).hexdigest())
+                batch.append((z, x, y, data, method, options))
+                if len(batch) >= BATCH_SIZE:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def results(executor):
+        # 在途批次数有上限，瓦片内容不会一次全部读进内存
+        limit = 2 * workers
+        pending = set()
+        for batch in batches():
+            pending.add(executor.submit(process_batch, batch))
+            if len(pending) >= limit:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield from future.result()
+        for future in pending:
+            yield from future.result()
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for z, x, y, result, error in results(executor):
+            s = zoom_stats(z)
+            before, sha1 = originals.pop((z, x, y))
+            s['tiles'] += 1
+            s['before'] += before
+            after = before
+
+            if error:
+                s['errors'] += 1
+            elif method == 'webp':
+                path = webp_path(output, z, x, y)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(result)
+                after = len(result)
+            elif result is not None:
+                store.replace(z, x, y, result)
+                after = len(result)
+                sha1 = hashlib.sha1(result).hexdigest()
+            s['after'] += after
+
+            if manifest is not None and not error:
+                manifest.record_optimized(z, x, y, method, sha1)
+
+            done += 1
+            if on_progress:
+                on_progress(done, (z, x, y))
+
+    store.flush()
+    return stats
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片规划 - 根据地图范围和缩放级别计算需要的瓦片
+
+TilePlan 在创建时一次性算好各缩放级别的瓦片范围，之后的计数、
+遍历和成员判断都直接使用缓存的范围，不再重复做坐标换算。
+
+默认是一个经纬度矩形；TilePlan.from_regions 可以由多个矩形、多边形、
+路线走廊（见 regions.py）合并出精确的瓦片集合，重叠部分自动去重。
+区域计划的瓦片集合以排好序的 64 位编码保存（见 tilekeys.py），
+每个瓦片 8 字节，百万级的计划也只占几 MB。
+"""
+
+import math
+
+from .config import MIN_LAT, MAX_LAT, MIN_LON, MAX_LON, MIN_ZOOM, MAX_ZOOM
+from .tilekeys import TileKeys, rect_keys
+
+# ==================== 工具函数 ====================
+
+def latlon_to_tile(lat, lon, zoom):
+    """
+    将经纬度转换为瓦片坐标
+
+    参数:
+        lat: 纬度
+        lon: 经度
+        zoom: 缩放级别
+
+    返回:
+        (x, y): 瓦片坐标
+    """
+    n = 2.0 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return (x, y)
+
+def bbox_tile_range(min_lat, min_lon, max_lat, max_lon, zoom):
+    """
+    计算经纬度矩形在指定缩放级别下的瓦片范围
+
+    返回:
+        (x_min, x_max, y_min, y_max): 闭区间
+    """
+    x1, y1 = latlon_to_tile(max_lat, min_lon, zoom)  # 西北角
+    x2, y2 = latlon_to_tile(min_lat, max_lon, zoom)  # 东南角
+
+    # 确定正确的范围（纬度越大，y坐标越小）
+    return (min(x1, x2), max(x1, x2), min(y1, y2), max(y1, y2))
+
+# ==================== 瓦片计划 ====================
+
+class TilePlan:
+    """
+    一次性计算好的瓦片下载计划
+
+    属性:
+        bbox: (min_lat, min_lon, max_lat, max_lon)，区域计划为外包矩形
+        ranges: {zoom: (x_min, x_max, y_min, y_max)}，区域计划为外包范围
+        cells: None 表示整个矩形；区域计划为 {zoom: TileKeys}
+        regions: 生成计划的区域列表（矩形计划为空）
+    """
+
+    def __init__(self, min_lat=MIN_LAT, min_lon=MIN_LON, max_lat=MAX_LAT,
+                 max_lon=MAX_LON, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+        self.bbox = (min_lat, min_lon, max_lat, max_lon)
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.cells = None
+        self.regions = []
+        self.ranges = {}
+        for zoom in range(min_zoom, max_zoom + 1):
+            self.ranges[zoom] = bbox_tile_range(min_lat, min_lon, max_lat, max_lon, zoom)
+
+    @classmethod
+    def from_regions(cls, regions, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+        """
+        由区域列表生成计划，每个缩放级别取各区域覆盖瓦片的并集
+
+        参数:
+            regions: BBoxRegion / PolygonRegion 等带 bounds() 和 cover_keys(zoom) 的对象
+        """
+        if not regions:
+            raise ValueError("至少需要一个区域")
+        bounds = [region.bounds() for region in regions]
+        bbox = (min(b[0] for b in bounds), min(b[1] for b in bounds),
+                max(b[2] for b in bounds), max(b[3] for b in bounds))
+
+        cells = {}
+        for zoom in range(min_zoom, max_zoom + 1):
+            cells[zoom] = TileKeys.from_parts(zoom, [region.cover_keys(zoom) for region in regions])
+
+        plan = cls.from_cells(cells, bbox)
+        plan.regions = list(regions)
+        return plan
+
+    @classmethod
+    def from_cells(cls, cells, bbox=None):
+        """
+        由现成的瓦片集合生成计划
+
+        参数:
+            cells: {zoom: TileKeys 或可迭代的 (x, y)}
+        """
+        cells = {z: TileKeys.from_cells(z, tiles) for z, tiles in cells.items()}
+        zooms = sorted(z for z, tiles in cells.items() if len(tiles))
+        if not zooms:
+            raise ValueError("计划中没有瓦片")
+        plan = cls.__new__(cls)
+        plan.bbox = bbox
+        plan.min_zoom = zooms[0]
+        plan.max_zoom = zooms[-1]
+        plan.regions = []
+        plan.cells = {z: cells[z] for z in zooms}
+        plan.ranges = {z: tiles.bounds() for z, tiles in plan.cells.items()}
+        return plan
+
+    def merge(self, other):
+        """
+        合并两个计划（各层级取并集）
+
+        返回:
+            新的 TilePlan，原计划不变
+        """
+        cells = {}
+        for plan in (self, other):
+            for z in plan.zooms():
+                keys = TileKeys(z, plan.keys(z))
+                cells[z] = cells[z].union(keys) if z in cells else keys
+        boxes = [plan.bbox for plan in (self, other) if plan.bbox]
+        bbox = (min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes)) if boxes else None
+
+        merged = TilePlan.from_cells(cells, bbox)
+        merged.regions = self.regions + other.regions
+        return merged
+
+    @property
+    def is_rectangular(self):
+        """每个缩放级别是否都是完整矩形"""
+        return self.cells is None
+
+    def zooms(self):
+        """返回计划中的缩放级别列表（升序）"""
+        return sorted(self.ranges)
+
+    def count(self, zoom=None):
+        """返回指定缩放级别（或全部）的瓦片数量"""
+        if zoom is None:
+            return sum(self.count(z) for z in self.ranges)
+        if self.cells is not None:
+            return len(self.cells[zoom])
+        x_min, x_max, y_min, y_max = self.ranges[zoom]
+        return (x_max - x_min + 1) * (y_max - y_min + 1)
+
+    def envelope_count(self, zoom=None):
+        """外包矩形的瓦片数量（用于比较区域计划节省了多少）"""
+        if zoom is None:
+            return sum(self.envelope_count(z) for z in self.ranges)
+        x_min, x_max, y_min, y_max = self.ranges[zoom]
+        return (x_max - x_min + 1) * (y_max - y_min + 1)
+
+    def keys(self, zoom):
+        """
+        指定缩放级别的瓦片编码（已排序，见 tilekeys.py）
+
+        有 NumPy 时为 uint64 数组，否则为 array('Q')
+        """
+        if self.cells is not None:
+            return self.cells[zoom].keys
+        return rect_keys(zoom, *self.ranges[zoom])
+
+    def tiles(self, zoom=None):
+        """按缩放级别、x、y 顺序生成 (z, x, y) 瓦片坐标"""
+        zooms = self.zooms() if zoom is None else [zoom]
+        for z in zooms:
+            if self.cells is not None:
+                for x, y in self.cells[z]:
+                    yield (z, x, y)
+                continue
+            x_min, x_max, y_min, y_max = self.ranges[z]
+            for x in range(x_min, x_max + 1):
+                for y in range(y_min, y_max + 1):
+                    yield (z, x, y)
+
+    def __iter__(self):
+        return self.tiles()
+
+    def __len__(self):
+        return self.count()
+
+    def __contains__(self, tile):
+        z, x, y = tile
+        if z not in self.ranges:
+            return False
+        if self.cells is not None:
+            return (x, y) in self.cells[z]
+        x_min, x_max, y_min, y_max = self.ranges[z]
+        return x_min <= x <= x_max and y_min <= y <= y_max
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+从行程数据规划瓦片
+
+config.py 中的矩形是按几个景点手工推出来的。这里直接读取
+data/data.js（或 docs/data.js）里酒店、机场、景点的坐标，
+在每个点周围取圆形区域：
+
+    MIN_ZOOM ~ MAX_ZOOM     每个点周围 POI_RADIUS_KM
+    MAX_ZOOM+1 ~ 详细层级    只在每个点周围 POI_DETAIL_RADIUS_KM
+
+离主要区域太远的点（例如出发地上海浦东机场）自动排除。
+"""
+
+import re
+import math
+import statistics
+
+from .config import POI_MAX_DISTANCE_KM
+from .regions import KM_PER_DEG, disc
+
+# data.js 中的数组字段，例如 "    attractions: ["
+SECTION_RE = re.compile(r"^\s*(\w+)\s*:\s*\[")
+# 单行的 key: 'value' 或 key: 数值
+FIELD_RE = re.compile(r"^\s*(id|name|lat|lng|day)\s*:\s*(?:'([^']*)'|\"([^\"]*)\"|(-?\d+(?:\.\d+)?))")
+
+
+def load_pois(path):
+    """
+    解析 data.js 中带 lat / lng 的对象
+
+    data.js 是 JavaScript 而不是 JSON，这里按行读取对象字段，
+    遇到新的 id 就开始一个新的点。
+
+    返回:
+        list: [{'id', 'name', 'section', 'lat', 'lng', 'day'}]
+    """
+    pois = []
+    section = None
+    current = None
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = SECTION_RE.match(line)
+            if match:
+                section = match.group(1)
+                continue
+
+            match = FIELD_RE.match(line)
+            if not match:
+                continue
+            key = match.group(1)
+            text = match.group(2) if match.group(2) is not None else match.group(3)
+            value = text if text is not None else float(match.group(4))
+
+            if key == 'id':
+                current = {'id': value, 'name': None, 'section': section,
+                           'lat': None, 'lng': None, 'day': None}
+                pois.append(current)
+            elif current is not None and current[key] is None:
+                current[key] = value
+
+    for poi in pois:
+        poi['name'] = poi['name'] or poi['id']
+        if poi['day'] is not None:
+            poi['day'] = int(poi['day'])
+    return [p for p in pois if p['lat'] is not None and p['lng'] is not None]
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """两点间的近似距离（公里，等距矩形投影，城市尺度足够）"""
+    scale = math.cos(math.radians((lat1 + lat2) / 2))
+    return math.hypot((lat2 - lat1) * KM_PER_DEG, (lon2 - lon1) * KM_PER_DEG * scale)
+
+
+def nearby(pois, max_km=POI_MAX_DISTANCE_KM):
+    """
+    排除离主要区域太远的点
+
+    以所有点坐标的中位数为中心（不受个别远点影响），保留 max_km 以内的点
+
+    返回:
+        (kept, dropped)
+    """
+    if not pois:
+        return [], []
+    lat = statistics.median(p['lat'] for p in pois)
+    lng = statistics.median(p['lng'] for p in pois)
+    kept, dropped = [], []
+    for poi in pois:
+        near = distance_km(lat, lng, poi['lat'], poi['lng']) <= max_km
+        (kept if near else dropped).append(poi)
+    return kept, dropped
+
+
+def poi_regions(pois, radius_km):
+    """每个点一个圆形区域，坐标相同的点只取一次"""
+    seen = set()
+    regions = []
+    for poi in pois:
+        key = (poi['lat'], poi['lng'])
+        if key not in seen:
+            seen.add(key)
+            regions.append(disc(poi['lat'], poi['lng'], radius_km))
+    return regions
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+进度事件 - 下载进程写出可追踪（tail）的事件日志，监控进程订阅
+
+下载进程每保存一个瓦片追加一行 JSON（攒批写出），监控进程从文件末尾
+持续读取新行，不扫描瓦片目录，也不需要查询清单。
+
+事件（run 为写入进程的本轮标识）:
+    {"e": "start", "t": 时间, "run": 标识, "mode": 模式, "total": {z: 计划数}, "done": {z: 已完成数}}
+    {"e": "tile", "t": 时间, "run": 标识, "z": z, "x": x, "y": y, "b": 字节数, "r": 结果}
+    {"e": "failed", "t": 时间, "run": 标识, "z": z, "x": x, "y": y, "r": 结果}
+    {"e": "alive", "t": 时间, "run": 标识}
+    {"e": "end", "t": 时间, "run": 标识}
+
+日志以追加方式打开，每批一次 os.write，多个下载进程可以同时写同一个文件。
+后台线程每 FLUSH_INTERVAL 秒写出攒下的事件，下载停顿时监控端也不会落后；
+超过 HEARTBEAT_INTERVAL 秒没有事件时写一条 alive。
+进程退出时（包括 Ctrl+C）写出剩余事件和结束事件。
+读取端按 run 区分各进程：另一个进程开始新一轮时只合并它的计划，不清空正在进行的其他轮次；
+被强制结束（SIGKILL、断电）没写出结束事件的轮次，超过 STALE_AFTER 秒没有事件即视为已结束。
+"""
+
+import os
+import json
+import time
+import uuid
+import atexit
+import threading
+from collections import deque
+
+from .config import PROGRESS_LOG
+
+# 攒批写出的间隔（秒）
+FLUSH_INTERVAL = 0.5
+# 没有其他事件时写出 alive 的间隔（秒）
+HEARTBEAT_INTERVAL = 4 * FLUSH_INTERVAL
+# 读取端认为轮次已中断的静默时间（秒）
+STALE_AFTER = 3 * HEARTBEAT_INTERVAL
+# 新一轮开始时日志超过这个大小就清空
+MAX_LOG_SIZE = 20 * 1024 * 1024
+# 计算速度的滑动窗口（秒）
+RATE_WINDOW = 10.0
+
+
+class ProgressLog:
+    """
+    进度事件写入端
+
+    挂到存储上（store.events = log）后，每次写入瓦片自动发布事件。
+
+    参数:
+        path: 事件日志路径
+
+    属性:
+        run: 本轮标识（进程号-随机串）
+    """
+
+    def __init__(self, path=PROGRESS_LOG):
+        self.path = path
+        self.run = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._lines = []
+        self._last_flush = time.monotonic()
+        self._last_event = time.monotonic()
+        self._fd = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, mode, total, done):
+        """
+        开始一轮下载
+
+        参数:
+            mode: 模式名
+            total: {z: 本轮计划的瓦片数}
+            done: {z: 其中已完成的数量}
+        """
+        if os.path.exists(self.path) and os.path.getsize(self.path) > MAX_LOG_SIZE:
+            os.truncate(self.path, 0)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._emit({'e': 'start', 'mode': mode, 'total': total, 'done': done}, flush=True)
+        self._thread = threading.Thread(target=self._flusher, name='progress-log', daemon=True)
+        self._thread.start()
+        atexit.register(self.end)
+
+    def tile(self, z, x, y, size, result='success'):
+        """一个瓦片已保存（或刷新确认未变）"""
+        self._emit({'e': 'tile', 'z': z, 'x': x, 'y': y, 'b': size, 'r': result})
+
+    def failed(self, z, x, y, result):
+        """一个瓦片最终失败"""
+        self._emit({'e': 'failed', 'z': z, 'x': x, 'y': y, 'r': result})
+
+    def end(self):
+        """本轮结束，写出剩余事件并关闭"""
+        if self._fd is None:
+            return
+        atexit.unregister(self.end)
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._emit({'e': 'end'}, flush=True)
+        os.close(self._fd)
+        self._fd = None
+
+    def flush(self):
+        """写出攒下的事件"""
+        with self._lock:
+            self._write()
+
+    def _flusher(self):
+        """后台定时写出，长时间没有事件时写出 alive"""
+        while not self._stop.wait(FLUSH_INTERVAL):
+            if time.monotonic() - self._last_event >= HEARTBEAT_INTERVAL:
+                self._emit({'e': 'alive'}, flush=True)
+            else:
+                self.flush()
+
+    def _write(self):
+        """调用方需持有锁"""
+        if self._lines and self._fd is not None:
+            os.write(self._fd, ''.join(self._lines).encode('utf-8'))
+            self._lines = []
+        self._last_flush = time.monotonic()
+
+    def _emit(self, event, flush=False):
+        if self._fd is None:
+            return
+        event['t'] = round(time.time(), 3)
+        event['run'] = self.run
+        line = json.dumps(event, separators=(',', ':')) + '\n'
+        with self._lock:
+            self._lines.append(line)
+            self._last_event = time.monotonic()
+            if flush or time.monotonic() - self._last_flush >= FLUSH_INTERVAL:
+                self._write()
+
+
+class ProgressTail:
+    """
+    进度事件读取端：持续读取日志新增的行，汇总出当前状态
+
+    属性:
+        total / done: {z: 数量}，多个进程同时下载时合并各自的计划
+        running: 是否有下载正在进行
+        bytes: 本轮已下载字节数
+        failed: 本轮最终失败数
+        expired: 没有结束事件、因长时间静默视为中断的轮次数
+    """
+
+    def __init__(self, path=PROGRESS_LOG):
+        self.path = path
+        self._pos = 0
+        self._partial = ''
+        self.expired = 0
+        self.reset()
+
+    def reset(self):
+        """清空状态（新一轮开始时）"""
+        self.total = {}
+        self.done = {}
+        self.mode = None
+        self.running = False
+        self.started = None
+        self.bytes = 0
+        self.failed = 0
+        self._recent = deque()
+        # 正在进行的轮次 → 最近一个事件的时间
+        self._runs = {}
+
+    def poll(self, now=None):
+        """
+        读取新增的事件并更新状态
+
+        参数:
+            now: 当前时间（默认 time.time()），用于判断中断的轮次
+
+        返回:
+            int: 本次读到的事件数，日志不存在时为 0
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            self.expire(now)
+            return 0
+        if size < self._pos:
+            # 日志被清空重写
+            self._pos = 0
+            self._partial = ''
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._pos)
+            data = f.read()
+        self._pos += len(data)
+
+        lines = (self._partial + data.decode('utf-8', errors='replace')).split('\n')
+        self._partial = lines.pop()
+        count = 0
+        for line in lines:
+            if line:
+                try:
+                    self._apply(json.loads(line))
+                except ValueError:
+                    continue
+                count += 1
+        self.expire(now)
+        return count
+
+    def expire(self, now=None):
+        """超过 STALE_AFTER 秒没有事件的轮次视为已中断"""
+        now = now if now is not None else time.time()
+        for run, last in list(self._runs.items()):
+            if now - last > STALE_AFTER:
+                del self._runs[run]
+                self.expired += 1
+        self.running = bool(self._runs)
+
+    def _apply(self, event):
+        kind = event.get('e')
+        run = event.get('run')
+        if kind == 'start':
+            # 回放历史日志时，按事件时间清理此前已中断的轮次
+            self.expire(event['t'])
+            if not self._runs:
+                # 没有其他进程在下载，开始新的一轮
+                self.reset()
+                self.started = event['t']
+            self._runs[run] = event['t']
+            self.mode = event.get('mode')
+            # 开始时的完成数是当时存储中的实际数量，已包含其他进程此前写入的瓦片
+            for z, n in event['total'].items():
+                self.total[int(z)] = max(self.total.get(int(z), 0), n)
+            for z, n in event['done'].items():
+                self.done[int(z)] = max(self.done.get(int(z), 0), n)
+            self.running = True
+        elif kind == 'tile':
+            z = event['z']
+            if event.get('r') != 'not_modified':
+                self.done[z] = min(self.done.get(z, 0) + 1, self.total.get(z, float('inf')))
+            self.bytes += event.get('b', 0)
+            self._recent.append((event['t'], event.get('b', 0)))
+        elif kind == 'failed':
+            self.failed += 1
+        elif kind == 'end':
+            self._runs.pop(run, None)
+            self.running = bool(self._runs)
+        if kind != 'end' and run in self._runs:
+            self._runs[run] = event['t']
+        self._trim(event.get('t', 0))
+
+    def _trim(self, now):
+        while self._recent and self._recent[0][0] < now - RATE_WINDOW:
+            self._recent.popleft()
+
+    def rates(self, now=None):
+        """
+        最近 RATE_WINDOW 秒的速度
+
+        返回:
+            (瓦片/秒, 字节/秒)
+        """
+        if not self._recent:
+            return 0.0, 0.0
+        now = now if now is not None else time.time()
+        self._trim(now)
+        start = max(now - RATE_WINDOW, self.started or now)
+        span = max(now - start, 1e-3)
+        return len(self._recent) / span, sum(b for _, b in self._recent) / span
+
+    def remaining(self):
+        """本轮还剩多少瓦片"""
+        return sum(self.total.values()) - sum(self.done.values())
+
+    def eta(self, now=None):
+        """预计剩余时间（秒），速度为 0 时返回 None"""
+        tiles_per_sec, _ = self.rates(now)
+        if tiles_per_sec <= 0:
+            return None
+        return self.remaining() / tiles_per_sec
+
+
+def format_duration(seconds):
+    """秒数格式化为 1h02m03s / 2m03s / 45s"""
+    if seconds is None:
+        return '--'
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m{secs:02d}s"
+    if minutes:
+        return f"{minutes}m{secs:02d}s"
+    return f"{secs}s"
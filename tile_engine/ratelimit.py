@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+自适应令牌桶限流器
+
+所有下载线程 / 协程共用一个令牌桶，每发出一个网络请求消耗一个令牌，
+已存在而跳过的瓦片不消耗令牌，也不等待。
+
+速率按 AIMD 方式自适应:
+    - 收到 429/503 时速率减半，并按 Retry-After 暂停发送
+    - 低于降速前的速率时，每次成功按当前速率的 RECOVERY_STEP 回升，
+      约 35 个成功请求就回到降速前，与速率高低无关
+    - 达到降速前的速率后每次成功只增加 increase，缓慢试探，直到 max_rate（None 表示不设上限）
+
+初始速率为 None 时起步不限流，只统计实际发出的请求速率；
+第一次被限流时从这个实际速率减半开始，之后同样按 AIMD 调整。
+"""
+
+import math
+import time
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+
+from .config import RATE_LIMIT, RATE_LIMIT_MAX
+
+# 被限流时使用的状态码
+THROTTLE_STATUSES = (429, 503)
+
+# 没有 Retry-After 时的默认暂停时间（秒）
+DEFAULT_RETRY_AFTER = 5.0
+
+# 回升到降速前速率的过程中，每个成功请求增加当前速率的比例
+RECOVERY_STEP = 0.02
+
+# 不限流阶段统计实际请求速率的窗口（秒）
+RATE_WINDOW = 1.0
+
+
+def format_rate(rate):
+    """速率的显示文字：None 或无上限时为"不限"，否则保留一位小数"""
+    if rate is None or math.isinf(rate):
+        return '不限'
+    return f"{rate:.1f}"
+
+
+def parse_retry_after(value):
+    """
+    解析 Retry-After 响应头
+
+    支持秒数和 HTTP 日期两种格式，无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    线程安全的自适应令牌桶
+
+    参数:
+        rate: 初始速率（请求/秒），None 表示第一次被限流之前不限流
+        max_rate: 速率上限，成功请求会让速率逐渐回升到这里，None 表示不设上限
+        min_rate: 速率下限
+        burst: 桶容量，允许的瞬时突发请求数
+        increase: 超过降速前的速率后，每次成功的速率增加量（请求/秒）
+        decrease: 被限流时速率乘以的系数
+
+    属性:
+        rate: 当前速率，不限流阶段为 None
+    """
+
+    def __init__(self, rate=RATE_LIMIT, max_rate=RATE_LIMIT_MAX, min_rate=0.5,
+                 burst=None, increase=0.05, decrease=0.5):
+        self.rate = float(rate) if rate is not None else None
+        self.max_rate = float(max_rate) if max_rate is not None else math.inf
+        if self.rate is not None:
+            self.max_rate = max(self.max_rate, self.rate)
+            min_rate = min(min_rate, self.rate)
+        self.min_rate = float(min_rate)
+        self._fixed_burst = burst
+        self.burst = burst if burst is not None else max(1.0, self.rate or 1.0)
+        self.increase = increase
+        self.decrease = decrease
+
+        self.tokens = self.burst
+        self.paused_until = 0.0
+        self.throttled_count = 0
+        self._last = time.monotonic()
+        self._last_decrease = 0.0
+        # 最近一次降速前的速率，回升到这里之前按比例快速回升
+        self._peak = None
+        # 不限流阶段：当前窗口的起点和请求数，上一个完整窗口的实际速率
+        self._window_start = self._last
+        self._window_count = 0
+        self._observed = None
+        self._lock = threading.Lock()
+
+    def observed_rate(self, now):
+        """不限流阶段的实际请求速率（调用方需持有锁）"""
+        elapsed = now - self._window_start
+        if self._observed is not None and elapsed < RATE_WINDOW:
+            return self._observed
+        return self._window_count / max(elapsed, 1e-3)
+
+    def _refill(self, now):
+        """按流逝时间补充令牌"""
+        elapsed = now - self._last
+        self._last = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def reserve(self):
+        """
+        预订一个令牌
+
+        返回:
+            float: 调用方在发出请求前需要等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.rate is None:
+                self._window_count += 1
+                if now - self._window_start >= RATE_WINDOW:
+                    self._observed = self._window_count / (now - self._window_start)
+                    self._window_start = now
+                    self._window_count = 0
+                return max(0.0, self.paused_until - now)
+            self._refill(now)
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def acquire(self):
+        """阻塞直到可以发出请求（线程用）"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """等待直到可以发出请求（协程用）"""
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, retry_after=None):
+        """
+        被限流：降低速率并暂停发送
+
+        参数:
+            retry_after: 服务器要求的等待秒数，None 使用默认值
+        """
+        pause = retry_after if retry_after is not None else DEFAULT_RETRY_AFTER
+        with self._lock:
+            now = time.monotonic()
+            self.throttled_count += 1
+            self.paused_until = max(self.paused_until, now + pause)
+            first = self.rate is None
+            if first:
+                # 第一次被限流：从实际速率开始限流
+                self.rate = min(self.max_rate, max(self.min_rate, self.observed_rate(now)))
+                self._last = now
+            # 同一批在途请求可能同时收到 429，一个暂停周期内只降速一次
+            if now - self._last_decrease >= max(pause, 1.0 / self.rate):
+                self._peak = self.rate
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_decrease = now
+            if first and self._fixed_burst is None:
+                self.burst = max(1.0, self.rate)
+            self.tokens = min(self.tokens, 0.0)
+
+    def reward(self):
+        """请求成功：低于降速前的速率时按比例回升，之后小幅试探"""
+        with self._lock:
+            if self.rate is None or self.rate >= self.max_rate:
+                return
+            if self._peak is not None and self.rate < self._peak:
+                rate = min(self._peak, self.rate * (1 + RECOVERY_STEP))
+                step = rate - self.rate
+            else:
+                step = 0.0
+            self.rate = min(self.max_rate, self.rate + max(step, self.increase))
+
+    def observe(self, result):
+        """
+        根据抓取结果调整速率
+
+        参数:
+            result: FetchResult
+        """
+        if result.status in THROTTLE_STATUSES:
+            self.penalize(parse_retry_after(result.headers.get('Retry-After')))
+        elif result.ok:
+            self.reward()
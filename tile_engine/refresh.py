@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+增量刷新 - 按年龄策略挑出需要重新确认的瓦片
+
+刷新时对已有瓦片发送带 If-None-Match / If-Modified-Since 的条件请求，
+服务器返回 304 时只更新清单中的确认时间，不重写文件。
+需要清单记录每个瓦片的校验值和确认时间。
+"""
+
+import time
+
+from .config import REFRESH_MAX_AGE, REFRESH_DEFAULT_AGE
+
+DAY = 86400
+
+
+class RefreshPolicy:
+    """
+    瓦片年龄策略
+
+    参数:
+        max_age: {zoom: 天数}，超过天数的瓦片到期
+        default_age: 未在 max_age 中列出的缩放级别使用的天数
+    """
+
+    def __init__(self, max_age=None, default_age=REFRESH_DEFAULT_AGE):
+        self.max_age = dict(REFRESH_MAX_AGE if max_age is None else max_age)
+        self.default_age = default_age
+
+    def age_days(self, zoom):
+        """指定缩放级别的最长保留天数"""
+        return self.max_age.get(zoom, self.default_age)
+
+    def due_tiles(self, store, plan, zoom, now=None):
+        """
+        计划中该缩放级别已到期的瓦片
+
+        返回:
+            list: [(z, x, y)]
+        """
+        if store.manifest is None:
+            raise ValueError("刷新模式需要瓦片清单")
+        now = time.time() if now is None else now
+        before = now - self.age_days(zoom) * DAY
+        due = store.manifest.due(zoom, *plan.ranges[zoom], before)
+        if not plan.is_rectangular:
+            due = [tile for tile in due if tile in plan]
+        return due
+
+
+def parse_zoom_ages(items):
+    """
+    解析命令行的 Z=天数 列表
+
+    例如 ['15=7', '14=14'] → {15: 7, 14: 14}
+    """
+    ages = {}
+    for item in items or []:
+        zoom, _, days = item.partition('=')
+        ages[int(zoom)] = float(days)
+    return ages
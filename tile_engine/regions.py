@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+规划区域 - 矩形、多边形和路线走廊
+
+一个大矩形会把胡志明市和美拖之间的大片农田、水面也算进去。
+这里的区域按实际形状计算瓦片覆盖：
+
+    BBoxRegion     经纬度矩形
+    PolygonRegion  多边形（可带洞），支持 GeoJSON
+    corridor()     沿路线两侧缓冲一定距离的走廊
+    disc()         以某点为中心的圆形区域
+
+多边形覆盖算法（在瓦片坐标系中计算）:
+    1. 沿每条边做 supercover 光栅化，得到边经过的所有瓦片
+    2. 逐行在瓦片中心线上求交点，按奇偶规则填充中心落在多边形内的瓦片
+两者的并集恰好是与多边形相交的全部瓦片。
+
+cover_keys(zoom) 返回同样的瓦片集合的编码（见 tilekeys.py），安装 NumPy 时
+交点计算和扫描线填充都是数组运算，TilePlan 用它合并大量区域和高层级。
+"""
+
+import json
+import math
+from collections import defaultdict
+
+from .plan import bbox_tile_range
+from .tilekeys import (np, cell_keys, rect_keys, span_keys, concat_keys, decode,
+                       lonlat_to_tile_xy_array)
+
+# 每度纬度对应的公里数
+KM_PER_DEG = 111.32
+
+
+def lonlat_to_tile_xy(lon, lat, zoom):
+    """经纬度转为浮点瓦片坐标（整数部分即瓦片编号）"""
+    n = 2.0 ** zoom
+    fx = (lon + 180.0) / 360.0 * n
+    fy = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return fx, fy
+
+
+class BBoxRegion:
+    """经纬度矩形区域"""
+
+    kind = '矩形'
+
+    def __init__(self, min_lat, min_lon, max_lat, max_lon):
+        self.min_lat = min(min_lat, max_lat)
+        self.max_lat = max(min_lat, max_lat)
+        self.min_lon = min(min_lon, max_lon)
+        self.max_lon = max(min_lon, max_lon)
+
+    def bounds(self):
+        """(min_lat, min_lon, max_lat, max_lon)"""
+        return (self.min_lat, self.min_lon, self.max_lat, self.max_lon)
+
+    def cover(self, zoom):
+        """该缩放级别下与区域相交的瓦片 {(x, y)}"""
+        x_min, x_max, y_min, y_max = bbox_tile_range(*self.bounds(), zoom)
+        return {(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)}
+
+    def cover_keys(self, zoom):
+        """同 cover，返回已排序的瓦片编码"""
+        return rect_keys(zoom, *bbox_tile_range(*self.bounds(), zoom))
+
+
+class PolygonRegion:
+    """
+    多边形区域
+
+    参数:
+        rings: 环的列表，每个环是 [(lat, lon), ...]；第一个为外环，其余为洞
+    """
+
+    kind = '多边形'
+
+    def __init__(self, rings, kind=None):
+        self.rings = [list(ring) for ring in rings if len(ring) >= 3]
+        if not self.rings:
+            raise ValueError("多边形至少需要 3 个顶点")
+        if kind:
+            self.kind = kind
+
+    def bounds(self):
+        """(min_lat, min_lon, max_lat, max_lon)"""
+        lats = [lat for ring in self.rings for lat, _ in ring]
+        lons = [lon for ring in self.rings for _, lon in ring]
+        return (min(lats), min(lons), max(lats), max(lons))
+
+    def cover(self, zoom):
+        """该缩放级别下与多边形相交的瓦片 {(x, y)}"""
+        return {decode(key)[1:] for key in self.cover_keys(zoom).tolist()}
+
+    def cover_keys(self, zoom):
+        """同 cover，返回瓦片编码（未排序，可能有重复）"""
+        n = 1 << zoom
+        edges = set()
+        crossings = []
+
+        for ring in self.rings:
+            fx, fy = lonlat_to_tile_xy_array([lon for _, lon in ring], [lat for lat, _ in ring], zoom)
+            points = list(zip(_floats(fx), _floats(fy)))
+            if points[0] != points[-1]:
+                points.append(points[0])
+
+            for (x0, y0), (x1, y1) in zip(points, points[1:]):
+                # 1. 边经过的瓦片
+                edges.update(_segment_cells(x0, y0, x1, y1))
+                # 2. 边与各行中心线 y = r + 0.5 的交点（半开区间，避免顶点重复计数）
+                if y0 != y1:
+                    crossings.append(_edge_crossings(x0, y0, x1, y1))
+
+        edge_keys = cell_keys(zoom, ((x, y) for x, y in edges if 0 <= x < n and 0 <= y < n))
+        rows, starts, ends = _fill_spans(crossings, n)
+        return concat_keys([edge_keys, span_keys(zoom, rows, starts, ends)])
+
+
+def _floats(values):
+    """数组或列表 → Python float 列表"""
+    return values.tolist() if np is not None else list(values)
+
+
+def _edge_crossings(x0, y0, x1, y1):
+    """
+    一条边与各行中心线的交点
+
+    返回:
+        (行号序列, 交点 x 序列)
+    """
+    ya, yb = min(y0, y1), max(y0, y1)
+    first, last = math.ceil(ya - 0.5), math.ceil(yb - 0.5)
+    slope = (x1 - x0) / (y1 - y0)
+    if np is not None:
+        rows = np.arange(first, last, dtype=np.int64)
+        return rows, x0 + (rows + 0.5 - y0) * slope
+    rows = range(first, last)
+    return rows, [x0 + (row + 0.5 - y0) * slope for row in rows]
+
+
+def _fill_spans(crossings, n):
+    """
+    按奇偶规则把交点配对成每行的填充区间，裁剪到 [0, n)
+
+    每行的交点数都是偶数（环是闭合的），按 (行, x) 排序后相邻两个即为一段。
+
+    返回:
+        (rows, starts, ends)，x 为闭区间
+    """
+    if np is not None:
+        if not crossings:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        rows = np.concatenate([r for r, _ in crossings])
+        xs = np.concatenate([x for _, x in crossings])
+        order = np.lexsort((xs, rows))
+        rows, xs = rows[order], xs[order]
+        rows = rows[0::2]
+        starts = np.maximum(np.ceil(xs[0::2] - 0.5).astype(np.int64), 0)
+        ends = np.minimum(np.floor(xs[1::2] - 0.5).astype(np.int64), n - 1)
+        keep = (rows >= 0) & (rows < n) & (starts <= ends)
+        return rows[keep], starts[keep], ends[keep]
+
+    by_row = defaultdict(list)
+    for rows, xs in crossings:
+        for row, x in zip(rows, xs):
+            by_row[row].append(x)
+    spans = ([], [], [])
+    for row, xs in by_row.items():
+        if not 0 <= row < n:
+            continue
+        xs.sort()
+        for xa, xb in zip(xs[0::2], xs[1::2]):
+            start, end = max(math.ceil(xa - 0.5), 0), min(math.floor(xb - 0.5), n - 1)
+            if start <= end:
+                spans[0].append(row)
+                spans[1].append(start)
+                spans[2].append(end)
+    return spans
+
+
+def _segment_cells(x0, y0, x1, y1):
+    """线段在瓦片网格上经过的所有格子（Amanatides-Woo 遍历）"""
+    cx, cy = math.floor(x0), math.floor(y0)
+    ex, ey = math.floor(x1), math.floor(y1)
+    cells = [(cx, cy)]
+    dx, dy = x1 - x0, y1 - y0
+
+    step_x = 1 if dx > 0 else -1
+    step_y = 1 if dy > 0 else -1
+    t_max_x = ((cx + (dx > 0)) - x0) / dx if dx else math.inf
+    t_max_y = ((cy + (dy > 0)) - y0) / dy if dy else math.inf
+    t_delta_x = abs(1.0 / dx) if dx else math.inf
+    t_delta_y = abs(1.0 / dy) if dy else math.inf
+
+    for _ in range(abs(ex - cx) + abs(ey - cy)):
+        if t_max_x < t_max_y:
+            cx += step_x
+            t_max_x += t_delta_x
+        else:
+            cy += step_y
+            t_max_y += t_delta_y
+        cells.append((cx, cy))
+    return cells
+
+# ==================== 构造区域 ====================
+
+def disc(lat, lon, radius_km, sides=24):
+    """以 (lat, lon) 为圆心、radius_km 为半径的近似圆形区域"""
+    dlat = radius_km / KM_PER_DEG
+    dlon = radius_km / (KM_PER_DEG * math.cos(math.radians(lat)))
+    ring = [(lat + dlat * math.sin(2 * math.pi * i / sides),
+             lon + dlon * math.cos(2 * math.pi * i / sides)) for i in range(sides)]
+    return PolygonRegion([ring], kind='圆形')
+
+
+def corridor(points, buffer_km):
+    """
+    路线走廊：沿折线两侧各缓冲 buffer_km
+
+    由每段线段的缓冲矩形和每个拐点的圆形拼成，返回区域列表
+
+    参数:
+        points: [(lat, lon), ...]
+    """
+    regions = []
+    for lat, lon in points:
+        regions.append(disc(lat, lon, buffer_km, sides=16))
+
+    for (lat0, lon0), (lat1, lon1) in zip(points, points[1:]):
+        # 在局部平面（公里）中求线段的法向量
+        scale = math.cos(math.radians((lat0 + lat1) / 2))
+        east = (lon1 - lon0) * KM_PER_DEG * scale
+        north = (lat1 - lat0) * KM_PER_DEG
+        length = math.hypot(east, north)
+        if length == 0:
+            continue
+        off_lat = (east / length) * buffer_km / KM_PER_DEG
+        off_lon = (-north / length) * buffer_km / (KM_PER_DEG * scale)
+        ring = [(lat0 + off_lat, lon0 + off_lon), (lat1 + off_lat, lon1 + off_lon),
+                (lat1 - off_lat, lon1 - off_lon), (lat0 - off_lat, lon0 - off_lon)]
+        regions.append(PolygonRegion([ring], kind='走廊'))
+    return regions
+
+# ==================== 解析输入 ====================
+
+def parse_bbox(text):
+    """解析 'min_lat,min_lon,max_lat,max_lon'"""
+    values = [float(v) for v in text.split(',')]
+    if len(values) != 4:
+        raise ValueError(f"矩形需要 4 个数: {text}")
+    return BBoxRegion(*values)
+
+
+def parse_points(text):
+    """解析 'lat,lon;lat,lon;...'"""
+    points = []
+    for pair in text.split(';'):
+        if pair.strip():
+            lat, lon = (float(v) for v in pair.split(','))
+            points.append((lat, lon))
+    return points
+
+
+def load_geojson(path, buffer_km=1.0):
+    """
+    读取 GeoJSON 文件中的区域
+
+    Polygon / MultiPolygon 按原形状；LineString / MultiLineString 按
+    buffer_km 缓冲成走廊；Point / MultiPoint 按 buffer_km 作为半径取圆。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        return geojson_regions(json.load(f), buffer_km)
+
+
+def geojson_regions(obj, buffer_km=1.0):
+    """把 GeoJSON 对象转换为区域列表"""
+    kind = obj.get('type')
+    if kind == 'FeatureCollection':
+        return [r for feature in obj['features'] for r in geojson_regions(feature, buffer_km)]
+    if kind == 'Feature':
+        return geojson_regions(obj['geometry'], buffer_km) if obj.get('geometry') else []
+    if kind == 'GeometryCollection':
+        return [r for geom in obj['geometries'] for r in geojson_regions(geom, buffer_km)]
+
+    def latlon(coords):
+        # GeoJSON 坐标顺序为 [经度, 纬度]
+        return [(c[1], c[0]) for c in coords]
+
+    coords = obj.get('coordinates')
+    if kind == 'Polygon':
+        return [PolygonRegion([latlon(ring) for ring in coords])]
+    if kind == 'MultiPolygon':
+        return [PolygonRegion([latlon(ring) for ring in poly]) for poly in coords]
+    if kind == 'LineString':
+        return corridor(latlon(coords), buffer_km)
+    if kind == 'MultiLineString':
+        return [r for line in coords for r in corridor(latlon(line), buffer_km)]
+    if kind == 'Point':
+        return [disc(coords[1], coords[0], buffer_km)]
+    if kind == 'MultiPoint':
+        return [disc(lat, lon, buffer_km) for lat, lon in latlon(coords)]
+    raise ValueError(f"不支持的 GeoJSON 类型: {kind}")
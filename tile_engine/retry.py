@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+失败重试队列
+
+下载失败的瓦片不再只是计数，而是带着"下次可重试时间"放回队列，
+在同一次运行里按指数退避（带随机抖动）重试，直到成功或用完次数。
+最终仍失败的瓦片写入 JSON 报告，可交给 missing 模式单独补下。
+"""
+
+import json
+import time
+import heapq
+import random
+from datetime import datetime
+
+from .config import MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+# 服务器临时性错误，值得重试
+RETRY_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+def is_retriable(result):
+    """判断下载结果是否值得重试（网络异常或临时性错误）"""
+    if result.startswith('error_'):
+        return True
+    if result.startswith('failed_'):
+        try:
+            return int(result[len('failed_'):]) in RETRY_STATUSES
+        except ValueError:
+            return False
+    return False
+
+
+class RetryPolicy:
+    """
+    重试策略
+
+    参数:
+        max_attempts: 每个瓦片最多尝试次数（含第一次）
+        base_delay: 第一次重试的退避上限（秒）
+        max_delay: 退避时间上限（秒）
+    """
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """第 attempt 次失败后的等待时间（全抖动指数退避）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def should_retry(self, result, attempt):
+        """第 attempt 次尝试得到 result 后是否继续重试"""
+        return attempt < self.max_attempts and is_retriable(result)
+
+
+class RetryQueue:
+    """
+    按就绪时间排序的重试队列
+
+    属性:
+        failures: 最终失败的瓦片 [{'z', 'x', 'y', 'attempts', 'result'}]
+        retried: 已安排的重试次数
+    """
+
+    def __init__(self, policy=None):
+        self.policy = policy if policy is not None else RetryPolicy()
+        self.failures = []
+        self.retried = 0
+        self._heap = []
+        self._seq = 0
+
+    def offer(self, tile, attempt, result):
+        """
+        提交一次失败
+
+        返回:
+            bool: True 表示已安排重试，False 表示放弃并记入 failures
+        """
+        if self.policy.should_retry(result, attempt):
+            ready = time.monotonic() + self.policy.delay(attempt)
+            # seq 保证就绪时间相同时按提交顺序出队，且不比较 tile
+            heapq.heappush(self._heap, (ready, self._seq, tile, attempt + 1))
+            self._seq += 1
+            self.retried += 1
+            return True
+
+        z, x, y = tile
+        self.failures.append({'z': z, 'x': x, 'y': y, 'attempts': attempt, 'result': result})
+        return False
+
+    def pop_ready(self):
+        """取出所有已到重试时间的 (tile, attempt)"""
+        now = time.monotonic()
+        ready = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, tile, attempt = heapq.heappop(self._heap)
+            ready.append((tile, attempt))
+        return ready
+
+    def next_wait(self):
+        """距离下一个重试就绪的秒数，队列为空时返回 None"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def __len__(self):
+        return len(self._heap)
+
+
+def write_failure_report(path, failures, total=None):
+    """
+    写出失败报告（JSON）
+
+    格式:
+        {"generated": "...", "total": N, "failed": n,
+         "failures": [{"z": 15, "x": 1, "y": 2, "attempts": 4, "result": "failed_503"}]}
+    """
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'total': total,
+        'failed': len(failures),
+        'failures': sorted(failures, key=lambda f: (f['z'], f['x'], f['y'])),
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_failure_report(path):
+    """读取失败报告，返回 (z, x, y) 列表"""
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    return [(item['z'], item['x'], item['y']) for item in report['failures']]
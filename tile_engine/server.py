@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+本地瓦片服务器 - 提供 docs/ 网页，并按需补齐缺失的瓦片
+
+    /                       docs/ 下的静态文件（index.html、app.js 等）
+    /tiles/{z}/{x}/{y}.png  先查内存 LRU，再查本地存储（目录或 MBTiles），
+                            都没有时向上游下载一次、写回存储后返回
+
+原来本地没有的瓦片由浏览器每次直接去 tile.openstreetmap.org 取，而且不会保存。
+经过这个服务器，缺失的瓦片只下载一次，之后和已下载的瓦片一样从本地返回。
+
+同一个瓦片的并发请求合并为一次上游下载（其余请求等待同一个结果）；
+最近访问的瓦片内容保存在按字节数限制大小的 LRU 中，热点瓦片不必每次读盘。
+"""
+
+import re
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+from .downloader import download_tile
+
+TILE_PATH_RE = re.compile(r'^/tiles/(\d+)/(\d+)/(\d+)\.png$')
+
+# 内存 LRU 默认大小（字节）
+CACHE_BYTES = 64 * 1024 * 1024
+# 等待合并的上游下载的最长时间（秒）
+FILL_TIMEOUT = 30
+# 允许补齐的最大缩放级别（OSM 标准瓦片到 19 级）
+MAX_FILL_ZOOM = 19
+
+
+class TileCache:
+    """
+    内存 LRU + 本地存储 + 上游补齐
+
+    参数:
+        store: 瓦片存储
+        fetcher: 上游抓取器，None 表示只读（不补齐）
+        max_bytes: 内存 LRU 的字节上限
+        limiter: 上游请求共用的 TokenBucket
+
+    属性:
+        stats: 各来源的计数 memory / store / upstream / coalesced / missing
+    """
+
+    def __init__(self, store, fetcher=None, max_bytes=CACHE_BYTES, limiter=None):
+        self.store = store
+        self.fetcher = fetcher
+        self.max_bytes = max_bytes
+        self.limiter = limiter
+        self.stats = {'memory': 0, 'store': 0, 'upstream': 0, 'coalesced': 0, 'missing': 0}
+        self._lru = OrderedDict()
+        self._size = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def get(self, z, x, y):
+        """
+        取瓦片
+
+        返回:
+            (data, source)，取不到时 data 为 None、source 为失败原因
+        """
+        key = (z, x, y)
+        with self._lock:
+            data = self._lru.get(key)
+            if data is not None:
+                self._lru.move_to_end(key)
+                self.stats['memory'] += 1
+                return data, 'memory'
+
+        data = self.store.read(z, x, y)
+        if data is not None:
+            self._remember(key, data)
+            self._count('store')
+            return data, 'store'
+
+        if self.fetcher is None or not valid_tile(z, x, y):
+            self._count('missing')
+            return None, 'missing'
+        return self._fill(key)
+
+    def _fill(self, key):
+        """向上游下载，同一瓦片同时只下载一次"""
+        with self._lock:
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+            else:
+                self.stats['coalesced'] += 1
+
+        if not owner:
+            try:
+                return future.result(FILL_TIMEOUT)
+            except Exception:
+                return None, 'timeout'
+
+        try:
+            if self.store.exists(*key):
+                # 清单记为已下载、文件却读不到（被手动删除）：去掉过期记录后重新下载
+                self.store.delete(*key)
+            result = download_tile(self.fetcher, self.store, *key, self.limiter)
+            data = self.store.read(*key) if result in ('success', 'exists') else None
+            outcome = (data, 'upstream') if data is not None else (None, result)
+        except Exception as e:
+            outcome = (None, f'error_{e}')
+        finally:
+            with self._lock:
+                del self._pending[key]
+
+        if outcome[0] is not None:
+            self._remember(key, outcome[0])
+            self._count('upstream')
+        else:
+            self._count('missing')
+        future.set_result(outcome)
+        return outcome
+
+    def _remember(self, key, data):
+        """放入 LRU，超出上限时淘汰最久未用的瓦片"""
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._lru[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._lru.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+def valid_tile(z, x, y):
+    """坐标是否在该缩放级别的范围内"""
+    return 0 <= z <= MAX_FILL_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+class TileRequestHandler(SimpleHTTPRequestHandler):
+    """瓦片走 TileCache，其余路径按静态文件处理；HEAD 与 GET 走同一路径，只是不发送内容"""
+
+    def do_GET(self):
+        if not self.send_tile(body=True):
+            super().do_GET()
+
+    def do_HEAD(self):
+        if not self.send_tile(body=False):
+            super().do_HEAD()
+
+    def send_tile(self, body):
+        """
+        回复瓦片请求
+
+        返回:
+            路径不是瓦片时返回 False，交给静态文件处理
+        """
+        match = TILE_PATH_RE.match(self.path.split('?', 1)[0])
+        if not match:
+            return False
+
+        data, source = self.server.cache.get(*(int(v) for v in match.groups()))
+        if data is None:
+            self.send_error(404 if source in ('missing', 'failed_404') else 502, explain=source)
+            return True
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'public, max-age=86400')
+        self.send_header('X-Tile-Source', source)
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
+        return True
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TileServer(ThreadingHTTPServer):
+    """
+    本地瓦片服务器
+
+    参数:
+        cache: TileCache
+        root: 静态文件目录（默认 docs）
+        host / port: 监听地址
+    """
+
+    daemon_threads = True
+
+    def __init__(self, cache, root='docs', host='127.0.0.1', port=8000):
+        handler = partial(TileRequestHandler, directory=os.path.abspath(root))
+        super().__init__((host, port), handler)
+        self.cache = cache
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片存储
+
+    TileStore     {root}/{z}/{x}/{y}.png 目录布局，与 docs/ 下 Leaflet 的
+                  'tiles/{z}/{x}/{y}.png' 地址一一对应
+    MBTilesStore  单文件 SQLite 归档（见 mbtiles.py）
+
+两者共用 BaseTileStore 的清单逻辑：配合 Manifest 使用时，存在性判断、
+计数和缺失检测都查清单，不再逐个文件 stat。
+
+目录布局先写临时文件再原子改名，进程中途退出不会留下截断的 .png。
+开启 dedup 时，内容与已有瓦片相同（SHA-1 一致）的新瓦片用硬链接保存，
+海面、空地这类完全相同的瓦片在磁盘上只占一份。
+"""
+
+import os
+import hashlib
+import threading
+from pathlib import Path
+
+from .config import TILES_DIR
+
+
+class BaseTileStore:
+    """
+    瓦片存储基类
+
+    子类实现 _has / _put / _delete / read / iter_tiles / _count_range。
+
+    参数:
+        manifest: 可选的 Manifest
+        autoindex: 清单是新建的时，先从存储索引一次已有瓦片
+    """
+
+    def __init__(self, manifest=None, autoindex=True):
+        self.manifest = manifest
+        # 可选的 ProgressLog，保存瓦片时发布进度事件
+        self.events = None
+        # 本次运行新写入的字节数（字节预算用）
+        self.bytes_written = 0
+        self._bytes_lock = threading.Lock()
+
+        # 每次写入都是"临时文件 + 改名"，替换的是目录项而不是文件内容，
+        # 所以共享同一 inode 的硬链接瓦片不会被连带修改
+        if manifest is not None and manifest.is_new and autoindex:
+            self.reindex()
+
+    def exists(self, z, x, y):
+        """瓦片是否已保存"""
+        if self.manifest is not None:
+            return self.manifest.is_done(z, x, y)
+        return self._has(z, x, y)
+
+    def refresh(self, z, x_min, x_max, y_min, y_max):
+        """
+        重新读取矩形范围内的清单记录
+
+        其他进程刚写入、本进程清单缓存里还没有的瓦片补进缓存，
+        之后 exists 也返回 True；没有清单时 exists 直接检查存储，无需刷新
+        """
+        if self.manifest is not None:
+            self.manifest.refresh_range(z, x_min, x_max, y_min, y_max)
+
+    def write(self, z, x, y, data, headers=None):
+        """
+        保存瓦片内容
+
+        参数:
+            headers: 响应头，有清单时记录其中的 ETag / Last-Modified
+        """
+        sha1 = hashlib.sha1(data).hexdigest()
+        self._put(z, x, y, data, sha1)
+        with self._bytes_lock:
+            self.bytes_written += len(data)
+
+        if self.manifest is not None:
+            headers = headers or {}
+            self.manifest.record_done(z, x, y, len(data), sha1,
+                                      headers.get('ETag'), headers.get('Last-Modified'))
+        if self.events is not None:
+            self.events.tile(z, x, y, len(data))
+
+    def replace(self, z, x, y, data):
+        """
+        用本地处理后的内容替换瓦片（例如压缩），清单中保留 ETag 等校验值
+
+        刷新时服务器返回 304 仍然有效；内容确实变了才会重新下载原图。
+        有清单时总是按哈希查找内容相同的瓦片（不论是否开启 dedup），
+        原来共享一个文件的瓦片改写后仍然共享
+        """
+        sha1 = hashlib.sha1(data).hexdigest()
+        self._put(z, x, y, data, sha1, link=True)
+        if self.manifest is not None:
+            self.manifest.record_content(z, x, y, len(data), sha1)
+
+    def validators(self, z, x, y):
+        """
+        条件请求头（需要清单）
+
+        返回:
+            dict: If-None-Match / If-Modified-Since，没有记录时为空
+        """
+        record = self.manifest.get(z, x, y) if self.manifest is not None else None
+        validators = {}
+        if record:
+            if record['etag']:
+                validators['If-None-Match'] = record['etag']
+            if record['last_modified']:
+                validators['If-Modified-Since'] = record['last_modified']
+        return validators
+
+    def unchanged(self, z, x, y, data):
+        """新内容与清单记录的哈希是否相同"""
+        record = self.manifest.get(z, x, y) if self.manifest is not None else None
+        return bool(record) and record['sha1'] == hashlib.sha1(data).hexdigest()
+
+    def touch(self, z, x, y, headers=None):
+        """确认瓦片仍是最新，只更新清单，不写数据"""
+        if self.manifest is not None:
+            headers = headers or {}
+            self.manifest.touch(z, x, y, headers.get('ETag'), headers.get('Last-Modified'))
+        if self.events is not None:
+            self.events.tile(z, x, y, 0, 'not_modified')
+
+    def mark_failed(self, z, x, y, result):
+        """记录最终失败的瓦片（仅清单）"""
+        if self.manifest is not None:
+            self.manifest.record_failed(z, x, y, result)
+        if self.events is not None:
+            self.events.failed(z, x, y, result)
+
+    def delete(self, z, x, y):
+        """删除瓦片及其清单记录"""
+        self._delete(z, x, y)
+        if self.manifest is not None:
+            self.manifest.remove(z, x, y)
+
+    def discard(self, z, x, y, result):
+        """删除坏瓦片并记为最终失败，之后按缺失瓦片处理"""
+        self._delete(z, x, y)
+        self.mark_failed(z, x, y, result)
+
+    def stamp(self, z, x, y):
+        """
+        瓦片内容的版本标识（用于增量校验）
+
+        返回:
+            (大小, 修改时间) 等可比较的值；不支持或瓦片不存在时返回 None
+        """
+        return None
+
+    def count(self, plan, zoom=None):
+        """统计计划中已保存的瓦片数量"""
+        zooms = plan.zooms() if zoom is None else [zoom]
+        if not plan.is_rectangular:
+            if self.manifest is not None:
+                # 区域计划按层级查询清单，再与计划的瓦片集合求交
+                return sum(self.manifest.count_cells(z, plan.cells[z]) for z in zooms)
+            # 没有清单时逐个瓦片判断
+            return sum(1 for tile in plan.tiles(zoom) if self.exists(*tile))
+        if self.manifest is not None:
+            return sum(self.manifest.count_in_range(z, *plan.ranges[z]) for z in zooms)
+        return sum(self._count_range(z, *plan.ranges[z]) for z in zooms)
+
+    def missing(self, plan, zoom=None):
+        """返回计划中尚未保存的瓦片列表"""
+        return [(z, x, y) for z, x, y in plan.tiles(zoom) if not self.exists(z, x, y)]
+
+    def reindex(self):
+        """
+        扫描存储重建清单（一次性操作）
+
+        返回:
+            int: 索引的瓦片数量
+        """
+        self.manifest.clear()
+        count = 0
+        for z, x, y in self.iter_tiles():
+            data = self.read(z, x, y)
+            self.manifest.record_done(z, x, y, len(data), hashlib.sha1(data).hexdigest())
+            count += 1
+        self.manifest.flush()
+        return count
+
+    def flush(self):
+        """提交未写入的数据"""
+        if self.manifest is not None:
+            self.manifest.flush()
+
+    def close(self):
+        """提交清单并释放资源"""
+        if self.manifest is not None:
+            self.manifest.close()
+
+    def _count_range(self, z, x_min, x_max, y_min, y_max):
+        """不使用清单时统计矩形范围内的瓦片"""
+        return sum(1 for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)
+                   if self._has(z, x, y))
+
+
+class TileStore(BaseTileStore):
+    """
+    目录布局的瓦片存储
+
+    参数:
+        root: 瓦片根目录
+        manifest: 可选的 Manifest
+        autoindex: 清单是新建的时，先从目录索引一次已有瓦片
+        dedup: 与已有瓦片内容相同时用硬链接保存（需要清单按哈希查找）
+    """
+
+    def __init__(self, root=TILES_DIR, manifest=None, autoindex=True, dedup=False):
+        self.root = root
+        self.dedup = dedup
+        self.linked = 0
+        # 已确认存在的目录，避免每个瓦片都调用一次 mkdir
+        self._known_dirs = set()
+        super().__init__(manifest, autoindex)
+
+    def path(self, z, x, y):
+        """返回瓦片文件路径"""
+        return os.path.join(self.root, str(z), str(x), f"{y}.png")
+
+    def read(self, z, x, y):
+        """读取瓦片内容，不存在时返回 None"""
+        try:
+            with open(self.path(z, x, y), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def iter_tiles(self):
+        """遍历目录中已有的瓦片，生成 (z, x, y)"""
+        for z, x, y, _ in self.iter_files():
+            yield z, x, y
+
+    def iter_files(self):
+        """遍历目录中已有的瓦片，生成 (z, x, y, 文件路径)"""
+        if not os.path.isdir(self.root):
+            return
+        for z_entry in os.scandir(self.root):
+            if not (z_entry.is_dir() and z_entry.name.isdigit()):
+                continue
+            for x_entry in os.scandir(z_entry.path):
+                if not (x_entry.is_dir() and x_entry.name.isdigit()):
+                    continue
+                for y_entry in os.scandir(x_entry.path):
+                    name = y_entry.name
+                    if name.endswith('.png') and name[:-4].isdigit():
+                        yield int(z_entry.name), int(x_entry.name), int(name[:-4]), y_entry.path
+
+    def stamp(self, z, x, y):
+        """文件大小和修改时间（纳秒）"""
+        try:
+            st = os.stat(self.path(z, x, y))
+        except FileNotFoundError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _has(self, z, x, y):
+        return os.path.exists(self.path(z, x, y))
+
+    def _delete(self, z, x, y):
+        # 只删除这个目录项，硬链接共享内容的其他瓦片不受影响
+        tile_path = self.path(z, x, y)
+        try:
+            os.remove(tile_path)
+        except FileNotFoundError:
+            return
+        # 空出来的 {x}/、{z}/ 目录一并删除，目录树与瓦片集合保持一致
+        for directory in (os.path.dirname(tile_path), os.path.join(self.root, str(z))):
+            self._known_dirs.discard(directory)
+            try:
+                os.rmdir(directory)
+            except OSError:
+                break
+
+    def _put(self, z, x, y, data, sha1=None, link=False):
+        tile_path = self.path(z, x, y)
+        self._ensure_dir(os.path.dirname(tile_path))
+        # 临时文件名带进程和线程号，并发写同一瓦片也不会互相覆盖；
+        # 以 .tmp 结尾，不会被 iter_files 当成瓦片
+        tmp_path = f"{tile_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        twin = self._find_twin(z, x, y, sha1, link)
+        try:
+            if twin is not None and self._try_link(twin, tmp_path):
+                self.linked += 1
+            else:
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+            os.replace(tmp_path, tile_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _find_twin(self, z, x, y, sha1, link=False):
+        """dedup 开启（或 link 为 True）时，按哈希找一个内容相同的已有瓦片文件"""
+        if not ((self.dedup or link) and sha1 and self.manifest is not None):
+            return None
+        twin = self.manifest.find_sha1(sha1, exclude=(z, x, y))
+        return self.path(*twin) if twin else None
+
+    def _try_link(self, src, dst):
+        """创建硬链接，文件系统不支持或源文件不在了就返回 False"""
+        try:
+            os.link(src, dst)
+            return True
+        except OSError:
+            return False
+
+    def _ensure_dir(self, path):
+        """确保目录存在"""
+        if path not in self._known_dirs:
+            Path(path).mkdir(parents=True, exist_ok=True)
+            self._known_dirs.add(path)
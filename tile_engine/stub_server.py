@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+本地瓦片桩服务器 - 用于离线测试和性能对比
+
+对任意 /{z}/{x}/{y}.png 返回一张固定的 PNG，支持 keep-alive 和
+ETag 条件请求（If-None-Match 命中时返回 304）。不会访问真实的瓦片服务器。
+
+可模拟的服务器行为:
+    latency / jitter    每个请求的延迟及随机波动比例
+    error_rate          返回 500 的比例
+    throttle_rate       返回 429（带 Retry-After）的比例
+    body_size           用私有附加块把 PNG 填充到指定字节数
+
+是否出错由 (seed, 路径, 该路径第几次请求) 决定，与请求到达的先后顺序无关，
+同样的参数每次运行得到同样的错误分布，重试总会在有限次内成功。
+"""
+
+import re
+import time
+import random
+import threading
+import zlib
+import hashlib
+import struct
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+TILE_PATH_RE = re.compile(r'^/(\d+)/(\d+)/(\d+)\.png$')
+
+
+def make_png(size=256, color=(170, 211, 223)):
+    """生成一张纯色 PNG（默认 OSM 水体颜色）"""
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    row = b'\x00' + bytes(color) * size
+    raw = row * size
+    header = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def pad_png(data, size):
+    """在 IEND 前插入私有附加块（paDd），把 PNG 填充到 size 字节，解码结果不变"""
+    extra = size - len(data) - 12
+    if extra < 0:
+        return data
+    body = b'\x00' * extra
+    kind = b'paDd'
+    pad = struct.pack('>I', extra) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+    return data[:-12] + pad + data[-12:]
+
+
+class StubTileHandler(BaseHTTPRequestHandler):
+    """处理瓦片请求"""
+
+    protocol_version = 'HTTP/1.1'
+    # 响应头和正文分两次写出，不关闭 Nagle 会在长连接上触发 40ms 延迟确认
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        if not TILE_PATH_RE.match(self.path):
+            self.send_error(404)
+            return
+
+        with server.lock:
+            server.request_count += 1
+            attempt = server.attempts.get(self.path, 0)
+            server.attempts[self.path] = attempt + 1
+        rng = random.Random(f"{server.seed}:{self.path}:{attempt}")
+
+        if server.latency > 0:
+            time.sleep(server.latency * (1 + server.jitter * (2 * rng.random() - 1)))
+
+        roll = rng.random()
+        if roll < server.throttle_rate:
+            self.reply_empty(429, {'Retry-After': str(server.retry_after)})
+            return
+        if roll < server.throttle_rate + server.error_rate:
+            self.reply_empty(500)
+            return
+
+        if self.headers.get('If-None-Match') == server.etag:
+            server.count_status(304)
+            self.send_response(304)
+            self.send_header('ETag', server.etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = server.body
+        server.count_status(200)
+        self.send_response(200)
+        self.send_header('ETag', server.etag)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if server.truncate:
+            # 模拟传输中断：少发正文末尾的字节后断开连接
+            self.wfile.write(body[:-server.truncate])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def reply_empty(self, status, headers=None):
+        """返回没有正文的错误响应，连接保持可用"""
+        self.server.count_status(status)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTileServer(ThreadingHTTPServer):
+    """
+    在后台线程运行的桩服务器
+
+    参数:
+        latency: 每个请求的延迟（秒）
+        jitter: 延迟随机波动比例，0.5 表示 latency 的 ±50%
+        error_rate: 返回 500 的比例
+        throttle_rate: 返回 429 的比例
+        retry_after: 429 响应的 Retry-After（秒）
+        body_size: 正文填充到的字节数，None 表示不填充
+        truncate: 正文少发的字节数（Content-Length 仍是完整长度，发完即断开连接），0 表示完整发送
+        seed: 错误注入和延迟波动的随机种子
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, body=None, jitter=0.0, error_rate=0.0, throttle_rate=0.0,
+                 retry_after=1, body_size=None, truncate=0, seed=0):
+        super().__init__(('127.0.0.1', port), StubTileHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.truncate = truncate
+        self.seed = seed
+        self.body = body if body is not None else make_png()
+        if body_size:
+            self.body = pad_png(self.body, body_size)
+        self.etag = '"%s"' % hashlib.sha1(self.body).hexdigest()
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.statuses = {}
+        self.attempts = {}
+        self._thread = None
+
+    def count_status(self, status):
+        """按状态码计数"""
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    @property
+    def url_template(self):
+        """供 Fetcher 使用的 URL 模板"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/{{z}}/{{x}}/{{y}}.png"
+
+    def start(self):
+        """在后台线程启动"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片合成 - 用已有瓦片补出缺失的层级，不再为它们发网络请求
+
+    down   父瓦片缺失、计划内的子瓦片都在时，把子瓦片拼成 2 倍大小再缩小一半；
+           计划范围外的子瓦片位置保持透明
+    up     瓦片缺失时，取最近的已有祖先瓦片中对应的那一块放大；
+           z16 / z17 直接从 z15 裁切放大，不从放大过的瓦片再放大
+
+先从高到低逐级 down（新合成的父瓦片可以继续合成更低的层级），
+只下载 z15 也能得到完整的低层级；再从低到高 up，补齐剩下的缺口和超出下载范围的层级。
+
+合成在进程池中进行，主进程只负责读写存储。结果量化为 256 色调色板，
+与 OSM 瓦片的格式和大小相当。合成的瓦片在清单中标记为 synthetic_down / synthetic_up，
+确认时间记为 0：fast --refresh 会把它们当作到期瓦片，联网时用真实瓦片替换。
+
+依赖:
+    pip install pillow
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 向上最多找几级祖先（3 级即放大 8 倍，再大就只剩色块了）
+MAX_UPSCALE = 3
+# 合成结果的调色板颜色数
+SYNTH_COLORS = 256
+# 每批交给子进程的瓦片数
+BATCH_SIZE = 16
+
+SYNTH_DOWN = 'synthetic_down'
+SYNTH_UP = 'synthetic_up'
+
+# ==================== 图像处理（子进程） ====================
+
+def check_pillow():
+    """合成需要 Pillow，缺少时抛出 RuntimeError"""
+    if Image is None:
+        raise RuntimeError("瓦片合成需要 Pillow: pip install pillow")
+
+
+def open_tile(data):
+    """解码瓦片，有透明通道时转为 RGBA，否则转为 RGB"""
+    image = Image.open(io.BytesIO(data))
+    if 'A' in image.getbands() or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def encode_tile(image):
+    """量化为调色板 PNG（完全不透明的 RGBA 先转为 RGB）"""
+    if image.mode == 'RGBA' and image.getextrema()[3][0] == 255:
+        image = image.convert('RGB')
+    # 八叉树量化比默认的中位切分快一个数量级，对地图的大色块差别不明显
+    image = image.quantize(SYNTH_COLORS, method=Image.Quantize.FASTOCTREE)
+    buf = io.BytesIO()
+    image.save(buf, 'PNG', optimize=True)
+    return buf.getvalue()
+
+
+def downsample(children):
+    """
+    四个子瓦片合成父瓦片
+
+    参数:
+        children: [左上, 右上, 左下, 右下] 的 PNG 内容，缺少的为 None
+    """
+    images = [open_tile(data) if data is not None else None for data in children]
+    size = next(image.size[0] for image in images if image is not None)
+    full = all(image is not None for image in images)
+    canvas = Image.new('RGB' if full else 'RGBA', (size * 2, size * 2))
+    for i, image in enumerate(images):
+        if image is not None:
+            canvas.paste(image.convert(canvas.mode), ((i % 2) * size, (i // 2) * size))
+    return encode_tile(canvas.resize((size, size), Image.Resampling.LANCZOS))
+
+
+def upscale(data, dz, qx, qy):
+    """
+    从祖先瓦片裁出对应的一块并放大
+
+    参数:
+        dz: 相差的层级数
+        qx / qy: 目标瓦片在祖先瓦片中的位置（0 ~ 2^dz - 1）
+    """
+    image = open_tile(data)
+    size = image.size[0]
+    part = size >> dz
+    crop = image.crop((qx * part, qy * part, (qx + 1) * part, (qy + 1) * part))
+    return encode_tile(crop.resize((size, size), Image.Resampling.BICUBIC))
+
+
+def synth_tile(job):
+    """
+    子进程入口：合成一个瓦片
+
+    参数:
+        job: (z, x, y, 'down', children) 或 (z, x, y, 'up', (data, dz, qx, qy))
+
+    返回:
+        (z, x, y, 内容或 None, 错误信息或 None)
+    """
+    z, x, y, kind, payload = job
+    try:
+        if kind == 'down':
+            return z, x, y, downsample(payload), None
+        return z, x, y, upscale(*payload), None
+    except Exception as e:
+        return z, x, y, None, str(e) or type(e).__name__
+
+
+def synth_batch(jobs):
+    """子进程入口：合成一批瓦片"""
+    return [synth_tile(job) for job in jobs]
+
+# ==================== 调度（主进程） ====================
+
+def child_tiles(z, x, y):
+    """四个子瓦片，顺序为左上、右上、左下、右下"""
+    return [(z + 1, 2 * x + dx, 2 * y + dy) for dy in (0, 1) for dx in (0, 1)]
+
+
+def down_jobs(store, plan, zoom):
+    """该层级可以由子瓦片合成的缺失瓦片"""
+    for z, x, y in plan.tiles(zoom):
+        if store.exists(z, x, y):
+            continue
+        # 只要求计划内的子瓦片齐全，范围外的位置留空
+        children = [child if child in plan else None for child in child_tiles(z, x, y)]
+        needed = [child for child in children if child is not None]
+        if not needed or not all(store.exists(*child) for child in needed):
+            continue
+        yield z, x, y, 'down', [store.read(*child) if child is not None else None for child in children]
+
+
+def up_jobs(store, plan, zoom, upscaled):
+    """该层级可以由祖先瓦片放大的缺失瓦片（跳过放大合成的祖先）"""
+    for z, x, y in plan.tiles(zoom):
+        if store.exists(z, x, y):
+            continue
+        for dz in range(1, min(MAX_UPSCALE, z) + 1):
+            ancestor = (z - dz, x >> dz, y >> dz)
+            if ancestor not in upscaled and store.exists(*ancestor):
+                mask = (1 << dz) - 1
+                yield z, x, y, 'up', (store.read(*ancestor), dz, x & mask, y & mask)
+                break
+
+
+def run_jobs(executor, jobs, workers):
+    """分批提交，在途批次数不超过进程数的两倍，生成 (z, x, y, 内容, 错误)"""
+    limit = 2 * workers
+    pending = set()
+    batch = []
+
+    def submit(batch):
+        nonlocal pending
+        pending.add(executor.submit(synth_batch, batch))
+        if len(pending) >= limit:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield from future.result()
+
+    for job in jobs:
+        batch.append(job)
+        if len(batch) >= BATCH_SIZE:
+            yield from submit(batch)
+            batch = []
+    if batch:
+        yield from submit(batch)
+    for future in pending:
+        yield from future.result()
+
+
+def synthesize(store, plan, workers=None, down=True, up=True, on_progress=None):
+    """
+    合成计划中缺失的瓦片并写入存储
+
+    参数:
+        store: 瓦片存储
+        plan: 要补齐的计划（可以超出已下载的层级，例如到 z17）
+        workers: 进程数，默认 CPU 核数
+        down / up: 是否由子瓦片缩小 / 由祖先瓦片放大
+        on_progress: 每合成一个瓦片调用 on_progress(done, tile)
+
+    返回:
+        dict: {zoom: {'down', 'up', 'errors'}}
+    """
+    check_pillow()
+    workers = workers or os.cpu_count() or 1
+    manifest = store.manifest
+    zooms = plan.zooms()
+    stats = {z: {'down': 0, 'up': 0, 'errors': 0} for z in zooms}
+    # 放大得到的瓦片不再作为放大的来源，避免反复插值
+    upscaled = manifest.synthetic(SYNTH_UP) if manifest is not None else set()
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        passes = []
+        if down:
+            # 从高到低：这一级合成的结果是下一级的子瓦片
+            passes.extend(('down', z) for z in reversed(zooms))
+        if up:
+            passes.extend(('up', z) for z in zooms)
+
+        for kind, zoom in passes:
+            jobs = down_jobs(store, plan, zoom) if kind == 'down' else up_jobs(store, plan, zoom, upscaled)
+            for z, x, y, data, error in run_jobs(executor, jobs, workers):
+                if error or data is None:
+                    stats[z]['errors'] += 1
+                    continue
+                store.write(z, x, y, data)
+                if manifest is not None:
+                    manifest.mark_synthetic(z, x, y, SYNTH_DOWN if kind == 'down' else SYNTH_UP)
+                if kind == 'up':
+                    upscaled.add((z, x, y))
+                stats[z][kind] += 1
+                done += 1
+                if on_progress:
+                    on_progress(done, (z, x, y))
+
+    store.flush()
+    return stats
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片编码 - 批量坐标换算和紧凑的瓦片集合
+
+每个瓦片 (z, x, y) 打包成一个 64 位无符号整数:
+
+    z << 58 | x << 29 | y        （z ≤ 29）
+
+按整数大小排序就是按 z、x、y 排序，与 TilePlan.tiles() 的遍历顺序一致。
+
+安装 NumPy 时，坐标换算、矩形展开、扫描线填充和去重都是整块数组运算，
+瓦片集合保存为排好序的 uint64 数组；没有 NumPy 时用标准库 array('Q')
+保存同样的编码，结果完全相同，只是慢一些。两种方式每个瓦片都只占 8 字节，
+而 frozenset 中的 (x, y) 元组每个要 100 多字节。
+
+依赖（可选）:
+    pip install numpy
+"""
+
+import math
+from array import array
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+X_SHIFT = 29
+Z_SHIFT = 58
+COORD_MASK = (1 << X_SHIFT) - 1
+MAX_KEY_ZOOM = 29
+# 遍历时每次转换的编码数
+ITER_CHUNK = 65536
+
+# ==================== 编码 ====================
+
+def encode(z, x, y):
+    """(z, x, y) → 64 位整数"""
+    return (z << Z_SHIFT) | (x << X_SHIFT) | y
+
+
+def decode(key):
+    """64 位整数 → (z, x, y)"""
+    return key >> Z_SHIFT, (key >> X_SHIFT) & COORD_MASK, key & COORD_MASK
+
+
+def latlon_to_tiles(lats, lons, zoom):
+    """
+    批量把经纬度转换为瓦片坐标
+
+    参数:
+        lats / lons: 等长的纬度、经度序列（列表或数组）
+
+    返回:
+        (xs, ys): 有 NumPy 时为 int64 数组，否则为列表
+    """
+    fx, fy = lonlat_to_tile_xy_array(lons, lats, zoom)
+    if np is not None:
+        return np.floor(fx).astype(np.int64), np.floor(fy).astype(np.int64)
+    return [int(x) for x in fx], [int(y) for y in fy]
+
+
+def lonlat_to_tile_xy_array(lons, lats, zoom):
+    """批量转为浮点瓦片坐标（与 regions.lonlat_to_tile_xy 相同的公式）"""
+    n = 2.0 ** zoom
+    if np is not None:
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        fx = (lons + 180.0) / 360.0 * n
+        fy = (1.0 - np.arcsinh(np.tan(np.radians(lats))) / np.pi) / 2.0 * n
+        return fx, fy
+    fx = [(lon + 180.0) / 360.0 * n for lon in lons]
+    fy = [(1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n for lat in lats]
+    return fx, fy
+
+# ==================== 生成编码 ====================
+
+def rect_keys(zoom, x_min, x_max, y_min, y_max):
+    """矩形范围（闭区间）内全部瓦片的编码，已排序"""
+    base = zoom << Z_SHIFT
+    if np is not None:
+        xs = np.arange(x_min, x_max + 1, dtype=np.uint64) << np.uint64(X_SHIFT)
+        ys = np.arange(y_min, y_max + 1, dtype=np.uint64)
+        return (np.uint64(base) | xs[:, None] | ys[None, :]).ravel()
+    return array('Q', (base | (x << X_SHIFT) | y
+                       for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)))
+
+
+def span_keys(zoom, rows, starts, ends):
+    """
+    按行的 x 区间展开瓦片编码（扫描线填充）
+
+    参数:
+        rows / starts / ends: 每个区间的行号 y 与 x 起止（闭区间），等长序列
+    """
+    base = zoom << Z_SHIFT
+    if np is not None:
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = np.asarray(starts, dtype=np.int64)
+        lengths = np.maximum(np.asarray(ends, dtype=np.int64) - starts + 1, 0)
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.uint64)
+        # 每个区间内的偏移 0, 1, 2, ...
+        offsets = np.arange(total, dtype=np.int64) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        xs = (np.repeat(starts, lengths) + offsets).astype(np.uint64)
+        ys = np.repeat(rows, lengths).astype(np.uint64)
+        return np.uint64(base) | (xs << np.uint64(X_SHIFT)) | ys
+    return array('Q', (base | (x << X_SHIFT) | row
+                       for row, start, end in zip(rows, starts, ends)
+                       for x in range(start, end + 1)))
+
+
+def cell_keys(zoom, cells):
+    """由 (x, y) 序列生成编码（未排序）"""
+    base = zoom << Z_SHIFT
+    keys = array('Q', (base | (x << X_SHIFT) | y for x, y in cells))
+    if np is not None:
+        return np.frombuffer(keys, dtype=np.uint64).copy()
+    return keys
+
+
+def concat_keys(parts):
+    """拼接若干编码序列（不排序、不去重）"""
+    if np is not None:
+        parts = [np.asarray(part, dtype=np.uint64) for part in parts]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+    keys = array('Q')
+    for part in parts:
+        keys.extend(part)
+    return keys
+
+
+def unique_keys(parts):
+    """合并若干编码序列，排序去重"""
+    parts = [part for part in parts if len(part)]
+    if np is not None:
+        if not parts:
+            return np.empty(0, dtype=np.uint64)
+        keys = np.concatenate([np.asarray(part, dtype=np.uint64) for part in parts])
+        keys.sort()
+        keep = np.empty(len(keys), dtype=bool)
+        keep[0] = True
+        np.not_equal(keys[1:], keys[:-1], out=keep[1:])
+        return keys[keep]
+    merged = set()
+    for part in parts:
+        merged.update(part)
+    return array('Q', sorted(merged))
+
+# ==================== 瓦片集合 ====================
+
+class TileKeys:
+    """
+    某个缩放级别下排好序、无重复的瓦片集合
+
+    支持 len()、按 (x, y) 判断成员、按 x、y 顺序遍历 (x, y)。
+
+    参数:
+        zoom: 缩放级别
+        keys: 排好序、无重复的编码（uint64 数组或 array('Q')）
+    """
+
+    def __init__(self, zoom, keys):
+        if zoom > MAX_KEY_ZOOM:
+            raise ValueError(f"缩放级别不能超过 {MAX_KEY_ZOOM}")
+        self.zoom = zoom
+        self.keys = keys
+
+    @classmethod
+    def from_parts(cls, zoom, parts):
+        """由若干未排序、可能重复的编码序列生成"""
+        return cls(zoom, unique_keys(parts))
+
+    @classmethod
+    def from_cells(cls, zoom, cells):
+        """由 (x, y) 序列生成"""
+        if isinstance(cells, TileKeys):
+            return cells
+        return cls.from_parts(zoom, [cell_keys(zoom, cells)])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, cell):
+        x, y = cell
+        if not (0 <= x <= COORD_MASK and 0 <= y <= COORD_MASK):
+            return False
+        key = encode(self.zoom, x, y)
+        if np is not None:
+            i = int(np.searchsorted(self.keys, np.uint64(key)))
+        else:
+            i = bisect_left(self.keys, key)
+        return i < len(self.keys) and int(self.keys[i]) == key
+
+    def count_in(self, keys):
+        """统计编码序列中属于本集合的个数（keys 无重复）"""
+        if not len(keys) or not len(self.keys):
+            return 0
+        if np is not None:
+            keys = np.asarray(keys, dtype=np.uint64)
+            i = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+            return int(np.count_nonzero(self.keys[i] == keys))
+        count = 0
+        for key in keys:
+            i = bisect_left(self.keys, key)
+            if i < len(self.keys) and self.keys[i] == key:
+                count += 1
+        return count
+
+    def __iter__(self):
+        # 分块转换为 Python 整数，不一次性展开整个集合
+        for start in range(0, len(self.keys), ITER_CHUNK):
+            for key in self.keys[start:start + ITER_CHUNK].tolist():
+                yield (key >> X_SHIFT) & COORD_MASK, key & COORD_MASK
+
+    def xs(self):
+        """全部瓦片的 x"""
+        if np is not None:
+            return (self.keys >> np.uint64(X_SHIFT)) & np.uint64(COORD_MASK)
+        return [(key >> X_SHIFT) & COORD_MASK for key in self.keys]
+
+    def ys(self):
+        """全部瓦片的 y"""
+        if np is not None:
+            return self.keys & np.uint64(COORD_MASK)
+        return [key & COORD_MASK for key in self.keys]
+
+    def bounds(self):
+        """(x_min, x_max, y_min, y_max)"""
+        # 编码按 x 排序，x 的范围直接看首尾
+        _, x_min, _ = decode(int(self.keys[0]))
+        _, x_max, _ = decode(int(self.keys[-1]))
+        ys = self.ys()
+        if np is not None:
+            return x_min, x_max, int(ys.min()), int(ys.max())
+        return x_min, x_max, min(ys), max(ys)
+
+    def union(self, other):
+        """并集，返回新的 TileKeys"""
+        return TileKeys.from_parts(self.zoom, [self.keys, other.keys])
+
+    @property
+    def nbytes(self):
+        """编码占用的字节数"""
+        return len(self.keys) * 8
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+瓦片校验 - 检查已保存的瓦片是否为完整的 PNG，坏瓦片交给修复队列重新下载
+
+missing 模式的"最终状态"只看瓦片是否存在：写了一半的文件、零字节文件、
+服务器出错时被当作瓦片保存下来的 HTML 页面都算作已下载。这里逐个检查内容：
+
+    empty      零字节
+    html       HTML 错误页（以 < 开头）
+    not_png    PNG 文件头不对
+    truncated  块不完整或缺少 IEND
+    crc        块的 CRC 校验不符
+    header     IHDR 缺失或取值非法，调色板图缺少 PLTE
+    zlib       IDAT 无法解压
+    pixels     解压后的像素数据长度与宽高不符，或行过滤类型非法
+
+解码只用 zlib 展开像素数据并核对长度，不依赖 Pillow。读文件、zlib 解压和
+CRC 计算都会释放 GIL，所以用线程池并行，瓦片内容也不必在进程间复制。
+
+有清单时记录校验通过时文件的大小和修改时间，再次运行只检查变化过的瓦片
+（MBTiles 归档没有逐瓦片的修改时间，每次全部检查）。
+"""
+
+import zlib
+import struct
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .fetcher import PNG_SIGNATURE
+
+# 默认线程数（瓦片小，读文件的等待占比大，线程数可以多于 CPU 核数）
+WORKERS = 8
+# 每批交给线程的瓦片数
+BATCH_SIZE = 64
+
+# 坏瓦片在清单中记为 corrupt_<原因>
+CORRUPT_PREFIX = 'corrupt_'
+
+# 颜色类型 → 每个像素的通道数
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# 各颜色类型允许的位深
+BIT_DEPTHS = {0: (1, 2, 4, 8, 16), 2: (8, 16), 3: (1, 2, 4, 8), 4: (8, 16), 6: (8, 16)}
+# Adam7 隔行扫描的 7 遍：(起始 x, 起始 y, x 步长, y 步长)
+ADAM7 = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+
+# ==================== PNG 检查 ====================
+
+def check_png(data):
+    """
+    检查 PNG 内容
+
+    返回:
+        None 表示完好，否则为原因（见模块说明）
+    """
+    if not data:
+        return 'empty'
+    if not data.startswith(PNG_SIGNATURE):
+        return 'html' if data.lstrip()[:1] == b'<' else 'not_png'
+
+    header = None
+    has_palette = False
+    idat = []
+    pos = len(PNG_SIGNATURE)
+    while True:
+        if pos + 12 > len(data):
+            return 'truncated'
+        length, kind = struct.unpack_from('>I4s', data, pos)
+        end = pos + 12 + length
+        if end > len(data):
+            return 'truncated'
+        body = data[pos + 8:end - 4]
+        if zlib.crc32(kind + body) != struct.unpack_from('>I', data, end - 4)[0]:
+            return 'crc'
+        if header is None and kind != b'IHDR':
+            return 'header'
+        if kind == b'IHDR':
+            if length != 13:
+                return 'header'
+            header = struct.unpack('>IIBBBBB', body)
+        elif kind == b'PLTE':
+            has_palette = True
+        elif kind == b'IDAT':
+            idat.append(body)
+        elif kind == b'IEND':
+            break
+        pos = end
+
+    width, height, bit_depth, color_type, compression, filter_method, interlace = header
+    if (not width or not height or bit_depth not in BIT_DEPTHS.get(color_type, ())
+            or compression or filter_method or interlace > 1):
+        return 'header'
+    if color_type == 3 and not has_palette:
+        return 'header'
+    if not idat:
+        return 'truncated'
+
+    bits = CHANNELS[color_type] * bit_depth
+    if interlace:
+        passes = [((width - x0 + dx - 1) // dx, (height - y0 + dy - 1) // dy) for x0, y0, dx, dy in ADAM7]
+        expected = sum(h * (1 + (w * bits + 7) // 8) for w, h in passes if w > 0 and h > 0)
+    else:
+        stride = 1 + (width * bits + 7) // 8
+        expected = height * stride
+
+    # 最多解出比预期多一个字节，宽高被写坏时也不会占用大量内存
+    decompressor = zlib.decompressobj()
+    try:
+        raw = decompressor.decompress(b''.join(idat), expected + 1)
+    except zlib.error:
+        return 'zlib'
+    if len(raw) < expected and not decompressor.eof:
+        return 'zlib'
+    if len(raw) != expected:
+        return 'pixels'
+    # 每行第一个字节是过滤类型（0-4）
+    if not interlace and max(raw[::stride]) > 4:
+        return 'pixels'
+    return None
+
+# ==================== 批量校验 ====================
+
+def check_batch(store, tiles):
+    """
+    线程入口：检查一批瓦片
+
+    返回:
+        [(z, x, y, 版本标识, 大小, 原因或 None)]；读取前先取版本标识，
+        检查期间文件被改写时下次运行标识对不上，会重新检查
+    """
+    results = []
+    for z, x, y in tiles:
+        stamp = store.stamp(z, x, y)
+        data = store.read(z, x, y) or b''
+        results.append((z, x, y, stamp, len(data), check_png(data)))
+    return results
+
+
+def verify_store(store, workers=WORKERS, force=False, on_progress=None):
+    """
+    检查存储中的全部瓦片
+
+    参数:
+        store: 瓦片存储（有清单时支持增量）
+        workers: 线程数
+        force: 忽略增量记录，全部重新检查
+        on_progress: 每检查一个瓦片调用 on_progress(done, tile)
+
+    返回:
+        (stats, bad)
+        stats: {zoom: {'checked', 'skipped', 'bad', 'bytes'}}
+        bad: 坏瓦片 [(z, x, y, 原因)]
+    """
+    manifest = store.manifest
+    # 上次校验通过后大小和修改时间都没变的瓦片
+    verified = manifest.verified() if manifest is not None and not force else {}
+    stats = {}
+    bad = []
+
+    def zoom_stats(z):
+        if z not in stats:
+            stats[z] = {'checked': 0, 'skipped': 0, 'bad': 0, 'bytes': 0}
+        return stats[z]
+
+    def batches():
+        batch = []
+        for z, x, y in store.iter_tiles():
+            previous = verified.get((z, x, y))
+            if previous is not None and previous == store.stamp(z, x, y):
+                zoom_stats(z)['skipped'] += 1
+                continue
+            batch.append((z, x, y))
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def results(executor):
+        # 在途批次数有上限，遍历大目录时不会一次提交全部瓦片
+        limit = 2 * workers
+        pending = set()
+        for batch in batches():
+            pending.add(executor.submit(check_batch, store, batch))
+            if len(pending) >= limit:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield from future.result()
+        for future in pending:
+            yield from future.result()
+
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for z, x, y, stamp, size, reason in results(executor):
+            s = zoom_stats(z)
+            s['checked'] += 1
+            s['bytes'] += size
+            if reason is not None:
+                s['bad'] += 1
+                bad.append((z, x, y, reason))
+            elif manifest is not None and stamp is not None:
+                manifest.record_verified(z, x, y, *stamp)
+
+            done += 1
+            if on_progress:
+                on_progress(done, (z, x, y))
+
+    store.flush()
+    bad.sort()
+    return stats, bad
+
+
+def discard_bad(store, bad):
+    """
+    把坏瓦片移出存储，清单中记为 corrupt_<原因>
+
+    之后 exists 返回 False，missing / fast 会把它们当作缺失瓦片重新下载
+    """
+    for z, x, y, reason in bad:
+        store.discard(z, x, y, CORRUPT_PREFIX + reason)
+    store.flush()